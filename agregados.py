@@ -0,0 +1,72 @@
+"""Agregaciones del tablero "Filtros", memorizadas por estado de filtros.
+
+Cada gráfico se calcula de forma independiente y se guarda en una caché LRU
+compartida por todas las sesiones, con la clave (versión de datos, filtros,
+nombre del agregado). Cambiar algo que no forma parte de la clave, como el
+texto de búsqueda, no recalcula ningún gráfico. Los datos llegan ordenados por
+fecha, como los entrega el almacén.
+"""
+import pandas as pd
+
+from cache_lru import CacheLRU
+from consultas import cortar_fechas
+
+# Número de agregados que se conservan en memoria
+MAX_AGREGADOS = 256
+
+# Días que cubren los gráficos de distribución reciente
+DIAS_RECIENTES = 30
+
+_cache = CacheLRU(MAX_AGREGADOS)
+
+
+def _total_horas(df):
+    return df['horas'].sum()
+
+
+def _promedio_diario(df):
+    return df.groupby('fecha')['horas'].sum().mean()
+
+
+def _ultimos_dias(df):
+    # Filtrar solo los últimos 30 días desde la fecha más reciente (una sola vez para los tres gráficos)
+    fecha_inicio = df['fecha'].iat[-1] - pd.Timedelta(days=DIAS_RECIENTES - 1)
+    recientes = cortar_fechas(df, fecha_inicio)
+    return {
+        'actividad': recientes.groupby('actividad', observed=True)['horas'].sum().reset_index(),
+        'persona': recientes.groupby('persona', observed=True)['horas'].sum().reset_index(),
+        'proyecto': recientes.groupby('proyecto', observed=True)['horas'].sum().reset_index(),
+    }
+
+
+def _matriz_proyecto_persona(df):
+    return pd.pivot_table(
+        df,
+        values='horas',
+        index='proyecto',
+        columns='persona',
+        aggfunc='sum',
+        fill_value=0,
+        observed=True
+    )
+
+
+def _diario_por(columna):
+    def _agregado(df):
+        return df.groupby(['fecha', columna], observed=True)['horas'].sum().reset_index()
+    return _agregado
+
+
+AGREGADOS = {
+    'total_horas': _total_horas,
+    'promedio_diario': _promedio_diario,
+    'ultimos_dias': _ultimos_dias,
+    'matriz_proyecto_persona': _matriz_proyecto_persona,
+    'diario_persona': _diario_por('persona'),
+    'diario_proyecto': _diario_por('proyecto'),
+}
+
+
+# Función para obtener un agregado del tablero, calculándolo solo si no está en caché
+def obtener_agregado(clave_filtros, nombre, df):
+    return _cache.obtener_o_calcular((clave_filtros, nombre), lambda: AGREGADOS[nombre](df))
@@ -0,0 +1,600 @@
+"""Capa de almacenamiento del registro de actividades.
+
+El archivo CSV principal funciona como una instantánea. Cada actividad nueva se
+agrega al final de un diario (journal) con bloqueo de archivo y fsync, de modo
+que registrar una actividad no reescribe todo el historial. Un paso de
+compactación incorpora periódicamente el diario a la instantánea.
+
+Cada línea del diario lleva la suma CRC32 de su contenido (``c=<crc>,...``):
+una línea cortada por una caída a mitad de escritura se descarta en lugar de
+leerse con un valor truncado. La compactación escribe primero la instantánea
+nueva completa y luego aparta el diario con un renombrado atómico, que es el
+punto de confirmación; si el proceso cae a mitad de camino, la siguiente
+lectura o compactación la termina o la descarta, así que el diario nunca se
+aplica dos veces.
+
+En memoria, los datos y el resumen diario se mantienen ordenados por fecha
+(con orden estable, así que las filas de un mismo día conservan el orden de
+registro) para que los filtros de fechas se resuelvan con búsqueda binaria.
+"""
+import csv
+import io
+import json
+import os
+import threading
+import zlib
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from busqueda import IndiceBusqueda, filas_con_ids
+from consultas import filtrar_actividades
+from metricas import medir
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+try:
+    import pyarrow as pa
+    from pyarrow import feather
+except ImportError:  # Sin pyarrow se trabaja solo con el CSV
+    pa = None
+    feather = None
+
+COLUMNAS = ["fecha", "persona", "actividad", "proyecto", "horas"]
+COLUMNAS_CATEGORICAS = ["persona", "actividad", "proyecto"]
+
+# Dimensiones del resumen diario de horas
+DIMENSIONES_RESUMEN = ["fecha", "persona", "proyecto", "actividad"]
+
+# Tamaño del diario (en bytes) a partir del cual se compacta en segundo plano
+UMBRAL_COMPACTACION = 256 * 1024
+
+# Lotes más grandes que esto no se acumulan en memoria: se vuelven a leer del disco
+UMBRAL_INCREMENTAL = 1000
+
+_compactando = threading.Lock()
+
+
+def ruta_diario(csv_file):
+    return f"{csv_file}.journal"
+
+
+def ruta_bloqueo(csv_file):
+    return f"{csv_file}.lock"
+
+
+# Diario ya incluido en la instantánea nueva de una compactación en curso
+def ruta_diario_apartado(csv_file):
+    return f"{csv_file}.journal.compactando"
+
+
+# Instantánea nueva que escribe la compactación antes de reemplazar el CSV
+def ruta_instantanea_nueva(csv_file):
+    return f"{csv_file}.tmp"
+
+
+def ruta_instantanea(csv_file):
+    return f"{os.path.splitext(csv_file)[0]}.feather"
+
+
+# Bloqueo consultivo entre procesos sobre un archivo auxiliar
+@contextmanager
+def bloqueo_archivo(ruta, exclusivo=True):
+    with open(ruta, 'a+') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusivo else fcntl.LOCK_SH)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+# Función para convertir la columna 'fecha' a datetime con formato flexible
+def convertir_fechas(serie):
+    try:
+        # Primero intentamos con formato ISO
+        return pd.to_datetime(serie, format='ISO8601')
+    except ValueError:
+        try:
+            # Si falla, intentamos con formato personalizado
+            return pd.to_datetime(serie, format='%Y-%m-%d')
+        except ValueError:
+            # Si todavía falla, usamos el modo 'mixed' muy flexible
+            return pd.to_datetime(serie, format='mixed')
+
+
+# Función para obtener el contenido de una línea del diario, o None si está incompleta o dañada
+def _verificar_linea(linea):
+    if not linea.startswith(b"c="):
+        return linea or None  # Formato anterior, sin suma de verificación
+    suma, _, contenido = linea[2:].partition(b",")
+    try:
+        valida = len(suma) == 8 and zlib.crc32(contenido) == int(suma, 16)
+    except ValueError:
+        valida = False
+    return contenido if valida else None
+
+
+def _leer_diario(csv_file):
+    diario = ruta_diario(csv_file)
+    if not os.path.exists(diario) or os.path.getsize(diario) == 0:
+        return None
+    with open(diario, 'rb') as f:
+        # Lo que sigue al último salto de línea es una escritura interrumpida
+        lineas = f.read().split(b"\n")[:-1]
+    contenido = [fila for fila in map(_verificar_linea, lineas) if fila is not None]
+    if not contenido:
+        return None
+    df = pd.read_csv(io.BytesIO(b"\n".join(contenido)), header=None, names=COLUMNAS)
+    return df.dropna(subset=["fecha", "persona", "horas"])
+
+
+# Función para usar tipos compactos: categorías para las etiquetas y datetime64 para 'fecha'
+def tipificar(df):
+    for col in COLUMNAS_CATEGORICAS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    return df
+
+
+# Función para obtener un DataFrame sin filas con los mismos tipos que deja la carga de datos
+def actividades_vacias(columnas=COLUMNAS):
+    tipos = {'fecha': 'datetime64[us]', 'horas': 'float64'}
+    return tipificar(pd.DataFrame({col: pd.Series(dtype=tipos.get(col, object)) for col in columnas}))
+
+
+def _firma_csv(csv_file):
+    st = os.stat(csv_file)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _leer_feather(csv_file):
+    ruta = ruta_instantanea(csv_file)
+    if feather is None or not os.path.exists(ruta):
+        return None
+    try:
+        # Lectura con memory-map: las columnas se mapean sin copiar el archivo completo
+        tabla = feather.read_table(ruta, memory_map=True)
+    except (OSError, pa.ArrowException):
+        return None
+    metadatos = tabla.schema.metadata or {}
+    if json.loads(metadatos.get(b'bitacora_origen', b'null')) != _firma_csv(csv_file):
+        return None  # El CSV cambió desde que se generó la instantánea
+    return tabla.to_pandas()
+
+
+def _escribir_feather(csv_file, df, firma):
+    if feather is None:
+        return
+    ruta = ruta_instantanea(csv_file)
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    try:
+        with medir("escritura.feather", filas=len(df)):
+            tabla = pa.Table.from_pandas(df, preserve_index=False)
+            metadatos = dict(tabla.schema.metadata or {})
+            metadatos[b'bitacora_origen'] = json.dumps(firma).encode()
+            # Sin compresión para que el archivo se pueda mapear en memoria
+            feather.write_feather(tabla.replace_schema_metadata(metadatos), temporal,
+                                  compression='uncompressed')
+            os.replace(temporal, ruta)
+    except (OSError, pa.ArrowException):
+        # La instantánea binaria es solo una optimización: el CSV sigue siendo la fuente
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+
+def _leer_instantanea(csv_file):
+    df = _leer_feather(csv_file)
+    if df is not None:
+        return df
+
+    firma = _firma_csv(csv_file)
+    df = pd.read_csv(csv_file)
+    if df.empty:
+        # Solo la cabecera (instalación nueva): sin tipos, la unión con el diario quedaría como object
+        return actividades_vacias()
+    df['fecha'] = convertir_fechas(df['fecha'])
+    tipificar(df)
+    _escribir_feather(csv_file, df, firma)
+    return df
+
+
+def _leer_sin_bloqueo(csv_file):
+    partes = []
+    if os.path.exists(csv_file):
+        partes.append(_leer_instantanea(csv_file))
+    diario = _leer_diario(csv_file)
+    if diario is not None and not diario.empty:
+        diario['fecha'] = convertir_fechas(diario['fecha'])
+        partes.append(diario)
+
+    if not partes:
+        return actividades_vacias()
+    if len(partes) == 1:
+        return tipificar(partes[0])
+    return concatenar(partes[0], partes[1])
+
+
+# Función para unir filas nuevas conservando las columnas categóricas
+def concatenar(df, nuevas, ignorar_indice=True):
+    if nuevas.empty:
+        return df
+    nuevas = nuevas.copy()
+    df = df.copy(deep=False)
+    for col in COLUMNAS_CATEGORICAS:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            faltantes = pd.Index(nuevas[col].unique()).difference(df[col].cat.categories)
+            if len(faltantes):
+                # Las categorías se mantienen en orden alfabético para que ordenar siga siendo lexicográfico
+                df[col] = df[col].cat.set_categories(sorted(df[col].cat.categories.union(faltantes)))
+            nuevas[col] = pd.Categorical(nuevas[col], categories=df[col].cat.categories)
+    return tipificar(pd.concat([df, nuevas], ignore_index=ignorar_indice))
+
+
+# Función para ordenar por fecha conservando el orden de registro dentro de cada día
+def ordenar_por_fecha(df):
+    if df.empty or df['fecha'].is_monotonic_increasing:
+        return df
+    # Orden estable (timsort): casi lineal porque los registros llegan casi en orden cronológico
+    return df.sort_values('fecha', kind='stable')
+
+
+# Función para cargar la instantánea más el diario de actividades
+def cargar_actividades(csv_file):
+    if os.path.exists(ruta_diario_apartado(csv_file)):
+        # Quedó una compactación interrumpida: se termina (o descarta) antes de leer
+        with bloqueo_archivo(ruta_bloqueo(csv_file)):
+            _recuperar_compactacion(csv_file)
+    with bloqueo_archivo(ruta_bloqueo(csv_file), exclusivo=False):
+        return _leer_sin_bloqueo(csv_file)
+
+
+# Función para crear el archivo CSV vacío con su cabecera
+def inicializar_archivo(csv_file):
+    with bloqueo_archivo(ruta_bloqueo(csv_file)):
+        if not os.path.exists(csv_file):
+            pd.DataFrame(columns=COLUMNAS).to_csv(csv_file, index=False)
+
+
+def _formatear_registro(registro):
+    fecha = registro["fecha"]
+    if hasattr(fecha, 'strftime'):
+        fecha = fecha.strftime('%Y-%m-%d')
+    fila = [fecha] + [registro[col] for col in COLUMNAS[1:]]
+
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator='').writerow(fila)
+    contenido = buffer.getvalue().encode('utf-8')
+    return b"c=%08x," % zlib.crc32(contenido) + contenido + b"\n"
+
+
+def _firma_archivos(csv_file):
+    firma = []
+    for ruta in (csv_file, ruta_diario(csv_file)):
+        try:
+            st = os.stat(ruta)
+            firma.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            firma.append(None)
+    return tuple(firma)
+
+
+def _agregar_al_diario(csv_file, linea):
+    diario = ruta_diario(csv_file)
+    with bloqueo_archivo(ruta_bloqueo(csv_file)):
+        firma_antes = _firma_archivos(csv_file)
+        with medir("escritura.diario", filas=linea.count(b"\n")):
+            fd = os.open(diario, os.O_RDWR | os.O_APPEND | os.O_CREAT | getattr(os, 'O_BINARY', 0), 0o644)
+            try:
+                tamano = os.fstat(fd).st_size
+                if tamano:
+                    os.lseek(fd, tamano - 1, os.SEEK_SET)
+                    if os.read(fd, 1) != b"\n":
+                        # Se cierra la línea que dejó cortada una caída, para no pegarle la siguiente
+                        linea = b"\n" + linea
+                # Una sola escritura por registro para no intercalar líneas
+                os.write(fd, linea)
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        firma_despues = _firma_archivos(csv_file)
+
+    if firma_despues[1][1] >= UMBRAL_COMPACTACION:
+        compactar_en_segundo_plano(csv_file)
+    return firma_antes, firma_despues
+
+
+# Función para agregar una actividad al diario (costo de E/S constante)
+def agregar_actividad(csv_file, registro):
+    _agregar_al_diario(csv_file, _formatear_registro(registro))
+
+
+def _sincronizar_directorio(ruta):
+    # Hace durables los renombrados; en Windows no se pueden abrir directorios (y no hace falta)
+    if fcntl is None:
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(ruta)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _terminar_compactacion(csv_file):
+    os.replace(ruta_instantanea_nueva(csv_file), csv_file)
+    _sincronizar_directorio(csv_file)
+    os.remove(ruta_diario_apartado(csv_file))
+
+
+# Función para dejar en orden una compactación interrumpida (se llama con el bloqueo exclusivo)
+def _recuperar_compactacion(csv_file):
+    apartado = os.path.exists(ruta_diario_apartado(csv_file))
+    nueva = os.path.exists(ruta_instantanea_nueva(csv_file))
+    if apartado and nueva:
+        # Se cayó después de confirmar: la instantánea nueva está completa y ya incluye el diario apartado
+        _terminar_compactacion(csv_file)
+    elif apartado:
+        # Se cayó después de reemplazar el CSV: el diario apartado ya está incluido
+        os.remove(ruta_diario_apartado(csv_file))
+    elif nueva:
+        # Se cayó antes de confirmar: el diario sigue vigente y la instantánea nueva se descarta
+        os.remove(ruta_instantanea_nueva(csv_file))
+
+
+# Función para incorporar el diario a la instantánea CSV
+def compactar(csv_file):
+    diario = ruta_diario(csv_file)
+    with bloqueo_archivo(ruta_bloqueo(csv_file)):
+        _recuperar_compactacion(csv_file)
+        if not os.path.exists(diario) or os.path.getsize(diario) == 0:
+            return False
+
+        df = _leer_sin_bloqueo(csv_file)
+        with medir("escritura.csv", filas=len(df)), \
+                open(ruta_instantanea_nueva(csv_file), 'w', newline='') as f:
+            df.to_csv(f, index=False)
+            f.flush()
+            os.fsync(f.fileno())
+
+        # Punto de confirmación: desde aquí el diario apartado cuenta como incluido en la instantánea nueva
+        os.replace(diario, ruta_diario_apartado(csv_file))
+        _sincronizar_directorio(csv_file)
+        _terminar_compactacion(csv_file)
+        _escribir_feather(csv_file, df, _firma_csv(csv_file))
+    return True
+
+
+def compactar_en_segundo_plano(csv_file):
+    if not _compactando.acquire(blocking=False):
+        return  # Ya hay una compactación en curso en este proceso
+
+    def _tarea():
+        try:
+            compactar(csv_file)
+        finally:
+            _compactando.release()
+
+    threading.Thread(target=_tarea, daemon=True).start()
+
+
+# Función para agregar las horas por (fecha, persona, proyecto, actividad)
+def construir_resumen(df):
+    return df.groupby(DIMENSIONES_RESUMEN, observed=True)['horas'].sum().reset_index()
+
+
+class ResumenDiario:
+    """Resumen diario de horas que se actualiza con cada registro nuevo.
+
+    Tiene las mismas columnas que el registro de actividades, con una fila por
+    combinación de (fecha, persona, proyecto, actividad), así que los gráficos
+    y reportes pueden usarlo en lugar de los datos crudos. Los registros nuevos
+    se suman a las filas existentes o se agregan al final, sin reagrupar todo.
+    """
+
+    def __init__(self, df):
+        self._tabla = construir_resumen(df)
+        self._posiciones = {
+            clave: i for i, clave in enumerate(zip(*(self._tabla[col] for col in DIMENSIONES_RESUMEN)))
+        }
+        self._pendientes = []
+
+    def agregar(self, fila):
+        self._pendientes.append(fila)
+
+    def tabla(self):
+        if self._pendientes:
+            self._incorporar()
+        return self._tabla.copy(deep=False)
+
+    def _incorporar(self):
+        deltas = {}
+        for fila in self._pendientes:
+            clave = (pd.Timestamp(fila['fecha']), fila['persona'], fila['proyecto'], fila['actividad'])
+            deltas[clave] = deltas.get(clave, 0.0) + float(fila['horas'])
+        self._pendientes = []
+
+        tabla = self._tabla
+        existentes = [(self._posiciones[clave], horas) for clave, horas in deltas.items() if clave in self._posiciones]
+        if existentes:
+            posiciones, valores = zip(*existentes)
+            horas = tabla['horas'].to_numpy(dtype=float, copy=True)
+            np.add.at(horas, list(posiciones), list(valores))
+            tabla = tabla.copy(deep=False)
+            tabla['horas'] = horas
+
+        nuevas = sorted(((clave, horas) for clave, horas in deltas.items() if clave not in self._posiciones),
+                        key=lambda nueva: nueva[0][0])
+        if nuevas:
+            inicio = len(tabla)
+            filas = pd.DataFrame([clave + (horas,) for clave, horas in nuevas],
+                                 columns=DIMENSIONES_RESUMEN + ['horas'])
+            tabla = concatenar(tabla, filas)
+            for i, (clave, _) in enumerate(nuevas):
+                self._posiciones[clave] = inicio + i
+
+            if inicio and filas['fecha'].min() < tabla['fecha'].iat[inicio - 1]:
+                # Registro con fecha anterior: se reordena y se actualizan las posiciones
+                orden = tabla['fecha'].to_numpy().argsort(kind='stable')
+                nueva_posicion = np.empty_like(orden)
+                nueva_posicion[orden] = np.arange(len(orden))
+                tabla = tabla.take(orden).reset_index(drop=True)
+                self._posiciones = {clave: int(nueva_posicion[i]) for clave, i in self._posiciones.items()}
+
+        self._tabla = tabla
+
+
+class AlmacenActividades:
+    """Conjunto de datos compartido por todas las sesiones del proceso.
+
+    Se invalida cuando cambia la firma (mtime/tamaño) del CSV o del diario, y
+    las escrituras hechas a través del almacén se incorporan sin releer el CSV.
+    """
+
+    def __init__(self, csv_file):
+        self.csv_file = csv_file
+        self.version = 0
+        self._lock = threading.RLock()
+        self._datos = None
+        self._firma = None
+        self._pendientes = []
+        self._resumen = None
+        self._indice = None
+
+    def _recargar(self):
+        firma = _firma_archivos(self.csv_file)
+        with medir("datos.cargar") as medicion:
+            # El índice conserva la posición de cada fila en el archivo (su id), aunque se ordene por fecha
+            self._datos = ordenar_por_fecha(cargar_actividades(self.csv_file))
+            medicion.filas = len(self._datos)
+        self._firma = firma
+        self._pendientes = []
+        self._resumen = None
+        self._indice = None
+        self.version += 1
+
+    def _sincronizar(self):
+        if self._datos is None or _firma_archivos(self.csv_file) != self._firma:
+            self._recargar()
+        elif self._pendientes:
+            total = len(self._datos)
+            nuevas = pd.DataFrame(self._pendientes, columns=COLUMNAS,
+                                  index=pd.RangeIndex(total, total + len(self._pendientes)))
+            nuevas['fecha'] = pd.to_datetime(nuevas['fecha'])
+            datos = concatenar(self._datos, nuevas, ignorar_indice=False)
+            if not nuevas['fecha'].is_monotonic_increasing or (
+                    total and nuevas['fecha'].iat[0] < self._datos['fecha'].iat[-1]):
+                # Registro con fecha anterior a la última (formulario con fecha pasada)
+                datos = ordenar_por_fecha(datos)
+            self._datos = datos
+            self._pendientes = []
+
+    def obtener(self):
+        # Devuelve una copia superficial: barata y aislada de cambios de columnas
+        with self._lock:
+            self._sincronizar()
+            return self._datos.copy(deep=False)
+
+    # Función para obtener el resumen diario (fecha, persona, proyecto, actividad) -> horas
+    def obtener_resumen(self):
+        with self._lock:
+            if self._datos is None or _firma_archivos(self.csv_file) != self._firma:
+                self._recargar()
+            if self._resumen is None:
+                self._sincronizar()
+                with medir("datos.resumen_diario", filas=len(self._datos)):
+                    self._resumen = ResumenDiario(self._datos)
+            return self._resumen.tabla()
+
+    # Función para obtener los registros que cumplen los filtros
+    def consultar(self, inicio=None, fin=None, personas=None, proyectos=None, actividades=None):
+        return filtrar_actividades(self.obtener(), inicio, fin, personas, proyectos, actividades, ordenado=True)
+
+    # Función para obtener el resumen diario restringido a los filtros
+    def consultar_resumen(self, inicio=None, fin=None, personas=None, proyectos=None, actividades=None):
+        return filtrar_actividades(self.obtener_resumen(), inicio, fin, personas, proyectos, actividades,
+                                   ordenado=True)
+
+    # Función para obtener los ids de fila (índice de obtener()) que cumplen los filtros y contienen todos los términos
+    def buscar(self, consulta, inicio=None, fin=None, personas=None, proyectos=None, actividades=None):
+        with self._lock:
+            self._sincronizar()
+            if self._indice is None:
+                self._indice = IndiceBusqueda(self._datos)
+            ids = self._indice.buscar(consulta)
+            if ids is None or len(ids) == 0:
+                return ids
+            # Los filtros se aplican solo a las filas encontradas
+            encontradas = filtrar_actividades(filas_con_ids(self._datos, ids), inicio, fin, personas, proyectos,
+                                              actividades)
+        return np.sort(encontradas.index.to_numpy())
+
+    # Función para obtener los valores distintos de una columna, ordenados
+    def valores(self, columna):
+        return sorted(self.obtener_resumen()[columna].unique().tolist())
+
+    # Función para obtener la primera y la última fecha registradas (None si no hay datos)
+    def rango_fechas(self):
+        resumen = self.obtener_resumen()
+        if resumen.empty:
+            return None, None
+        return resumen['fecha'].iat[0].date(), resumen['fecha'].iat[-1].date()
+
+    def existe(self):
+        return os.path.exists(self.csv_file)
+
+    def inicializar(self):
+        inicializar_archivo(self.csv_file)
+
+    def agregar(self, registro):
+        self.agregar_lote([registro])
+
+    # Función para agregar varios registros con una sola escritura al diario
+    def agregar_lote(self, registros):
+        filas = [{col: registro[col] for col in COLUMNAS} for registro in registros]
+        if not filas:
+            return
+        with self._lock:
+            lineas = b"".join(_formatear_registro(fila) for fila in filas)
+            firma_antes, firma_despues = _agregar_al_diario(self.csv_file, lineas)
+            if len(filas) > UMBRAL_INCREMENTAL:
+                # Importaciones grandes: se descarta la copia en memoria y se recarga al leer
+                self._datos = None
+                self._pendientes = []
+                self._resumen = None
+                self._indice = None
+            elif self._datos is not None and firma_antes == self._firma:
+                # Solo cambió por nuestra escritura: se actualiza en memoria
+                for fila in filas:
+                    if self._indice is not None:
+                        self._indice.agregar_fila(len(self._datos) + len(self._pendientes), fila)
+                    self._pendientes.append(fila)
+                    if self._resumen is not None:
+                        self._resumen.agregar(fila)
+                self._firma = firma_despues
+                self.version += 1
+            # Si otro proceso escribió entretanto, la firma no coincide y se recarga al leer
+
+
+_almacenes = {}
+_almacenes_lock = threading.Lock()
+
+
+# Función para obtener el almacén compartido de un archivo CSV
+def obtener_almacen(csv_file):
+    ruta = os.path.abspath(csv_file)
+    with _almacenes_lock:
+        if ruta not in _almacenes:
+            _almacenes[ruta] = AlmacenActividades(csv_file)
+        return _almacenes[ruta]
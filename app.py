@@ -1,21 +1,45 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
 from datetime import datetime, timedelta
-import io
-import base64
-import json
-from fpdf import FPDF
-import matplotlib.pyplot as plt
-from io import BytesIO
 import hashlib
 import os
+import tempfile
 import time
 
+import base_datos
+import importacion
+import metricas
+import registro_lotes
+import usuarios
+from agregados import obtener_agregado
+from almacenamiento import obtener_almacen
+from base_datos import obtener_almacen_sqlite
+from busqueda import filas_con_ids
+from consultas import filtrar_actividades
+from evolucion import GRANULARIDADES, elegir_granularidad, serie_evolucion
+from contrasenas import cifrar_contrasena, latencias_login, necesita_actualizar, verificar_contrasena
+from exportacion import exportar, extension, formatos_disponibles, tipo_mime
+from paginacion import TAMANOS_PAGINA, orden_filas, pagina, total_paginas
+from reportes import MAX_REGISTROS_DETALLE, generate_pdf_report
+from trabajos import obtener_cola
+from usuarios import obtener_directorio
+
 CSV_FILE = "registro_actividades.csv"
 USERS_FILE = "usuarios.json"
+# Si se define, actividades y usuarios se guardan en esta base SQLite en lugar de los archivos
+DB_FILE = os.environ.get("BITACORA_DB")
+# Archivo donde la pestaña "Rendimiento" guarda las métricas en formato Prometheus
+METRICAS_FILE = os.environ.get("BITACORA_METRICAS_ARCHIVO", "metricas.prom")
+
+inicio_rerun = time.perf_counter()
+
+# Si se define el puerto, las métricas se sirven por HTTP para Prometheus (un servidor por proceso)
+if os.environ.get("BITACORA_METRICAS_PUERTO"):
+    metricas.servir_prometheus(int(os.environ["BITACORA_METRICAS_PUERTO"]))
+
+# Usuarios compartidos por todas las sesiones del proceso (base SQLite o archivo JSON)
+directorio_usuarios = (obtener_directorio(DB_FILE, base_datos) if DB_FILE
+                       else obtener_directorio(USERS_FILE, usuarios))
 
 # Configuración de la página
 st.set_page_config(
@@ -107,438 +131,42 @@ if 'nombre_completo' not in st.session_state:
 # Inicializar la contraseña para reportes (en una aplicación real, usarías un método más seguro)
 REPORT_PASSWORD_HASH = hashlib.sha256("admin123".encode()).hexdigest()
 
-# Función auxiliar para obtener fechas de manera segura
-def get_safe_date_range(df, date_column='fecha'):
-    """Obtiene el rango de fechas de manera segura, manejando diferentes tipos de datos"""
-    try:
-        if df.empty:
-            today = datetime.now().date()
-            return today, today
-        
-        # Asegurarse de que la columna sea datetime
-        if not pd.api.types.is_datetime64_any_dtype(df[date_column]):
-            try:
-                # Ya intentamos convertir antes, pero asegurémonos aquí también
-                df[date_column] = pd.to_datetime(df[date_column])
-            except:
-                # Si falla, retornamos fecha actual
-                today = datetime.now().date()
-                return today, today
-        
-        # Obtener min y max, y convertir a date de Python
-        min_date = pd.Timestamp(df[date_column].min()).date()
-        max_date = pd.Timestamp(df[date_column].max()).date()
-        
-        return min_date, max_date
-    except Exception as e:
-        # En caso de cualquier error, retornar fecha actual
-        today = datetime.now().date()
-        return today, today
-
-# Función para crear hash seguro de contraseña con salt
-def hash_password(password, salt=None):
-    if salt is None:
-        salt = os.urandom(32)  # 32 bytes de salt aleatorio
-    
-    # Combina la contraseña con el salt y genera el hash
-    key = hashlib.pbkdf2_hmac(
-        'sha256',
-        password.encode('utf-8'),
-        salt,
-        100000  # Número de iteraciones
-    )
-    
-    # Devuelve el salt y la llave concatenados para almacenamiento
-    return salt + key
-
-# Función para verificar la contraseña
-def verify_password(stored_password, provided_password):
-    # El salt es los primeros 32 bytes del hash almacenado
-    salt = stored_password[:32]
-    stored_key = stored_password[32:]
-    
-    # Calcula el hash para la contraseña proporcionada usando el mismo salt
-    key = hashlib.pbkdf2_hmac(
-        'sha256',
-        provided_password.encode('utf-8'),
-        salt,
-        100000  # Mismo número de iteraciones
-    )
-    
-    # Compara en tiempo constante para evitar ataques de timing
-    return key == stored_key
-
 # Función para verificar la contraseña de reportes
 def verify_report_password(input_password):
     input_hash = hashlib.sha256(input_password.encode()).hexdigest()
     return input_hash == REPORT_PASSWORD_HASH
 
-# Función para cargar usuarios o crear el archivo si no existe
+# Función para cargar usuarios o crear el admin por defecto si todavía no hay ninguno
 def load_users():
-    if os.path.exists(USERS_FILE):
-        try:
-            with open(USERS_FILE, 'r') as f:
-                return json.load(f)
-        except json.JSONDecodeError:
-            st.error("Error al cargar el archivo de usuarios. Creando uno nuevo.")
-            # Crear admin por defecto
-            admin_password = "admin123"
-            hashed_password = hash_password(admin_password)
-            users = {
-                "admin": {
-                    "password": base64.b64encode(hashed_password).decode('utf-8'),
-                    "role": "admin",
-                    "nombre_completo": "Administrador del Sistema"
-                }
-            }
-            save_users(users)
-            return users
-    else:
-        # Crear archivo de usuarios con un admin por defecto
-        admin_password = "admin123"
-        hashed_password = hash_password(admin_password)
-        users = {
-            "admin": {
-                "password": base64.b64encode(hashed_password).decode('utf-8'),
-                "role": "admin",
-                "nombre_completo": "Administrador del Sistema"
-            }
-        }
-        save_users(users)
+    try:
+        users = directorio_usuarios.usuarios()
+    except ValueError:
+        # Un archivo dañado no se sobrescribe: se perderían todos los usuarios
+        st.error("El archivo de usuarios está dañado. Restaure una copia válida de usuarios.json.")
+        st.stop()
+    if users:
         return users
 
-# Función para guardar usuarios
-def save_users(users):
-    with open(USERS_FILE, 'w') as f:
-        json.dump(users, f)
-
-# Función para crear un link de descarga
-def get_download_link(df, filename, text):
-    csv = df.to_csv(index=False)
-    b64 = base64.b64encode(csv.encode()).decode()
-    href = f'<a href="data:file/csv;base64,{b64}" download="{filename}">{text}</a>'
-    return href
-
-# Función para crear un link de descarga para PDF
-def get_pdf_download_link(pdf_bytes, filename, text):
-    b64 = base64.b64encode(pdf_bytes).decode()
-    href = f'<a href="data:application/pdf;base64,{b64}" download="{filename}">{text}</a>'
-    return href
-
-# Función para identificar festivos en Colombia
-def es_festivo_colombia(fecha):
-    # Lista de festivos en Colombia para 2024-2025
-    festivos = [
-        # 2024
-        datetime(2024, 1, 1).date(),  # Año Nuevo
-        datetime(2024, 1, 8).date(),  # Día de los Reyes Magos
-        datetime(2024, 3, 25).date(),  # Día de San José
-        datetime(2024, 3, 28).date(),  # Jueves Santo
-        datetime(2024, 3, 29).date(),  # Viernes Santo
-        datetime(2024, 5, 1).date(),  # Día del Trabajo
-        datetime(2024, 5, 13).date(),  # Día de la Ascensión
-        datetime(2024, 6, 3).date(),  # Corpus Christi
-        datetime(2024, 6, 10).date(),  # Sagrado Corazón
-        datetime(2024, 7, 1).date(),  # San Pedro y San Pablo
-        datetime(2024, 7, 20).date(),  # Día de la Independencia
-        datetime(2024, 8, 7).date(),  # Batalla de Boyacá
-        datetime(2024, 8, 19).date(),  # Asunción de la Virgen
-        datetime(2024, 10, 14).date(),  # Día de la Raza
-        datetime(2024, 11, 4).date(),  # Todos los Santos
-        datetime(2024, 11, 11).date(),  # Independencia de Cartagena
-        datetime(2024, 12, 8).date(),  # Día de la Inmaculada Concepción
-        datetime(2024, 12, 25).date(),  # Navidad
-        # 2025
-        datetime(2025, 1, 1).date(),  # Año Nuevo
-        datetime(2025, 1, 6).date(),  # Día de los Reyes Magos
-        datetime(2025, 3, 24).date(),  # Día de San José
-        datetime(2025, 4, 17).date(),  # Jueves Santo
-        datetime(2025, 4, 18).date(),  # Viernes Santo
-        datetime(2025, 5, 1).date(),  # Día del Trabajo
-        datetime(2025, 6, 2).date(),  # Día de la Ascensión
-        datetime(2025, 6, 23).date(),  # Corpus Christi
-        datetime(2025, 6, 30).date(),  # Sagrado Corazón
-        datetime(2025, 7, 20).date(),  # Día de la Independencia
-        datetime(2025, 8, 7).date(),  # Batalla de Boyacá
-        datetime(2025, 8, 18).date(),  # Asunción de la Virgen
-        datetime(2025, 10, 13).date(),  # Día de la Raza
-        datetime(2025, 11, 3).date(),  # Todos los Santos
-        datetime(2025, 11, 17).date(),  # Independencia de Cartagena
-        datetime(2025, 12, 8).date(),  # Día de la Inmaculada Concepción
-        datetime(2025, 12, 25).date(),  # Navidad
-    ]
-    
-    # Asegurarnos que la fecha esté en formato date
-    if hasattr(fecha, 'date') and callable(getattr(fecha, 'date')):
-        fecha = fecha.date()
-        
-    return fecha in festivos
-        # En caso de cualquier error, retornar fecha actual
-    print(f"Error obteniendo rango de fechas: {e}")
-    today = datetime.now().date()
-    return today, today
-
-# Función para determinar si un día es laboral (no es fin de semana ni festivo)
-def es_dia_laboral(fecha):
-    # Asegurarnos que la fecha esté en formato date
-    if hasattr(fecha, 'date') and callable(getattr(fecha, 'date')):
-        fecha = fecha.date()
-        
-    # Verificar si no es sábado (5) ni domingo (6)
-    if fecha.weekday() >= 5:
-        return False
-    # Verificar si no es festivo en Colombia
-    if es_festivo_colombia(fecha):
-        return False
-    return True
-
-# Función para calcular días laborables entre dos fechas
-def dias_laborables_entre_fechas(fecha_inicio, fecha_fin):
-    # Asegurarnos que las fechas están en formato date
-    if hasattr(fecha_inicio, 'date') and callable(getattr(fecha_inicio, 'date')):
-        fecha_inicio = fecha_inicio.date()
-    if hasattr(fecha_fin, 'date') and callable(getattr(fecha_fin, 'date')):
-        fecha_fin = fecha_fin.date()
-        
-    dias_laborables = 0
-    fecha_actual = fecha_inicio
-    while fecha_actual <= fecha_fin:
-        if es_dia_laboral(fecha_actual):
-            dias_laborables += 1
-        fecha_actual += timedelta(days=1)
-    return dias_laborables
-
-# Función para generar un reporte en PDF
-def generate_pdf_report(df, report_title, start_date, end_date, selected_personas):
-    class PDF(FPDF):
-        def header(self):
-            # Configuración del encabezado
-            self.set_font('Arial', 'B', 15)
-            self.cell(0, 10, "Reporte de Actividades", 0, 1, 'C')
-            self.set_font('Arial', '', 10)
-            self.cell(0, 10, f"Periodo: {start_date.strftime('%Y-%m-%d')} a {end_date.strftime('%Y-%m-%d')}", 0, 1, 'C')
-            self.ln(5)
-
-        def footer(self):
-            # Configuración del pie de página
-            self.set_y(-15)
-            self.set_font('Arial', 'I', 8)
-            self.cell(0, 10, f'Página {self.page_no()}', 0, 0, 'C')
-
-    # Crear PDF
-    pdf = PDF()
-    pdf.add_page()
-
-    # Título del reporte
-    pdf.set_font('Arial', 'B', 16)
-    pdf.cell(0, 10, report_title, 0, 1)
-    pdf.ln(5)
-
-    # Calcular días laborables en el período
-    dias_lab = dias_laborables_entre_fechas(start_date, end_date)
-
-    # Resumen general
-    pdf.set_font('Arial', 'B', 14)
-    pdf.cell(0, 10, "Resumen General", 0, 1)
-    pdf.set_font('Arial', '', 11)
-
-    total_horas = df['horas'].sum()
-
-    # Calcular promedio diario solo considerando días laborables
-    if dias_lab > 0:
-        promedio_diario_laboral = df.groupby('fecha')['horas'].sum().sum() / dias_lab
-    else:
-        promedio_diario_laboral = 0
-
-    pdf.cell(0, 8, f"Total de horas registradas: {total_horas:.1f}", 0, 1)
-    pdf.cell(0, 8, f"Días laborables en el período: {dias_lab}", 0, 1)
-    pdf.cell(0, 8, f"Promedio diario de horas (días laborables): {promedio_diario_laboral:.1f}", 0, 1)
-    pdf.cell(0, 8, f"Personas incluidas: {', '.join(selected_personas)}", 0, 1)
-    pdf.ln(5)
-
-    # Detalles por persona
-    pdf.set_font('Arial', 'B', 14)
-    pdf.cell(0, 10, "Detalle por Persona", 0, 1)
-
-    for persona in selected_personas:
-        persona_df = df[df['persona'] == persona]
-        if not persona_df.empty:  # Solo mostrar si hay datos para esta persona
-            pdf.set_font('Arial', 'B', 12)
-            pdf.cell(0, 10, f"{persona}", 0, 1)
-            pdf.set_font('Arial', '', 11)
-
-            # Horas totales para esta persona
-            pdf.cell(0, 8, f"Total de horas: {persona_df['horas'].sum():.1f}", 0, 1)
-
-            # Promedio de horas diarias considerando días laborables
-            if dias_lab > 0:
-                promedio_persona = persona_df['horas'].sum() / dias_lab
-                pdf.cell(0, 8, f"Promedio de horas diarias (días laborables): {promedio_persona:.1f}", 0, 1)
-
-            # Tabla de horas por proyecto con promedio diario
-            proyectos_persona = persona_df.groupby('proyecto')['horas'].sum().reset_index()
-            proyectos_persona = proyectos_persona.sort_values('horas', ascending=False)
-
-            # Agregar columna de promedio diario
-            proyectos_persona['promedio_diario'] = proyectos_persona['horas'] / dias_lab if dias_lab > 0 else 0
-
-            pdf.ln(5)
-            pdf.set_font('Arial', 'B', 10)
-            pdf.cell(80, 8, "Proyecto", 1, 0, 'C')
-            pdf.cell(30, 8, "Horas Totales", 1, 0, 'C')
-            pdf.cell(30, 8, "Prom. Diario", 1, 1, 'C')
-
-            pdf.set_font('Arial', '', 10)
-            for _, row in proyectos_persona.iterrows():
-                pdf.cell(80, 8, row['proyecto'], 1, 0)
-                pdf.cell(30, 8, f"{row['horas']:.1f}", 1, 0, 'R')
-                pdf.cell(30, 8, f"{row['promedio_diario']:.1f}", 1, 1, 'R')
-
-            # Tabla de horas por actividad con promedio diario
-            pdf.ln(5)
-            actividades_persona = persona_df.groupby('actividad')['horas'].sum().reset_index()
-            actividades_persona = actividades_persona.sort_values('horas', ascending=False)
-
-            # Agregar columna de promedio diario
-            actividades_persona['promedio_diario'] = actividades_persona['horas'] / dias_lab if dias_lab > 0 else 0
-
-            pdf.set_font('Arial', 'B', 10)
-            pdf.cell(80, 8, "Actividad", 1, 0, 'C')
-            pdf.cell(30, 8, "Horas Totales", 1, 0, 'C')
-            pdf.cell(30, 8, "Prom. Diario", 1, 1, 'C')
-
-            pdf.set_font('Arial', '', 10)
-            for _, row in actividades_persona.iterrows():
-                pdf.cell(80, 8, row['actividad'], 1, 0)
-                pdf.cell(30, 8, f"{row['horas']:.1f}", 1, 0, 'R')
-                pdf.cell(30, 8, f"{row['promedio_diario']:.1f}", 1, 1, 'R')
-
-            pdf.ln(10)
-
-            # Detalle de actividad y proyecto combinados
-            pdf.set_font('Arial', 'B', 11)
-            pdf.cell(0, 8, "Detalle de Actividades por Proyecto", 0, 1)
-
-            # Crear tabla cruzada de actividades y proyectos
-            act_proy_pivot = pd.pivot_table(
-                persona_df,
-                values='horas',
-                index=['actividad'],
-                columns=['proyecto'],
-                aggfunc='sum',
-                fill_value=0
-            ).reset_index()
-
-            # Agregar el promedio diario para cada combinación
-            pdf.set_font('Arial', 'B', 9)
-            header_width = 50
-            column_width = 35
-
-            # Cabecera de la tabla
-            pdf.cell(header_width, 8, "Actividad", 1, 0, 'C')
-
-            # Obtener lista de proyectos para esta persona
-            proyectos_de_persona = sorted(persona_df['proyecto'].unique())
-
-            for proyecto in proyectos_de_persona:
-                pdf.cell(column_width, 4, proyecto, 1, 0, 'C')
-            pdf.ln(4)
-
-            # Segunda línea de la cabecera
-            pdf.cell(header_width, 4, "", 0, 0)
-            for _ in proyectos_de_persona:
-                pdf.cell(column_width / 2, 4, "Total", 1, 0, 'C')
-                pdf.cell(column_width / 2, 4, "Prom", 1, 0, 'C')
-            pdf.ln(4)
-
-            # Contenido de la tabla
-            pdf.set_font('Arial', '', 9)
-            actividades_de_persona = sorted(persona_df['actividad'].unique())
-
-            for actividad in actividades_de_persona:
-                pdf.cell(header_width, 8, actividad, 1, 0)
-
-                for proyecto in proyectos_de_persona:
-                    # Filtrar por actividad y proyecto
-                    horas = persona_df[(persona_df['actividad'] == actividad) &
-                                       (persona_df['proyecto'] == proyecto)]['horas'].sum()
-                    promedio = horas / dias_lab if dias_lab > 0 else 0
-
-                    pdf.cell(column_width / 2, 8, f"{horas:.1f}", 1, 0, 'R')
-                    pdf.cell(column_width / 2, 8, f"{promedio:.1f}", 1, 0, 'R')
-                pdf.ln(8)
-
-            pdf.ln(10)
-
-    # Tabla con datos detallados
-    pdf.add_page()
-    pdf.set_font('Arial', 'B', 14)
-    pdf.cell(0, 10, "Registros Detallados", 0, 1)
-
-    # Preparar una versión simplificada del DataFrame para la tabla
-    df_for_table = df.sort_values(['persona', 'fecha', 'proyecto'])
-
-    # Marcar días no laborables
-    df_for_table['es_laboral'] = df_for_table['fecha'].apply(es_dia_laboral)
-
-    pdf.set_font('Arial', 'B', 8)
-    pdf.cell(25, 8, "Fecha", 1, 0, 'C')
-    pdf.cell(15, 8, "Laboral", 1, 0, 'C')
-    pdf.cell(30, 8, "Persona", 1, 0, 'C')
-    pdf.cell(45, 8, "Proyecto", 1, 0, 'C')
-    pdf.cell(55, 8, "Actividad", 1, 0, 'C')
-    pdf.cell(20, 8, "Horas", 1, 1, 'C')
-
-    pdf.set_font('Arial', '', 8)
-    for _, row in df_for_table.iterrows():
-        pdf.cell(25, 6, str(row['fecha']), 1, 0)
-        pdf.cell(15, 6, "Sí" if row['es_laboral'] else "No", 1, 0, 'C')
-        pdf.cell(30, 6, row['persona'], 1, 0)
-        pdf.cell(45, 6, row['proyecto'], 1, 0)
-        pdf.cell(55, 6, row['actividad'], 1, 0)
-        pdf.cell(20, 6, f"{row['horas']:.1f}", 1, 1, 'R')
-
-    # Agregar página con resumen de días laborables
-    pdf.add_page()
-    pdf.set_font('Arial', 'B', 14)
-    pdf.cell(0, 10, "Calendario de Días Laborables", 0, 1)
-
-    # Crear una lista de todas las fechas en el rango
-    todas_fechas = []
-    fecha_actual = start_date
-    while fecha_actual <= end_date:
-        todas_fechas.append({
-            'fecha': fecha_actual,
-            'es_laboral': es_dia_laboral(fecha_actual),
-            'es_festivo': es_festivo_colombia(fecha_actual),
-            'dia_semana': ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo'][
-                fecha_actual.weekday()]
-        })
-        fecha_actual += timedelta(days=1)
-
-    # Mostrar calendario
-    pdf.set_font('Arial', 'B', 10)
-    pdf.cell(25, 8, "Fecha", 1, 0, 'C')
-    pdf.cell(30, 8, "Día", 1, 0, 'C')
-    pdf.cell(25, 8, "Laborable", 1, 0, 'C')
-    pdf.cell(25, 8, "Festivo", 1, 1, 'C')
-
-    pdf.set_font('Arial', '', 10)
-    for dia in todas_fechas:
-        pdf.cell(25, 6, str(dia['fecha']), 1, 0)
-        pdf.cell(30, 6, dia['dia_semana'], 1, 0)
-        pdf.cell(25, 6, "Sí" if dia['es_laboral'] else "No", 1, 0, 'C')
-        pdf.cell(25, 6, "Sí" if dia['es_festivo'] else "No", 1, 1, 'C')
-
-    pdf.ln(10)
-    pdf.set_font('Arial', 'B', 10)
-    pdf.cell(0, 8, f"Total días en el período: {len(todas_fechas)}", 0, 1)
-    pdf.cell(0, 8, f"Días laborables: {dias_lab}", 0, 1)
-    pdf.cell(0, 8, f"Días no laborables: {len(todas_fechas) - dias_lab}", 0, 1)
-
-    # Crear buffer de bytes para el PDF
-    pdf_bytes = pdf.output(dest='S').encode('latin1')
-    return pdf_bytes
+    # Crear admin por defecto (si otra sesión lo creó primero, se conserva ese)
+    admin_password = "admin123"
+    directorio_usuarios.crear_usuario("admin", {
+        "password": cifrar_contrasena(admin_password),
+        "role": "admin",
+        "nombre_completo": "Administrador del Sistema"
+    })
+    return directorio_usuarios.usuarios()
+
+# Función para mostrar un botón de descarga que serializa los datos solo al hacer clic
+def boton_descarga(contenedor, df, clave, nombre_base, etiqueta, key):
+    formato = contenedor.selectbox("Formato", formatos_disponibles(), key=f"{key}_formato")
+    contenedor.download_button(
+        etiqueta,
+        data=lambda: exportar(clave, formato, df),
+        file_name=f"{nombre_base}.{extension(formato)}",
+        mime=tipo_mime(formato),
+        on_click="ignore",
+        key=key
+    )
 
 # Inicialización del estado de sesión de autenticación
 if 'authenticated' not in st.session_state:
@@ -547,22 +175,73 @@ if 'authenticated' not in st.session_state:
     st.session_state.user_role = None
     st.session_state.nombre_completo = None
 
-# Cargar usuarios al principio
-if 'users' not in st.session_state:
-    st.session_state.users = load_users()
+# Cargar usuarios al principio (solo se releen del disco si cambiaron)
+load_users()
+
+# Función que ejecuta la cola de trabajos para producir un reporte
+def generar_reporte(report_data, report_resumen, report_title, start_date, end_date, personas, max_registros,
+                    progreso=None):
+    pdf_bytes = generate_pdf_report(report_data, report_title, start_date, end_date, personas,
+                                    max_registros_detalle=max_registros, progreso=progreso,
+                                    resumen=report_resumen)
+    return {
+        "pdf": pdf_bytes,
+        "datos": report_data,
+        "periodo": f"{start_date.strftime('%Y-%m-%d')}_a_{end_date.strftime('%Y-%m-%d')}"
+    }
+
+# Función para mostrar el estado del reporte solicitado en la sesión
+def mostrar_estado_reporte(clave):
+    trabajo = obtener_cola().obtener(clave)
+    if trabajo is None:
+        return
+
+    if trabajo.en_curso:
+        # Se consulta el avance cada segundo sin bloquear el resto de la página
+        @st.fragment(run_every=1)
+        def panel_avance():
+            actual = obtener_cola().obtener(clave)
+            if actual is None or not actual.en_curso:
+                st.rerun()
+            st.progress(actual.progreso, text=f"{actual.descripcion}: {actual.mensaje}")
+
+        panel_avance()
+    elif trabajo.estado == "error":
+        st.error(f"Error al generar el reporte: {trabajo.mensaje}")
+        st.info("Por favor, intenta con un rango de fechas diferente o contacta al administrador.")
+    else:
+        resultado = trabajo.resultado
+        st.success(f"Reporte generado con {len(resultado['datos'])} registros "
+                   f"({trabajo.terminado - trabajo.creado:.1f} s)")
+
+        # Botón de descarga para el PDF (los bytes ya están en el resultado del trabajo)
+        st.download_button("📥 Descargar Reporte PDF", data=resultado["pdf"],
+                           file_name=f"reporte_{resultado['periodo']}.pdf", mime="application/pdf",
+                           on_click="ignore")
+
+        # También ofrecer la descarga de los datos del reporte
+        boton_descarga(st, resultado["datos"], clave, f"datos_reporte_{resultado['periodo']}",
+                       "📥 Descargar Datos del Reporte", key="descarga_reporte")
 
 # Función para autenticar usuario
 def authenticate_user(username, password):
-    users = st.session_state.users
-    if username in users:
-        stored_password = base64.b64decode(users[username]["password"])
-        if verify_password(stored_password, password):
-            st.session_state.authenticated = True
-            st.session_state.username = username
-            st.session_state.user_role = users[username].get("role", "user")
-            st.session_state.nombre_completo = users[username].get("nombre_completo", username)
-            return True
-    return False
+    inicio = time.perf_counter()
+    try:
+        user_info = directorio_usuarios.obtener(username)
+        if user_info is not None:
+            stored_password = user_info["password"]
+            if verificar_contrasena(stored_password, password):
+                # Los hashes con otro algoritmo o costo se recalculan con la configuración actual
+                if necesita_actualizar(stored_password):
+                    directorio_usuarios.modificar_usuario(username, {"password": cifrar_contrasena(password)})
+                st.session_state.authenticated = True
+                st.session_state.username = username
+                st.session_state.user_role = user_info.get("role", "user")
+                st.session_state.nombre_completo = user_info.get("nombre_completo", username)
+                return True
+        return False
+    finally:
+        latencias_login.registrar(time.perf_counter() - inicio)
 
 # Función para cerrar sesión
 def logout():
@@ -586,22 +265,21 @@ if not st.session_state.authenticated:
         with col1:
             if st.button("Iniciar Sesión", use_container_width=True):
                 if authenticate_user(username, password):
-                    st.success(f"¡Bienvenido {st.session_state.nombre_completo}!")
-                    time.sleep(1)  # Esperar un segundo para mostrar el mensaje
                     st.rerun()
                 else:
                     st.error("Usuario o contraseña incorrectos.")
     
     with register_tab:
         # Solo permitir registro si hay un administrador que pueda verificar o si es la configuración inicial
-        if not st.session_state.users or any(user.get("role") == "admin" for user in st.session_state.users.values()):
+        users = directorio_usuarios.usuarios()
+        if not users or any(user.get("role") == "admin" for user in users.values()):
             new_username = st.text_input("Nuevo Usuario", key="reg_username")
             new_password = st.text_input("Nueva Contraseña", type="password", key="reg_password")
             confirm_password = st.text_input("Confirmar Contraseña", type="password", key="confirm_password")
             nombre_completo = st.text_input("Nombre Completo", key="nombre_completo")
             
             # Si no hay usuarios, permitir crear un administrador
-            #if not st.session_state.users:
+            #if not directorio_usuarios.usuarios():
             #    is_admin = st.checkbox("Crear como administrador", value=True)
             #else:
             #    is_admin = st.checkbox("Crear como administrador", value=False)
@@ -609,25 +287,25 @@ if not st.session_state.authenticated:
             if st.button("Registrarse", use_container_width=True):
                 if new_password != confirm_password:
                     st.error("Las contraseñas no coinciden.")
-                elif new_username in st.session_state.users:
+                elif new_username in directorio_usuarios.usuarios():
                     st.error("El nombre de usuario ya existe.")
                 elif not new_username or not new_password:
                     st.error("El usuario y la contraseña son obligatorios.")
                 else:
                     # Hash de la nueva contraseña
-                    hashed_password = hash_password(new_password)
+                    hashed_password = cifrar_contrasena(new_password)
                     
-                    # Agregar nuevo usuario
-                    st.session_state.users[new_username] = {
-                        "password": base64.b64encode(hashed_password).decode('utf-8'),
+                    # Agregar nuevo usuario (sobre la versión guardada, no sobre la copia de la sesión)
+                    creado = directorio_usuarios.crear_usuario(new_username, {
+                        "password": hashed_password,
                         "role": "admin" if is_admin else "user",
                         "nombre_completo": nombre_completo if nombre_completo else new_username
-                    }
-                    
-                    # Guardar usuarios
-                    save_users(st.session_state.users)
-                    
-                    st.success(f"Usuario {new_username} registrado correctamente. Ahora puedes iniciar sesión.")
+                    })
+
+                    if creado:
+                        st.success(f"Usuario {new_username} registrado correctamente. Ahora puedes iniciar sesión.")
+                    else:
+                        st.error("El nombre de usuario ya existe.")
         else:
             st.info("El registro de nuevos usuarios está disponible solo para administradores. Por favor, contacte con un administrador.")
     
@@ -635,27 +313,15 @@ if not st.session_state.authenticated:
     st.stop()  # Detener la ejecución si no hay autenticación
 
 # Si el usuario está autenticado, continuar con la aplicación
-# Inicialización de datos en la sesión
-if 'data' not in st.session_state:
-    if os.path.exists(CSV_FILE):
-        # Cargar el CSV asegurando que las fechas se interpreten correctamente
-        st.session_state.data = pd.read_csv(CSV_FILE)
-        
-        # Convertir explícitamente la columna 'fecha' a datetime con formato flexible
-        try:
-            # Primero intentamos con formato ISO
-            st.session_state.data['fecha'] = pd.to_datetime(st.session_state.data['fecha'], format='ISO8601')
-        except ValueError:
-            try:
-                # Si falla, intentamos con formato personalizado
-                st.session_state.data['fecha'] = pd.to_datetime(st.session_state.data['fecha'], format='%Y-%m-%d')
-            except ValueError:
-                # Si todavía falla, usamos el modo 'mixed' muy flexible
-                st.session_state.data['fecha'] = pd.to_datetime(st.session_state.data['fecha'], format='mixed')
+# Almacén de actividades compartido por todas las sesiones del proceso
+almacen = obtener_almacen_sqlite(DB_FILE) if DB_FILE else obtener_almacen(CSV_FILE)
 
-        # Obtener personas y proyectos del CSV
-        personas = sorted(st.session_state.data['persona'].unique().tolist())
-        proyectos = sorted(st.session_state.data['proyecto'].unique().tolist())
+# Inicialización de datos en la sesión
+if 'proyectos' not in st.session_state:
+    if almacen.existe():
+        # Obtener personas y proyectos registrados
+        personas = almacen.valores('persona')
+        proyectos = almacen.valores('proyecto')
 
         # Asignar actividades por defecto (puedes ajustar esto según tus datos reales)
         st.session_state.actividades_personalizadas = {
@@ -665,13 +331,16 @@ if 'data' not in st.session_state:
         st.session_state.proyectos = proyectos
         st.session_state.password_verified = False
     else:
-        # Crear un DataFrame vacío si no existe el archivo
-        st.session_state.data = pd.DataFrame(columns=["fecha", "persona", "actividad", "proyecto", "horas"])
         st.session_state.actividades_personalizadas = {}
         st.session_state.proyectos = ["Proyecto 1", "Proyecto 2", "Administrativo"]
         st.session_state.password_verified = False
         # Guardar el archivo vacío
-        st.session_state.data.to_csv(CSV_FILE, index=False)
+        almacen.inicializar()
+
+# Rango de fechas registrado (se usa en los filtros; hoy si aún no hay datos)
+min_date, max_date = almacen.rango_fechas()
+if min_date is None:
+    min_date = max_date = datetime.now().date()
 
 # Función para determinar si el usuario actual puede ver los datos de una persona
 def puede_ver_datos_persona(username, persona, user_role):
@@ -703,6 +372,8 @@ st.sidebar.title("Opciones")
 available_tabs = ["Filtros", "Generación de Reportes", "Gestión de Actividades", "Gestión de Proyectos"]
 if st.session_state.user_role == "admin":
     available_tabs.append("Administración de Usuarios")
+    available_tabs.append("Importar Históricos")
+    available_tabs.append("Rendimiento")
 
 sidebar_tab = st.sidebar.radio("", available_tabs)
 
@@ -713,7 +384,7 @@ if sidebar_tab == "Filtros":
     st.sidebar.header("Filtros de Datos")
 
     # Obtener lista de personas según el rol del usuario
-    all_personas = sorted(st.session_state.data['persona'].unique().tolist())
+    all_personas = almacen.valores('persona')
     if st.session_state.user_role == "admin":
         available_personas = all_personas
     else:
@@ -721,13 +392,6 @@ if sidebar_tab == "Filtros":
         available_personas = [st.session_state.username]
 
     # Filtro de fechas
-    if not st.session_state.data.empty:
-        # Usar nuestra función segura para obtener las fechas
-        min_date, max_date = get_safe_date_range(st.session_state.data)
-    else:
-        min_date = datetime.now().date()
-        max_date = datetime.now().date()
-        
     selected_dates = st.sidebar.date_input(
         "Rango de fechas",
         value=(min_date, max_date),
@@ -741,13 +405,8 @@ if sidebar_tab == "Filtros":
         # Convertir las fechas al mismo formato que las fechas en el DataFrame
         start_date = pd.to_datetime(start_date)
         end_date = pd.to_datetime(end_date)
-
-        filtered_df = st.session_state.data[
-            (st.session_state.data['fecha'] >= start_date) &
-            (st.session_state.data['fecha'] <= end_date)
-            ]
     else:
-        filtered_df = st.session_state.data.copy()
+        start_date = end_date = None
 
     # Filtro de personas (según permisos)
     selected_personas = st.sidebar.multiselect(
@@ -756,25 +415,27 @@ if sidebar_tab == "Filtros":
         default=available_personas
     )
 
-    if selected_personas:
-        filtered_df = filtered_df[filtered_df['persona'].isin(selected_personas)]
-
     # Filtro de proyectos
-    all_proyectos = sorted(
-        st.session_state.data['proyecto'].unique().tolist()) if not st.session_state.data.empty else []
+    all_proyectos = almacen.valores('proyecto')
     selected_proyectos = st.sidebar.multiselect(
         "Proyectos",
         all_proyectos,
         default=all_proyectos
     )
 
-    if selected_proyectos:
-        filtered_df = filtered_df[filtered_df['proyecto'].isin(selected_proyectos)]
+    # Los gráficos se calculan sobre el resumen diario; los datos crudos solo para la tabla detallada
+    # La versión se lee antes de consultar: si otra sesión escribe entretanto, los agregados quedan bajo la
+    # versión anterior (y se recalculan en el siguiente rerun), nunca datos viejos bajo la versión nueva
+    version_datos = almacen.version
+    with metricas.medir("filtros.resumen") as medicion:
+        filtered_resumen = almacen.consultar_resumen(start_date, end_date, selected_personas, selected_proyectos)
+        medicion.filas = len(filtered_resumen)
 
     # Filtro dinámico de actividades basado en las personas seleccionadas
-    if selected_personas and not filtered_df.empty:
+    selected_actividades = []
+    if selected_personas and not filtered_resumen.empty:
         # Recopilar todas las actividades de las personas seleccionadas
-        actividades_disponibles = filtered_df['actividad'].unique().tolist()
+        actividades_disponibles = filtered_resumen['actividad'].unique().tolist()
         selected_actividades = st.sidebar.multiselect(
             "Actividades",
             sorted(actividades_disponibles),
@@ -782,11 +443,19 @@ if sidebar_tab == "Filtros":
         )
 
         if selected_actividades:
-            filtered_df = filtered_df[filtered_df['actividad'].isin(selected_actividades)]
+            with metricas.medir("filtros.actividades", filas=len(filtered_resumen)):
+                filtered_resumen = filtrar_actividades(filtered_resumen, actividades=selected_actividades)
+
+    with metricas.medir("filtros.detalle") as medicion:
+        filtered_df = almacen.consultar(start_date, end_date, selected_personas, selected_proyectos,
+                                        selected_actividades)
+        medicion.filas = len(filtered_df)
 
-    # Link para descargar datos filtrados
-    st.sidebar.markdown(get_download_link(filtered_df, "datos_actividades.csv",
-                                          "📥 Descargar datos filtrados"), unsafe_allow_html=True)
+    # Botón para descargar datos filtrados (se serializan solo al pedir la descarga)
+    clave_filtros = (version_datos, tuple(selected_dates), tuple(selected_personas), tuple(selected_proyectos),
+                     tuple(selected_actividades))
+    boton_descarga(st.sidebar, filtered_df, clave_filtros, "datos_actividades",
+                   "📥 Descargar datos filtrados", key="descarga_filtrados")
 
 elif sidebar_tab == "Generación de Reportes":
     st.sidebar.header("Configuración del Reporte")
@@ -799,13 +468,6 @@ elif sidebar_tab == "Generación de Reportes":
             "Solo los administradores pueden generar reportes. Contacta con un administrador si necesitas acceso.")
     else:
         # Filtro de fechas para el reporte
-        if not st.session_state.data.empty:
-            # Usar nuestra función segura para obtener las fechas
-            min_date, max_date = get_safe_date_range(st.session_state.data)
-        else:
-            min_date = datetime.now().date()
-            max_date = datetime.now().date()
-            
         report_dates = st.sidebar.date_input(
             "Rango de fechas para el reporte",
             value=(min_date, max_date),
@@ -814,8 +476,7 @@ elif sidebar_tab == "Generación de Reportes":
         )
 
         # Filtro de personas para el reporte (según permisos)
-        all_personas = sorted(
-            st.session_state.data['persona'].unique().tolist()) if not st.session_state.data.empty else []
+        all_personas = almacen.valores('persona')
         report_personas = st.sidebar.multiselect(
             "Personas a incluir en el reporte",
             all_personas,
@@ -825,6 +486,14 @@ elif sidebar_tab == "Generación de Reportes":
         # Título del reporte
         report_title = st.sidebar.text_input("Título del reporte", "Reporte de Actividades")
 
+        # Límite de filas en la sección de registros detallados (el CSV siempre trae todas)
+        report_max_registros = st.sidebar.number_input(
+            "Máximo de registros detallados en el PDF",
+            min_value=1,
+            value=MAX_REGISTROS_DETALLE,
+            step=500
+        )
+
         # Sección de verificación de contraseña
         st.sidebar.markdown('<div class="password-container">', unsafe_allow_html=True)
         st.sidebar.subheader("Verificación de Seguridad")
@@ -863,36 +532,23 @@ elif sidebar_tab == "Generación de Reportes":
             report_start_date = pd.to_datetime(report_start_date)
             report_end_date = pd.to_datetime(report_end_date)
 
-            # Filtrar datos para el reporte
-            report_data = st.session_state.data[
-                (st.session_state.data['fecha'] >= report_start_date) &
-                (st.session_state.data['fecha'] <= report_end_date) &
-                (st.session_state.data['persona'].isin(report_personas))
-                ]
+            # Filtrar datos para el reporte (las cifras salen del resumen diario); la versión, antes de consultar
+            version_datos = almacen.version
+            report_data = almacen.consultar(report_start_date, report_end_date, report_personas)
+            report_resumen = almacen.consultar_resumen(report_start_date, report_end_date, report_personas)
 
             if report_data.empty:
                 st.sidebar.error("No hay datos disponibles para el reporte con los filtros seleccionados.")
             else:
-                try:
-                    # Generar PDF
-                    pdf_bytes = generate_pdf_report(report_data, report_title, report_start_date, report_end_date,
-                                                    report_personas)
-
-                    # Crear link de descarga para el PDF
-                    report_filename = f"reporte_{report_start_date.strftime('%Y-%m-%d')}_a_{report_end_date.strftime('%Y-%m-%d')}.pdf"
-                    st.sidebar.markdown(get_pdf_download_link(pdf_bytes, report_filename,
-                                                            "📥 Descargar Reporte PDF"), unsafe_allow_html=True)
-
-                    # También ofrecer la opción de descarga en CSV
-                    st.sidebar.markdown(get_download_link(report_data,
-                                                        f"datos_reporte_{report_start_date.strftime('%Y-%m-%d')}_a_{report_end_date.strftime('%Y-%m-%d')}.csv",
-                                                        "📥 Descargar Datos del Reporte (CSV)"), unsafe_allow_html=True)
-
-                    # Mostrar una vista previa
-                    st.sidebar.success(f"Reporte generado con {len(report_data)} registros")
-                except Exception as e:
-                    st.sidebar.error(f"Error al generar el reporte: {str(e)}")
-                    st.sidebar.info("Por favor, intenta con un rango de fechas diferente o contacta al administrador.")
+                # Los reportes idénticos (mismos parámetros y misma versión de datos) se reutilizan
+                clave_reporte = (report_start_date, report_end_date, tuple(report_personas), report_title,
+                                 int(report_max_registros), version_datos)
+                obtener_cola().enviar(
+                    clave_reporte, generar_reporte, report_data, report_resumen, report_title, report_start_date,
+                    report_end_date, report_personas, int(report_max_registros),
+                    descripcion=f"{report_title} ({report_start_date.strftime('%Y-%m-%d')} a {report_end_date.strftime('%Y-%m-%d')})"
+                )
+                st.session_state.reporte_clave = clave_reporte
 
 elif sidebar_tab == "Gestión de Actividades":
     st.sidebar.header("Personalizar Actividades")
@@ -990,7 +646,7 @@ elif sidebar_tab == "Administración de Usuarios" and st.session_state.user_role
 
     if admin_action == "Ver Usuarios":
         st.sidebar.subheader("Usuarios del Sistema")
-        for username, user_info in st.session_state.users.items():
+        for username, user_info in directorio_usuarios.usuarios().items():
             st.sidebar.markdown(f"""
             **Usuario:** {username}  
             **Nombre:** {user_info.get('nombre_completo', username)}  
@@ -998,6 +654,14 @@ elif sidebar_tab == "Administración de Usuarios" and st.session_state.user_role
             ---
             """)
 
+        # Latencia de inicio de sesión de este proceso
+        percentiles = latencias_login.percentiles()
+        if percentiles:
+            st.sidebar.caption(
+                f"Inicio de sesión ({len(latencias_login)} intentos): " +
+                " | ".join(f"p{p}: {segundos * 1000:.0f} ms" for p, segundos in percentiles.items())
+            )
+
     elif admin_action == "Crear Usuario":
         st.sidebar.subheader("Crear Nuevo Usuario")
         new_username = st.sidebar.text_input("Nombre de Usuario")
@@ -1011,29 +675,30 @@ elif sidebar_tab == "Administración de Usuarios" and st.session_state.user_role
                 st.sidebar.error("Usuario y contraseña son obligatorios.")
             elif new_password != confirm_password:
                 st.sidebar.error("Las contraseñas no coinciden.")
-            elif new_username in st.session_state.users:
+            elif new_username in directorio_usuarios.usuarios():
                 st.sidebar.error("El nombre de usuario ya existe.")
             else:
                 # Hash la contraseña
-                hashed_password = hash_password(new_password)
+                hashed_password = cifrar_contrasena(new_password)
 
                 # Agregar usuario
-                st.session_state.users[new_username] = {
-                    "password": base64.b64encode(hashed_password).decode('utf-8'),
+                creado = directorio_usuarios.crear_usuario(new_username, {
+                    "password": hashed_password,
                     "role": new_role,
                     "nombre_completo": new_nombre if new_nombre else new_username
-                }
+                })
 
-                # Guardar cambios
-                save_users(st.session_state.users)
-                st.sidebar.success(f"Usuario {new_username} creado correctamente.")
+                if creado:
+                    st.sidebar.success(f"Usuario {new_username} creado correctamente.")
+                else:
+                    st.sidebar.error("El nombre de usuario ya existe.")
 
     elif admin_action == "Modificar Usuario":
         st.sidebar.subheader("Modificar Usuario")
-        user_to_modify = st.sidebar.selectbox("Seleccionar Usuario", list(st.session_state.users.keys()))
+        user_to_modify = st.sidebar.selectbox("Seleccionar Usuario", list(directorio_usuarios.usuarios().keys()))
 
         if user_to_modify:
-            user_info = st.session_state.users[user_to_modify]
+            user_info = directorio_usuarios.usuarios()[user_to_modify]
             new_nombre = st.sidebar.text_input("Nombre Completo",
                                                value=user_info.get("nombre_completo", user_to_modify))
             new_role = st.sidebar.selectbox("Rol", ["user", "admin"], index=0 if user_info.get("role") == "user" else 1)
@@ -1044,6 +709,7 @@ elif sidebar_tab == "Administración de Usuarios" and st.session_state.user_role
                 confirm_password = st.sidebar.text_input("Confirmar Nueva Contraseña", type="password")
 
             if st.sidebar.button("Guardar Cambios"):
+                cambios = {}
                 if change_password:
                     if not new_password:
                         st.sidebar.error("La contraseña no puede estar vacía.")
@@ -1051,21 +717,23 @@ elif sidebar_tab == "Administración de Usuarios" and st.session_state.user_role
                         st.sidebar.error("Las contraseñas no coinciden.")
                     else:
                         # Actualizar contraseña
-                        hashed_password = hash_password(new_password)
-                        st.session_state.users[user_to_modify]["password"] = base64.b64encode(hashed_password).decode(
-                            'utf-8')
+                        cambios["password"] = cifrar_contrasena(new_password)
 
                 # Actualizar otros datos
-                st.session_state.users[user_to_modify]["nombre_completo"] = new_nombre
-                st.session_state.users[user_to_modify]["role"] = new_role
+                cambios["nombre_completo"] = new_nombre
+                cambios["role"] = new_role
+
+                # Guardar solo los campos modificados sobre la versión guardada
+                modificado = directorio_usuarios.modificar_usuario(user_to_modify, cambios)
 
-                # Guardar cambios
-                save_users(st.session_state.users)
-                st.sidebar.success(f"Usuario {user_to_modify} modificado correctamente.")
+                if modificado:
+                    st.sidebar.success(f"Usuario {user_to_modify} modificado correctamente.")
+                else:
+                    st.sidebar.error(f"El usuario {user_to_modify} ya no existe.")
 
     elif admin_action == "Eliminar Usuario":
         st.sidebar.subheader("Eliminar Usuario")
-        user_to_delete = st.sidebar.selectbox("Seleccionar Usuario", list(st.session_state.users.keys()))
+        user_to_delete = st.sidebar.selectbox("Seleccionar Usuario", list(directorio_usuarios.usuarios().keys()))
 
         if user_to_delete:
             if user_to_delete == st.session_state.username:
@@ -1074,30 +742,35 @@ elif sidebar_tab == "Administración de Usuarios" and st.session_state.user_role
                 if st.sidebar.button(f"Eliminar Usuario {user_to_delete}"):
                     # Confirmar eliminación
                     if st.sidebar.checkbox("Confirmar eliminación (esta acción no se puede deshacer)"):
-                        del st.session_state.users[user_to_delete]
-                        save_users(st.session_state.users)
+                        directorio_usuarios.eliminar_usuario(user_to_delete)
                         st.sidebar.success(f"Usuario {user_to_delete} eliminado correctamente.")
 
 # Contenido principal basado en la pestaña seleccionada
 if sidebar_tab == "Filtros":
+    # Las figuras (y plotly) solo se cargan la primera vez que se abre esta pestaña en el proceso
+    import graficos
+
     # Evitar errores si no hay datos después de filtrar
     if filtered_df.empty:
         st.warning("No hay datos que mostrar con los filtros actuales.")
     else:
+        # Los agregados se memorizan por estado de filtros y se comparten entre sesiones
+        def agregado(nombre):
+            with metricas.medir(f"agregado.{nombre}"):
+                return obtener_agregado(clave_filtros, nombre, filtered_resumen)
+
         col1, col2 = st.columns(2)
-        fecha_max = filtered_df['fecha'].max()
-        fecha_inicio_30 = fecha_max - pd.Timedelta(days=29)
-        ultimos_30_df = filtered_df[filtered_df['fecha'] >= fecha_inicio_30]
+        ultimos_dias = agregado('ultimos_dias')
 
         # Métricas principales
         with col1:
             st.markdown('<div class="metric-container">', unsafe_allow_html=True)
-            st.metric("Total Horas Registradas", f"{filtered_df['horas'].sum():.1f}")
+            st.metric("Total Horas Registradas", f"{agregado('total_horas'):.1f}")
             st.markdown('</div>', unsafe_allow_html=True)
 
         with col2:
             st.markdown('<div class="metric-container">', unsafe_allow_html=True)
-            promedio_horas_diarias = filtered_df.groupby('fecha')['horas'].sum().mean()
+            promedio_horas_diarias = agregado('promedio_diario')
             st.metric("Promedio Horas Diarias", f"{promedio_horas_diarias:.1f}")
             st.markdown('</div>', unsafe_allow_html=True)
 
@@ -1107,107 +780,61 @@ if sidebar_tab == "Filtros":
         col1, col2 = st.columns(2)
 
         with col1:
-            # Filtrar solo los últimos 30 días desde hoy
-            fecha_max = filtered_df['fecha'].max()
-            fecha_inicio_30 = fecha_max - pd.Timedelta(days=29)
-
-            ultimos_30_df = filtered_df[filtered_df['fecha'] >= fecha_inicio_30]
-
-            # Agrupar por actividad solo en ese rango
-            actividad_data = ultimos_30_df.groupby('actividad')['horas'].sum().reset_index()
-
-            fig_act = px.pie(
-                actividad_data,
-                values='horas',
-                names='actividad',
-                title='Distribución de Horas por Actividad (Últimos 30 días)',
-                color_discrete_sequence=px.colors.qualitative.Set3
-            )
-
-            fig_act.update_traces(textposition='inside', textinfo='percent+label')
-            st.plotly_chart(fig_act, use_container_width=True)
+            # Horas por actividad en los últimos 30 días
+            graficos.mostrar('actividad', clave_filtros,
+                             lambda: graficos.torta_actividades(ultimos_dias['actividad']))
 
         with col2:
             # Gráfico de distribución de horas por persona
-            persona_data = ultimos_30_df.groupby('persona')['horas'].sum().reset_index()
-            fig_per = px.bar(
-                persona_data,
-                x='persona',
-                y='horas',
-                title='Horas Totales por Persona (Últimos 30 días)',
-                color='persona',
-                color_discrete_sequence=px.colors.qualitative.Bold
-            )
-            st.plotly_chart(fig_per, use_container_width=True)
+            graficos.mostrar('persona', clave_filtros, lambda: graficos.barras_personas(ultimos_dias['persona']))
 
         # Sección de distribución por proyectos
         st.markdown('<div class="section-header">Distribución por Proyectos</div>',
                     unsafe_allow_html=True)
 
         # Gráfico de distribución de horas por proyecto
-        proyecto_data = ultimos_30_df.groupby('proyecto')['horas'].sum().reset_index()
-        fig_proy = px.bar(
-            proyecto_data,
-            x='proyecto',
-            y='horas',
-            title='Horas Totales por Proyecto (Últimos 30 días)',
-            color='proyecto',
-            color_discrete_sequence=px.colors.qualitative.Pastel
-        )
-        st.plotly_chart(fig_proy, use_container_width=True)
+        graficos.mostrar('proyecto', clave_filtros, lambda: graficos.barras_proyectos(ultimos_dias['proyecto']))
 
         # Matriz de proyectos y personas
         st.markdown('<div class="section-header">Matriz Proyectos-Personas</div>',
                     unsafe_allow_html=True)
 
-        # Crear una tabla cruzada de proyectos por personas
-        matriz_proy_pers = pd.pivot_table(
-            filtered_df,
-            values='horas',
-            index='proyecto',
-            columns='persona',
-            aggfunc='sum',
-            fill_value=0
-        )
-
-        # Mostrar como heatmap
-        fig_matriz = px.imshow(
-            matriz_proy_pers,
-            text_auto='.1f',
-            color_continuous_scale='Blues',
-            title='Distribución de Horas por Proyecto y Persona'
-        )
-        fig_matriz.update_layout(height=400)
-        st.plotly_chart(fig_matriz, use_container_width=True)
+        # Tabla cruzada de proyectos por personas, mostrada como heatmap
+        graficos.mostrar('matriz', clave_filtros,
+                         lambda: graficos.matriz_proyecto_persona(agregado('matriz_proyecto_persona')))
 
         # Sección 2: Evolución Temporal
         st.markdown('<div class="section-header">Evolución Temporal de Actividades</div>',
                     unsafe_allow_html=True)
 
-        # Gráfico de línea de horas diarias
-        daily_hours = filtered_df.groupby(['fecha', 'persona'])['horas'].sum().reset_index()
-        fig_evol = px.line(
-            daily_hours,
-            x='fecha',
-            y='horas',
-            color='persona',
-            title='Evolución de Horas Registradas por Día',
-            markers=True
-        )
-        st.plotly_chart(fig_evol, use_container_width=True)
+        # Granularidad automática según el rango visible (se puede fijar a mano) y promedio móvil opcional
+        col1, col2 = st.columns(2)
+        with col1:
+            granularidad_automatica = elegir_granularidad(filtered_resumen['fecha'].iat[0],
+                                                          filtered_resumen['fecha'].iat[-1])
+            opcion_granularidad = st.selectbox(
+                "Agrupar por",
+                [f"Automático ({granularidad_automatica})"] + list(GRANULARIDADES)
+            )
+            granularidad = opcion_granularidad if opcion_granularidad in GRANULARIDADES else granularidad_automatica
+        with col2:
+            ventana_promedio = st.slider("Promedio móvil (períodos)", min_value=1, max_value=12, value=1,
+                                         help="1 = sin promedio")
+
+        # Gráfico de línea de horas por persona (agrupado y reducido en el servidor)
+        graficos.mostrar(
+            'evolucion_persona', (clave_filtros, granularidad, ventana_promedio),
+            lambda: graficos.evolucion(
+                serie_evolucion(clave_filtros, agregado('diario_persona'), 'persona', granularidad, ventana_promedio),
+                'persona', f'Evolución de Horas Registradas por {granularidad}'))
 
         # Evolución por proyecto
-        daily_hours_proyecto = filtered_df.groupby(['fecha', 'proyecto'])[
-            'horas'].sum().reset_index()
-        fig_evol_proy = px.line(
-            daily_hours_proyecto,
-            x='fecha',
-            y='horas',
-            color='proyecto',
-            title='Evolución de Horas por Proyecto',
-            markers=True
-        )
-        st.plotly_chart(fig_evol_proy, use_container_width=True)
+        graficos.mostrar(
+            'evolucion_proyecto', (clave_filtros, granularidad, ventana_promedio),
+            lambda: graficos.evolucion(
+                serie_evolucion(clave_filtros, agregado('diario_proyecto'), 'proyecto', granularidad,
+                                ventana_promedio),
+                'proyecto', 'Evolución de Horas por Proyecto'))
 
         # Sección 4: Tabla de Datos Detallados
         st.markdown('<div class="section-header">Datos Detallados</div>',
@@ -1215,15 +842,40 @@ if sidebar_tab == "Filtros":
 
         # Añadir un input para filtrar por texto
         search_term = st.text_input("Buscar en los datos:", "")
-        if search_term:
-            search_results = filtered_df[
-                filtered_df['persona'].str.contains(search_term, case=False) |
-                filtered_df['actividad'].str.contains(search_term, case=False) |
-                filtered_df['proyecto'].str.contains(search_term, case=False)
-                ]
-            st.dataframe(search_results, use_container_width=True)
-        else:
-            st.dataframe(filtered_df, use_container_width=True)
+        # La búsqueda usa el índice de texto del almacén (sin tildes ni mayúsculas, todos los términos)
+        with metricas.medir("filtros.busqueda") as medicion:
+            ids_encontrados = (almacen.buscar(search_term, start_date, end_date, selected_personas,
+                                              selected_proyectos, selected_actividades) if search_term else None)
+            if ids_encontrados is not None:
+                search_results = filas_con_ids(filtered_df, ids_encontrados)
+            else:
+                search_results = filtered_df
+            medicion.filas = len(search_results)
+
+        # Controles de orden y tamaño de página (solo se envía la página visible)
+        col1, col2, col3 = st.columns([3, 2, 2])
+        with col1:
+            columnas_orden = {"Orden de registro": None, "Fecha": "fecha", "Persona": "persona",
+                              "Actividad": "actividad", "Proyecto": "proyecto", "Horas": "horas"}
+            columna_orden = columnas_orden[st.selectbox("Ordenar por", list(columnas_orden))]
+        with col2:
+            ascendente = st.radio("Sentido", ["Ascendente", "Descendente"], horizontal=True) == "Ascendente"
+        with col3:
+            tamano_pagina = st.selectbox("Filas por página", TAMANOS_PAGINA, index=1)
+
+        # Si los filtros reducen el número de páginas, volver a la última disponible
+        paginas = total_paginas(len(search_results), tamano_pagina)
+        if st.session_state.get('pagina_detalle', 1) > paginas:
+            st.session_state.pagina_detalle = paginas
+        # Sin value: el estado de la clave manda (la primera vez, min_value)
+        numero_pagina = st.number_input(f"Página (de {paginas})", min_value=1, max_value=paginas,
+                                        key='pagina_detalle')
+
+        orden = orden_filas((clave_filtros, search_term), search_results, columna_orden, ascendente)
+        inicio_pagina = (numero_pagina - 1) * tamano_pagina
+        st.caption(f"Registros {min(inicio_pagina + 1, len(search_results))}–"
+                   f"{min(inicio_pagina + tamano_pagina, len(search_results))} de {len(search_results)}")
+        st.dataframe(pagina(search_results, orden, numero_pagina, tamano_pagina), use_container_width=True)
 
 elif sidebar_tab == "Generación de Reportes":
     # Contenido principal para la pestaña de generación de reportes
@@ -1240,7 +892,7 @@ elif sidebar_tab == "Generación de Reportes":
                 <li>Elige las personas que deseas incluir en el reporte.</li>
                 <li>Establece un título para tu reporte.</li>
                 <li>Haz clic en el botón "Generar Reporte".</li>
-                <li>Una vez generado, podrás descargar el reporte en formato PDF o los datos en CSV.</li>
+                <li>El reporte se genera en segundo plano; una vez listo, podrás descargarlo en formato PDF o los datos en CSV.</li>
             </ol>
             <p>Los reportes incluyen:</p>
             <ul>
@@ -1255,6 +907,10 @@ elif sidebar_tab == "Generación de Reportes":
                     unsafe_allow_html=True)
         st.info(
             "Configura las opciones del reporte en la barra lateral y haz clic en 'Generar Reporte' para crear tu informe personalizado.")
+
+        # Estado del último reporte solicitado (se genera en segundo plano)
+        if st.session_state.get('reporte_clave') is not None:
+            mostrar_estado_reporte(st.session_state.reporte_clave)
     else:
         st.warning(
             "Solo los administradores pueden generar reportes. Si necesitas un reporte de tus actividades, contacta con un administrador.")
@@ -1281,7 +937,7 @@ elif sidebar_tab == "Administración de Usuarios" and st.session_state.user_role
     st.subheader("Lista de Usuarios")
 
     users_data = []
-    for username, info in st.session_state.users.items():
+    for username, info in directorio_usuarios.usuarios().items():
         users_data.append({
             "Usuario": username,
             "Nombre Completo": info.get("nombre_completo", username),
@@ -1291,8 +947,92 @@ elif sidebar_tab == "Administración de Usuarios" and st.session_state.user_role
     users_df = pd.DataFrame(users_data)
     st.dataframe(users_df, use_container_width=True)
 
+elif sidebar_tab == "Importar Históricos" and st.session_state.user_role == "admin":
+    st.markdown('<div class="section-header">Importar Planillas Históricas</div>',
+                unsafe_allow_html=True)
+    st.markdown(
+        "Sube un archivo CSV o XLSX con las columnas **fecha, persona, actividad, proyecto, horas**. "
+        "El archivo se procesa por bloques; las filas ya registradas (misma fecha, persona, actividad y "
+        "proyecto) se omiten y las filas inválidas se pueden descargar con su motivo."
+    )
+
+    archivo_historico = st.file_uploader("Archivo histórico", type=["csv", "xlsx"], key="archivo_historico")
+    dia_primero = st.checkbox("Las fechas ambiguas son día/mes/año (p. ej. 03/04/2019 = 3 de abril)", value=True)
+
+    if archivo_historico is not None and st.button("Importar"):
+        # Las filas rechazadas se escriben a un archivo temporal, no en memoria
+        with tempfile.NamedTemporaryFile(prefix="rechazos_", suffix=".csv", delete=False) as temporal:
+            ruta_rechazos = temporal.name
+        barra = st.progress(0.0, text="Importando...")
+        total_bytes = max(archivo_historico.size, 1)
+
+        def mostrar_progreso(parcial):
+            avance = min(archivo_historico.tell() / total_bytes, 1.0)
+            barra.progress(avance, text=f"{parcial['leidas']} filas leídas, {parcial['importadas']} importadas")
+
+        try:
+            cifras = importacion.importar_archivo(
+                almacen, archivo_historico, archivo_historico.name, archivo_rechazos=ruta_rechazos,
+                dia_primero=dia_primero, progreso=mostrar_progreso
+            )
+        except ValueError as e:
+            st.error(f"No se pudo importar el archivo: {e}")
+        else:
+            barra.progress(1.0, text="Importación terminada")
+            st.session_state.importacion = (archivo_historico.name, cifras, ruta_rechazos)
+
+    if st.session_state.get('importacion') is not None:
+        nombre_importado, cifras, ruta_rechazos = st.session_state.importacion
+        st.success(f"{nombre_importado}: {cifras['importadas']} registros importados.")
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Filas leídas", cifras['leidas'])
+        col2.metric("Importadas", cifras['importadas'])
+        col3.metric("Duplicadas", cifras['duplicadas'])
+        col4.metric("Rechazadas", cifras['rechazadas'])
+        if cifras['duplicadas'] + cifras['rechazadas'] and os.path.exists(ruta_rechazos):
+            with open(ruta_rechazos, 'rb') as f:
+                st.download_button("Descargar filas omitidas (CSV)", f.read(),
+                                   file_name=f"omitidas_{os.path.splitext(nombre_importado)[0]}.csv",
+                                   mime="text/csv")
+
+elif sidebar_tab == "Rendimiento" and st.session_state.user_role == "admin":
+    st.markdown('<div class="section-header">Rendimiento del Proceso</div>',
+                unsafe_allow_html=True)
+    st.markdown(
+        "Duración (p50/p95 en milisegundos), filas procesadas y variación de memoria (MB) de cada etapa medida "
+        "en este proceso, sumando todas las sesiones desde el inicio del servidor o el último reinicio."
+    )
+
+    etapas = metricas.resumen()
+    if not etapas:
+        st.info("Todavía no hay mediciones.")
+    else:
+        tabla_etapas = pd.DataFrame(etapas).set_index('etapa').sort_values('total_s', ascending=False)
+        tabla_etapas.columns = ["Llamadas", "p50 (ms)", "p95 (ms)", "Total (s)", "Filas p50", "Filas p95",
+                                "Memoria p50 (MB)", "Memoria p95 (MB)"]
+        st.dataframe(tabla_etapas.round(2), use_container_width=True)
+
+    # Exportación en formato de texto de Prometheus
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.download_button("📥 Descargar métricas (Prometheus)", data=lambda: metricas.exportar_prometheus(),
+                           file_name="metricas.prom", mime="text/plain", on_click="ignore")
+    with col2:
+        ruta_metricas = st.text_input("Archivo de métricas", METRICAS_FILE)
+        if st.button("Guardar en archivo"):
+            try:
+                metricas.escribir_prometheus(ruta_metricas)
+            except OSError as e:
+                st.error(f"No se pudieron guardar las métricas: {e}")
+            else:
+                st.success(f"Métricas guardadas en {ruta_metricas}.")
+    with col3:
+        if st.button("Reiniciar mediciones"):
+            metricas.reiniciar()
+            st.rerun()
+
 # Sección de registro de nueva actividad (visible en todas las pestañas excepto en la de generación de reportes)
-if sidebar_tab != "Generación de Reportes" and sidebar_tab != "Administración de Usuarios":
+if sidebar_tab not in ("Generación de Reportes", "Administración de Usuarios", "Importar Históricos", "Rendimiento"):
     st.markdown('<div class="section-header">Registrar Nueva Actividad</div>',
                 unsafe_allow_html=True)
 
@@ -1370,9 +1110,8 @@ if sidebar_tab != "Generación de Reportes" and sidebar_tab != "Administración
                 "horas": nuevas_horas
             }])
 
-            # Actualizar DataFrame en session_state
-            st.session_state.data = pd.concat([st.session_state.data, new_row], ignore_index=True)
-            st.session_state.data.to_csv(CSV_FILE, index=False)  # Guardar en CSV automáticamente
+            # Agregar al almacén compartido (visible para todas las sesiones)
+            almacen.agregar(new_row.iloc[0])
 
             # Mostrar mensaje de éxito
             st.success(
@@ -1386,6 +1125,90 @@ if sidebar_tab != "Generación de Reportes" and sidebar_tab != "Administración
             if st.button("Registrar Actividad Similar", use_container_width=True):
                 st.rerun()
 
+    # Registro por lotes: una semana completa en una tabla editable o una planilla CSV/XLSX
+    st.markdown('<div class="section-header">Registro por Lotes</div>', unsafe_allow_html=True)
+
+    # Personas y proyectos aceptados en el lote (según el rol, igual que en el formulario individual)
+    if st.session_state.user_role == "admin":
+        personas_lote = sorted(set(st.session_state.actividades_personalizadas) | set(almacen.valores('persona')))
+    else:
+        personas_lote = [st.session_state.username]
+    proyectos_lote = st.session_state.proyectos
+
+    lote = None
+    omitir_sin_horas = False
+    tab_semana, tab_planilla = st.tabs(["Semana", "Planilla CSV/XLSX"])
+
+    with tab_semana:
+        col1, col2 = st.columns(2)
+        with col1:
+            dia_semana = st.date_input("Semana del", datetime.now(), key="lote_semana")
+            lunes = dia_semana - timedelta(days=dia_semana.weekday())
+        with col2:
+            persona_semana = st.selectbox("Persona", personas_lote, key="lote_persona",
+                                          index=personas_lote.index(st.session_state.username)
+                                          if st.session_state.username in personas_lote else 0)
+
+        actividades_semana = st.session_state.actividades_personalizadas.get(persona_semana, [])
+        semana = registro_lotes.semana_en_blanco(
+            lunes, persona_semana,
+            actividades_semana[0] if actividades_semana else None,
+            proyectos_lote[0] if proyectos_lote else None
+        )
+        st.caption("Completa las horas de cada día (los días sin horas no se registran). "
+                   "Puedes agregar filas para varias actividades en un mismo día.")
+        semana_editada = st.data_editor(
+            semana,
+            num_rows="dynamic",
+            use_container_width=True,
+            key=f"lote_tabla_{lunes}_{persona_semana}",
+            column_config={
+                "fecha": st.column_config.DateColumn("Fecha", required=True),
+                "persona": st.column_config.SelectboxColumn("Persona", options=personas_lote, required=True),
+                "actividad": st.column_config.SelectboxColumn("Actividad", options=actividades_semana or None),
+                "proyecto": st.column_config.SelectboxColumn("Proyecto", options=proyectos_lote),
+                "horas": st.column_config.NumberColumn("Horas", min_value=registro_lotes.HORAS_MIN,
+                                                       max_value=registro_lotes.HORAS_MAX, step=0.5),
+            }
+        )
+        if st.button("Registrar Semana", use_container_width=True):
+            lote, omitir_sin_horas = semana_editada, True
+
+    with tab_planilla:
+        st.caption("Columnas esperadas: fecha, persona, actividad, proyecto, horas.")
+        planilla = st.file_uploader("Planilla de horas", type=["csv", "xlsx"], key="lote_planilla")
+        if planilla is not None:
+            try:
+                datos_planilla = registro_lotes.leer_planilla(planilla, planilla.name)
+            except Exception as e:
+                st.error(f"No se pudo leer la planilla: {e}")
+            else:
+                if st.session_state.user_role != "admin":
+                    # Los usuarios normales solo registran sus propias horas
+                    datos_planilla['persona'] = datos_planilla['persona'].fillna(st.session_state.username)
+                st.dataframe(datos_planilla.head(100), use_container_width=True)
+                if st.button(f"Registrar Planilla ({len(datos_planilla)} filas)", use_container_width=True):
+                    lote = datos_planilla
+
+    if lote is not None:
+        # Validación vectorizada de todo el lote contra lo ya registrado en esas fechas
+        fechas_lote = pd.to_datetime(lote['fecha'], errors='coerce')
+        resumen_lote = None
+        if fechas_lote.notna().any():
+            resumen_lote = almacen.consultar_resumen(fechas_lote.min(), fechas_lote.max(), personas_lote)
+        aceptadas, rechazadas = registro_lotes.validar_lote(lote, personas_lote, proyectos_lote, resumen_lote,
+                                                            omitir_sin_horas=omitir_sin_horas)
+
+        if not aceptadas.empty:
+            # Una sola escritura para todo el lote
+            almacen.agregar_lote(aceptadas.to_dict('records'))
+            st.success(f"Se registraron {len(aceptadas)} actividades ({aceptadas['horas'].sum():.1f} horas).")
+        if not rechazadas.empty:
+            st.error(f"{len(rechazadas)} filas no se registraron:")
+            st.dataframe(rechazadas, use_container_width=True)
+        if aceptadas.empty and rechazadas.empty:
+            st.warning("No hay filas para registrar.")
+
     # Opción para añadir un nuevo proyecto directamente (solo para administradores)
     if st.session_state.user_role == "admin":
         st.markdown('<div class="section-header">Añadir Nuevo Proyecto</div>', unsafe_allow_html=True)
@@ -1428,3 +1251,6 @@ st.markdown("""
 ---
 Desarrollado con Streamlit | Dashboard de Seguimiento de Actividades con Control de Acceso
 """)
+
+# Duración total de este rerun (los que terminan con st.stop o st.rerun no llegan aquí)
+metricas.obtener_etapa("app.rerun").registrar(time.perf_counter() - inicio_rerun)
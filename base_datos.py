@@ -0,0 +1,364 @@
+"""Almacenamiento opcional en SQLite para actividades y usuarios.
+
+Se activa definiendo la variable de entorno ``BITACORA_DB`` con la ruta del
+archivo de base de datos. La base usa modo WAL (lectores y un escritor en
+paralelo) e índices sobre (fecha), (persona, fecha) y (proyecto, fecha), de modo
+que los filtros de fechas, personas y proyectos se resuelven en SQL sin cargar
+todo el historial en memoria. La búsqueda de texto también: los términos se
+comparan con las etiquetas distintas de cada columna y las filas que las
+contienen se eligen en SQL junto con los filtros.
+
+Para migrar los archivos actuales:
+
+    python base_datos.py --db bitacora.db --csv registro_actividades.csv --usuarios usuarios.json
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from almacenamiento import COLUMNAS, DIMENSIONES_RESUMEN, actividades_vacias, cargar_actividades, tipificar
+from busqueda import COLUMNAS_BUSQUEDA, normalizar
+from metricas import medir
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS actividades (
+    id INTEGER PRIMARY KEY,
+    fecha TEXT NOT NULL,
+    persona TEXT NOT NULL,
+    actividad TEXT NOT NULL,
+    proyecto TEXT NOT NULL,
+    horas REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_actividades_fecha ON actividades (fecha);
+CREATE INDEX IF NOT EXISTS idx_actividades_persona_fecha ON actividades (persona, fecha);
+CREATE INDEX IF NOT EXISTS idx_actividades_proyecto_fecha ON actividades (proyecto, fecha);
+
+CREATE TABLE IF NOT EXISTS usuarios (
+    usuario TEXT PRIMARY KEY,
+    password TEXT NOT NULL,
+    role TEXT NOT NULL DEFAULT 'user',
+    nombre_completo TEXT
+);
+
+-- Versión de los datos: cambia con cada escritura, también desde otros procesos
+CREATE TABLE IF NOT EXISTS meta (clave TEXT PRIMARY KEY, valor INTEGER NOT NULL);
+INSERT OR IGNORE INTO meta (clave, valor) VALUES ('version', 0);
+CREATE TRIGGER IF NOT EXISTS actividades_insert AFTER INSERT ON actividades
+BEGIN UPDATE meta SET valor = valor + 1 WHERE clave = 'version'; END;
+CREATE TRIGGER IF NOT EXISTS actividades_update AFTER UPDATE ON actividades
+BEGIN UPDATE meta SET valor = valor + 1 WHERE clave = 'version'; END;
+CREATE TRIGGER IF NOT EXISTS actividades_delete AFTER DELETE ON actividades
+BEGIN UPDATE meta SET valor = valor + 1 WHERE clave = 'version'; END;
+INSERT OR IGNORE INTO meta (clave, valor) VALUES ('usuarios', 0);
+CREATE TRIGGER IF NOT EXISTS usuarios_insert AFTER INSERT ON usuarios
+BEGIN UPDATE meta SET valor = valor + 1 WHERE clave = 'usuarios'; END;
+CREATE TRIGGER IF NOT EXISTS usuarios_update AFTER UPDATE ON usuarios
+BEGIN UPDATE meta SET valor = valor + 1 WHERE clave = 'usuarios'; END;
+CREATE TRIGGER IF NOT EXISTS usuarios_delete AFTER DELETE ON usuarios
+BEGIN UPDATE meta SET valor = valor + 1 WHERE clave = 'usuarios'; END;
+"""
+
+# Columnas sobre las que se permite consultar valores distintos
+COLUMNAS_ETIQUETA = ("persona", "actividad", "proyecto")
+
+
+# Función para crear las tablas e índices y activar el modo WAL (queda guardado en el archivo)
+def crear_esquema(ruta):
+    con = sqlite3.connect(ruta, timeout=30)
+    try:
+        con.execute("PRAGMA journal_mode=WAL")
+        con.executescript(ESQUEMA)
+        con.commit()
+    finally:
+        con.close()
+
+
+# Función para abrir una conexión a una base ya creada
+def conectar(ruta):
+    con = sqlite3.connect(ruta, timeout=30)
+    con.execute("PRAGMA synchronous=NORMAL")
+    return con
+
+
+def _fecha_iso(fecha):
+    return pd.Timestamp(fecha).strftime('%Y-%m-%d')
+
+
+# Función para construir las condiciones (y sus parámetros) de los filtros
+def _filtros(inicio=None, fin=None, personas=None, proyectos=None, actividades=None):
+    condiciones, parametros = [], []
+    if inicio is not None and fin is not None:
+        condiciones.append("fecha BETWEEN ? AND ?")
+        parametros += [_fecha_iso(inicio), _fecha_iso(fin)]
+    for columna, valores in (('persona', personas), ('proyecto', proyectos), ('actividad', actividades)):
+        if valores:
+            condiciones.append(f"{columna} IN ({', '.join('?' * len(valores))})")
+            parametros += list(valores)
+    return condiciones, parametros
+
+
+# Función para construir la cláusula WHERE a partir de los filtros
+def _condiciones(inicio=None, fin=None, personas=None, proyectos=None, actividades=None):
+    condiciones, parametros = _filtros(inicio, fin, personas, proyectos, actividades)
+    where = f" WHERE {' AND '.join(condiciones)}" if condiciones else ""
+    return where, parametros
+
+
+def _a_dataframe(con, consulta, parametros, columnas, indice=None):
+    with medir("datos.sqlite") as medicion:
+        df = pd.read_sql_query(consulta, con, params=parametros, index_col=indice)
+        medicion.filas = len(df)
+    if df.empty:
+        return actividades_vacias(columnas)
+    df.index.name = None
+    df['fecha'] = pd.to_datetime(df['fecha'], format='%Y-%m-%d')
+    return tipificar(df)
+
+
+class AlmacenSQLite:
+    """Almacén de actividades respaldado por SQLite, con la misma interfaz que AlmacenActividades."""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self._etiquetas = None
+        self._version_etiquetas = None
+        crear_esquema(ruta)
+
+    def _conectar(self):
+        # Una conexión por operación: sqlite3 no comparte conexiones entre hilos de sesiones
+        return _Conexion(self.ruta)
+
+    @property
+    def version(self):
+        with self._conectar() as con:
+            return con.execute("SELECT valor FROM meta WHERE clave = 'version'").fetchone()[0]
+
+    # Función para obtener todas las actividades (solo para procesos que las necesitan completas, como la importación)
+    def obtener(self):
+        return self.consultar()
+
+    def obtener_resumen(self):
+        return self.consultar_resumen()
+
+    def consultar(self, inicio=None, fin=None, personas=None, proyectos=None, actividades=None):
+        where, parametros = _condiciones(inicio, fin, personas, proyectos, actividades)
+        with self._conectar() as con:
+            # El índice del DataFrame es el id de la fila, igual en todas las consultas; filas ordenadas por fecha
+            return _a_dataframe(con, f"SELECT id, {', '.join(COLUMNAS)} FROM actividades{where} ORDER BY fecha, id",
+                                parametros, COLUMNAS, indice='id')
+
+    def consultar_resumen(self, inicio=None, fin=None, personas=None, proyectos=None, actividades=None):
+        where, parametros = _condiciones(inicio, fin, personas, proyectos, actividades)
+        dimensiones = ', '.join(DIMENSIONES_RESUMEN)
+        consulta = (f"SELECT {dimensiones}, SUM(horas) AS horas FROM actividades{where} "
+                    f"GROUP BY {dimensiones} ORDER BY {dimensiones}")
+        with self._conectar() as con:
+            return _a_dataframe(con, consulta, parametros, DIMENSIONES_RESUMEN + ['horas'])
+
+    # Función para obtener las etiquetas distintas de cada columna de búsqueda con su texto normalizado
+    def _etiquetas_normalizadas(self):
+        # La versión se lee antes de consultar: si otra escritura llega entretanto, se recalculan en la siguiente
+        version = self.version
+        with self._lock:
+            if self._etiquetas is None or self._version_etiquetas != version:
+                with self._conectar() as con:
+                    self._etiquetas = {
+                        columna: [(etiqueta, normalizar(etiqueta))
+                                  for (etiqueta,) in con.execute(f"SELECT DISTINCT {columna} FROM actividades")]
+                        for columna in COLUMNAS_BUSQUEDA
+                    }
+                self._version_etiquetas = version
+            return self._etiquetas
+
+    # Función para obtener los ids (ordenados) de las filas que cumplen los filtros y contienen todos los términos
+    def buscar(self, consulta, inicio=None, fin=None, personas=None, proyectos=None, actividades=None):
+        terminos = normalizar(consulta).split()
+        if not terminos:
+            return None
+        etiquetas = self._etiquetas_normalizadas()
+        condiciones, parametros = _filtros(inicio, fin, personas, proyectos, actividades)
+        for termino in terminos:
+            # Cada término debe aparecer en alguna de las columnas: se traduce a las etiquetas que lo contienen
+            coincidencias = [(columna, [etiqueta for etiqueta, texto in etiquetas[columna] if termino in texto])
+                             for columna in COLUMNAS_BUSQUEDA]
+            coincidencias = [(columna, valores) for columna, valores in coincidencias if valores]
+            if not coincidencias:
+                return np.array([], dtype=np.int64)
+            condiciones.append("(" + " OR ".join(f"{columna} IN ({', '.join('?' * len(valores))})"
+                                                 for columna, valores in coincidencias) + ")")
+            parametros += [valor for _, valores in coincidencias for valor in valores]
+        consulta_sql = f"SELECT id FROM actividades WHERE {' AND '.join(condiciones)} ORDER BY id"
+        with self._conectar() as con, medir("datos.sqlite") as medicion:
+            ids = np.array([fila[0] for fila in con.execute(consulta_sql, parametros)], dtype=np.int64)
+            medicion.filas = len(ids)
+        return ids
+
+    def valores(self, columna):
+        if columna not in COLUMNAS_ETIQUETA:
+            raise ValueError(f"Columna no válida: {columna}")
+        with self._conectar() as con:
+            return [fila[0] for fila in con.execute(f"SELECT DISTINCT {columna} FROM actividades ORDER BY {columna}")]
+
+    def rango_fechas(self):
+        with self._conectar() as con:
+            minimo, maximo = con.execute("SELECT MIN(fecha), MAX(fecha) FROM actividades").fetchone()
+        if minimo is None:
+            return None, None
+        return pd.Timestamp(minimo).date(), pd.Timestamp(maximo).date()
+
+    def existe(self):
+        with self._conectar() as con:
+            return con.execute("SELECT 1 FROM actividades LIMIT 1").fetchone() is not None
+
+    def inicializar(self):
+        pass  # El esquema se crea al conectar
+
+    def agregar(self, registro):
+        self.agregar_lote([registro])
+
+    # Función para agregar varios registros en una sola transacción
+    def agregar_lote(self, registros):
+        with self._conectar() as con:
+            con.executemany(
+                f"INSERT INTO actividades ({', '.join(COLUMNAS)}) VALUES (?, ?, ?, ?, ?)",
+                [(_fecha_iso(registro['fecha']), registro['persona'], registro['actividad'],
+                  registro['proyecto'], float(registro['horas'])) for registro in registros]
+            )
+
+
+class _Conexion:
+    # Conexión que hace commit (o rollback) y se cierra al salir del bloque with
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.con = None
+
+    def __enter__(self):
+        self.con = conectar(self.ruta)
+        return self.con
+
+    def __exit__(self, tipo, valor, traza):
+        try:
+            if tipo is None:
+                self.con.commit()
+            else:
+                self.con.rollback()
+        finally:
+            self.con.close()
+
+
+# Función para cargar los usuarios desde la base de datos
+def cargar_usuarios(ruta):
+    crear_esquema(ruta)
+    with _Conexion(ruta) as con:
+        filas = con.execute("SELECT usuario, password, role, nombre_completo FROM usuarios").fetchall()
+    return {
+        usuario: {"password": password, "role": role, "nombre_completo": nombre_completo or usuario}
+        for usuario, password, role, nombre_completo in filas
+    }
+
+
+# Función para guardar los usuarios en la base de datos (reemplaza la tabla completa)
+def guardar_usuarios(ruta, users):
+    crear_esquema(ruta)
+    with _Conexion(ruta) as con:
+        con.execute("DELETE FROM usuarios")
+        con.executemany(
+            "INSERT INTO usuarios (usuario, password, role, nombre_completo) VALUES (?, ?, ?, ?)",
+            [(usuario, info["password"], info.get("role", "user"), info.get("nombre_completo", usuario))
+             for usuario, info in users.items()]
+        )
+
+
+# Función para obtener la versión de la tabla de usuarios (cambia con cada escritura)
+def firma_usuarios(ruta):
+    try:
+        with _Conexion(ruta) as con:
+            fila = con.execute("SELECT valor FROM meta WHERE clave = 'usuarios'").fetchone()
+    except sqlite3.OperationalError:
+        return None  # Todavía no se creó el esquema
+    return fila[0] if fila else None
+
+
+# Función para crear un usuario; devuelve False si ya existía
+def crear_usuario(ruta, usuario, info):
+    crear_esquema(ruta)
+    with _Conexion(ruta) as con:
+        cursor = con.execute(
+            "INSERT OR IGNORE INTO usuarios (usuario, password, role, nombre_completo) VALUES (?, ?, ?, ?)",
+            (usuario, info["password"], info.get("role", "user"), info.get("nombre_completo", usuario))
+        )
+        return cursor.rowcount > 0
+
+
+# Función para actualizar algunos campos de un usuario; devuelve False si ya no existe
+def modificar_usuario(ruta, usuario, campos):
+    columnas = [columna for columna in ("password", "role", "nombre_completo") if columna in campos]
+    if not columnas:
+        return True
+    with _Conexion(ruta) as con:
+        cursor = con.execute(
+            f"UPDATE usuarios SET {', '.join(f'{columna} = ?' for columna in columnas)} WHERE usuario = ?",
+            [campos[columna] for columna in columnas] + [usuario]
+        )
+        return cursor.rowcount > 0
+
+
+# Función para eliminar un usuario; devuelve False si ya no existía
+def eliminar_usuario(ruta, usuario):
+    with _Conexion(ruta) as con:
+        return con.execute("DELETE FROM usuarios WHERE usuario = ?", (usuario,)).rowcount > 0
+
+
+_almacenes = {}
+_almacenes_lock = threading.Lock()
+
+
+# Función para obtener el almacén SQLite compartido de una base de datos
+def obtener_almacen_sqlite(ruta):
+    ruta = os.path.abspath(ruta)
+    with _almacenes_lock:
+        if ruta not in _almacenes:
+            _almacenes[ruta] = AlmacenSQLite(ruta)
+        return _almacenes[ruta]
+
+
+# Función para importar una sola vez el CSV de actividades y el JSON de usuarios
+def importar(ruta_db, csv_file=None, users_file=None, reemplazar=False):
+    importadas, usuarios = 0, 0
+    crear_esquema(ruta_db)
+    with _Conexion(ruta_db) as con:
+        if not reemplazar and con.execute("SELECT 1 FROM actividades LIMIT 1").fetchone():
+            raise ValueError("La base de datos ya tiene actividades; use reemplazar=True para sobrescribirlas.")
+        con.execute("DELETE FROM actividades")
+
+        if csv_file and os.path.exists(csv_file):
+            df = cargar_actividades(csv_file)
+            filas = zip(df['fecha'].dt.strftime('%Y-%m-%d'), df['persona'].astype(str),
+                        df['actividad'].astype(str), df['proyecto'].astype(str), df['horas'].astype(float))
+            con.executemany(f"INSERT INTO actividades ({', '.join(COLUMNAS)}) VALUES (?, ?, ?, ?, ?)", filas)
+            importadas = len(df)
+
+    if users_file and os.path.exists(users_file):
+        with open(users_file, 'r') as f:
+            users = json.load(f)
+        guardar_usuarios(ruta_db, users)
+        usuarios = len(users)
+    return importadas, usuarios
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importa el CSV de actividades y el JSON de usuarios a SQLite.")
+    parser.add_argument("--db", required=True, help="Ruta del archivo SQLite de destino")
+    parser.add_argument("--csv", default="registro_actividades.csv", help="CSV de actividades")
+    parser.add_argument("--usuarios", default="usuarios.json", help="JSON de usuarios")
+    parser.add_argument("--reemplazar", action="store_true", help="Sobrescribe las actividades existentes")
+    args = parser.parse_args()
+
+    total_actividades, total_usuarios = importar(args.db, args.csv, args.usuarios, args.reemplazar)
+    print(f"Importadas {total_actividades} actividades y {total_usuarios} usuarios en {args.db}")
@@ -0,0 +1,343 @@
+"""Mediciones de rendimiento con datos sintéticos.
+
+Genera registros de actividades con el mismo esquema de
+``registro_actividades.csv`` (tamaño, personas, proyectos y actividades
+configurables) y mide la carga inicial con la conversión de fechas, la cadena de
+filtros del tablero, cada agregado de "Filtros", el reporte PDF, el conteo de
+días laborables en rangos largos y el registro de actividades. También mide el
+arranque en frío de ``app.py`` y un rerun ordinario en un proceso aparte, contra
+un presupuesto de tiempo. Los resultados se escriben en JSON para comparar
+versiones:
+
+    python benchmark.py --filas 10000 100000 1000000 --salida resultados.json
+    python benchmark.py --filas 100000 --salida nuevo.json --comparar resultados.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from agregados import AGREGADOS
+from almacenamiento import (AlmacenActividades, cargar_actividades, construir_resumen, convertir_fechas,
+                            ordenar_por_fecha, ruta_instantanea)
+from busqueda import IndiceBusqueda
+from calendario import dias_laborables_entre_fechas
+from consultas import filtrar_actividades
+from evolucion import elegir_granularidad, preparar_serie
+from reportes import generate_pdf_report
+
+# Tamaños por defecto (filas)
+TAMANOS = [10_000, 100_000]
+
+# Repeticiones de cada medición (se reportan mínimo, mediana y promedio)
+REPETICIONES = 3
+
+# Registros que se agregan en la medición del registro individual
+REGISTROS_AGREGAR = 100
+
+# Proporción a partir de la cual una medición se considera una regresión al comparar
+UMBRAL_REGRESION = 1.2
+
+# Presupuesto (segundos) del primer run de app.py en un proceso nuevo y de un rerun ordinario
+# (AppTest vuelve a compilar app.py en cada rerun, así que el rerun incluye la compilación)
+PRESUPUESTO_ARRANQUE_S = 3.0
+PRESUPUESTO_RERUN_S = 1.0
+
+# Bibliotecas que no deben cargarse al abrir la aplicación (solo en las pestañas que las usan)
+MODULOS_DIFERIDOS = ["fpdf", "matplotlib"]
+
+# Script que mide el arranque en un proceso nuevo, con una sesión de administrador ya autenticada
+_SCRIPT_ARRANQUE = """
+import json, sys, time
+inicio = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+importar_streamlit = time.perf_counter() - inicio
+
+at = AppTest.from_file(sys.argv[1], default_timeout=600)
+at.session_state["authenticated"] = True
+at.session_state["username"] = "admin"
+at.session_state["user_role"] = "admin"
+at.session_state["nombre_completo"] = "Administrador"
+inicio = time.perf_counter()
+at.run()
+arranque = time.perf_counter() - inicio
+reruns = []
+for _ in range(int(sys.argv[2])):
+    inicio = time.perf_counter()
+    at.run()
+    reruns.append(time.perf_counter() - inicio)
+print(json.dumps({
+    "importar_streamlit": importar_streamlit,
+    "arranque": arranque,
+    "reruns": reruns,
+    "errores": [str(e.value) for e in at.exception],
+    "modulos": [m for m in json.loads(sys.argv[3]) if m in sys.modules],
+}))
+"""
+
+ACTIVIDADES = ["Trabajo autónomo", "Reuniones", "Capacitación", "Revisión de calidad", "Soporte",
+               "Documentación", "Análisis", "Salidas de campo"]
+
+
+# Función para generar un registro de actividades sintético, ordenado por fecha como el real
+def generar_actividades(filas, personas=20, proyectos=8, actividades=len(ACTIVIDADES), dias=730,
+                        inicio="2023-01-02", semilla=0):
+    rng = np.random.default_rng(semilla)
+    fechas = pd.bdate_range(inicio, periods=dias)
+    nombres_actividades = (ACTIVIDADES + [f"Actividad {i:02d}" for i in range(len(ACTIVIDADES), actividades)])[:actividades]
+    df = pd.DataFrame({
+        "fecha": np.sort(rng.choice(fechas.to_numpy(), filas)),
+        "persona": pd.Categorical.from_codes(rng.integers(0, personas, filas),
+                                             [f"Persona {i:03d}" for i in range(personas)]),
+        "actividad": pd.Categorical.from_codes(rng.integers(0, actividades, filas), sorted(nombres_actividades)),
+        "proyecto": pd.Categorical.from_codes(rng.integers(0, proyectos, filas),
+                                              [f"Proyecto {i:02d}" for i in range(proyectos)]),
+        "horas": rng.integers(1, 17, filas) / 2,
+    })
+    return df
+
+
+# Función para escribir el registro sintético como CSV con el formato de la aplicación
+def escribir_csv(df, csv_file):
+    df.to_csv(csv_file, index=False, date_format='%Y-%m-%d')
+
+
+# Función para medir una función varias veces; devuelve los segundos de cada repetición
+def medir(funcion, repeticiones=REPETICIONES, preparar=None):
+    tiempos = []
+    for _ in range(repeticiones):
+        if preparar is not None:
+            preparar()
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return tiempos
+
+
+def _resultado(tamano, prueba, tiempos, **detalles):
+    return {
+        "filas": tamano,
+        "prueba": prueba,
+        "repeticiones": len(tiempos),
+        "min_s": min(tiempos),
+        "mediana_s": statistics.median(tiempos),
+        "media_s": statistics.fmean(tiempos),
+        **detalles,
+    }
+
+
+def _borrar(ruta):
+    if os.path.exists(ruta):
+        os.remove(ruta)
+
+
+# Función para ejecutar todas las mediciones sobre un tamaño de datos
+def medir_tamano(filas, directorio, repeticiones=REPETICIONES, informar=print, arranque=True, **generador):
+    datos = generar_actividades(filas, **generador)
+    csv_file = os.path.join(directorio, f"actividades_{filas}.csv")
+    escribir_csv(datos, csv_file)
+    resultados = []
+
+    def registrar(prueba, tiempos, **detalles):
+        resultados.append(_resultado(filas, prueba, tiempos, **detalles))
+        informar(f"{filas:>10} {prueba:<32} {min(tiempos) * 1000:10.1f} ms")
+
+    # Carga inicial: CSV más conversión de fechas (sin instantánea) y luego desde la instantánea Feather
+    registrar("carga_csv", medir(lambda: cargar_actividades(csv_file), repeticiones,
+                                 preparar=lambda: _borrar(ruta_instantanea(csv_file))))
+    registrar("carga_instantanea", medir(lambda: cargar_actividades(csv_file), repeticiones))
+    texto_fechas = pd.read_csv(csv_file, usecols=["fecha"])["fecha"]
+    registrar("convertir_fechas", medir(lambda: convertir_fechas(texto_fechas), repeticiones))
+
+    df = ordenar_por_fecha(cargar_actividades(csv_file))
+    resumen = construir_resumen(df)
+    registrar("construir_resumen", medir(lambda: construir_resumen(df), repeticiones),
+              filas_resumen=len(resumen))
+
+    # Cadena de filtros del tablero: rango de fechas, la mitad de las personas y de los proyectos
+    inicio, fin = df['fecha'].min(), df['fecha'].max()
+    desde = inicio + (fin - inicio) / 4
+    personas = list(df['persona'].cat.categories[::2])
+    proyectos = list(df['proyecto'].cat.categories[::2])
+
+    def filtrar():
+        filtrar_actividades(df, desde, fin, personas, proyectos, ordenado=True)
+        return filtrar_actividades(resumen, desde, fin, personas, proyectos, ordenado=True)
+
+    registrar("filtros", medir(filtrar, repeticiones))
+    # Estado por defecto del tablero: todo el rango y todas las opciones seleccionadas
+    todas = [list(df[col].cat.categories) for col in ('persona', 'proyecto', 'actividad')]
+    registrar("filtros_por_defecto", medir(lambda: filtrar_actividades(df, inicio, fin, *todas, ordenado=True),
+                                           repeticiones))
+    registrar("filtro_ultima_semana", medir(
+        lambda: filtrar_actividades(df, fin - pd.Timedelta(days=6), fin, ordenado=True), repeticiones))
+    filtrado = filtrar()
+    for nombre, agregado in AGREGADOS.items():
+        registrar(f"agregado_{nombre}", medir(lambda: agregado(filtrado), repeticiones))
+    diario = AGREGADOS['diario_persona'](filtrado)
+    granularidad = elegir_granularidad(diario['fecha'].iat[0], diario['fecha'].iat[-1])
+    registrar("serie_evolucion", medir(lambda: preparar_serie(diario, 'persona', granularidad), repeticiones),
+              granularidad=granularidad)
+
+    registrar("indice_busqueda", medir(lambda: IndiceBusqueda(df), repeticiones))
+    indice = IndiceBusqueda(df)
+    registrar("buscar", medir(lambda: indice.buscar("persona 00 proyecto"), repeticiones))
+
+    # Reporte PDF con todas las personas (las cifras salen del resumen, como en la aplicación)
+    archivo_pdf = os.path.join(directorio, "reporte.pdf")
+    registrar("reporte_pdf", medir(
+        lambda: generate_pdf_report(df, "Reporte de Actividades", inicio, fin, list(df['persona'].cat.categories),
+                                    archivo_salida=archivo_pdf, resumen=resumen),
+        repeticiones))
+
+    # Registro de actividades: uno por uno y en un solo lote
+    registros = datos.sample(REGISTROS_AGREGAR, random_state=0).to_dict('records')
+    almacen = AlmacenActividades(csv_file)
+    almacen.obtener()
+    tiempos = medir(lambda: [almacen.agregar(registro) for registro in registros], repeticiones)
+    registrar("agregar", [t / REGISTROS_AGREGAR for t in tiempos], registros_por_repeticion=REGISTROS_AGREGAR)
+    registrar("agregar_lote", medir(lambda: almacen.agregar_lote(registros), repeticiones),
+              registros_por_lote=REGISTROS_AGREGAR)
+    registrar("obtener_tras_agregar", medir(almacen.obtener, 1))
+
+    if arranque:
+        resultados += medir_arranque(filas, csv_file, directorio, repeticiones, informar)
+    return resultados
+
+
+# Función para medir el primer run de app.py en un proceso nuevo y los reruns siguientes
+def medir_arranque(filas, csv_file, directorio, repeticiones=REPETICIONES, informar=print):
+    raiz = os.path.dirname(os.path.abspath(__file__))
+    trabajo = os.path.join(directorio, f"arranque_{filas}")
+    os.makedirs(trabajo, exist_ok=True)
+    shutil.copy(csv_file, os.path.join(trabajo, "registro_actividades.csv"))
+
+    entorno = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [raiz, os.environ.get("PYTHONPATH")]))}
+    entorno.pop("BITACORA_DB", None)
+    proceso = subprocess.run(
+        [sys.executable, "-c", _SCRIPT_ARRANQUE, os.path.join(raiz, "app.py"), str(repeticiones),
+         json.dumps(MODULOS_DIFERIDOS)],
+        cwd=trabajo, env=entorno, capture_output=True, text=True, check=True
+    )
+    medicion = json.loads(proceso.stdout.strip().splitlines()[-1])
+    if medicion["errores"]:
+        raise RuntimeError(f"app.py falló durante la medición: {medicion['errores']}")
+
+    resultados = [
+        _resultado(filas, "importar_streamlit", [medicion["importar_streamlit"]]),
+        _resultado(filas, "arranque_app", [medicion["arranque"]], presupuesto_s=PRESUPUESTO_ARRANQUE_S,
+                   dentro_del_presupuesto=medicion["arranque"] <= PRESUPUESTO_ARRANQUE_S,
+                   modulos_diferidos_cargados=medicion["modulos"]),
+        _resultado(filas, "rerun_app", medicion["reruns"], presupuesto_s=PRESUPUESTO_RERUN_S,
+                   dentro_del_presupuesto=statistics.median(medicion["reruns"]) <= PRESUPUESTO_RERUN_S),
+    ]
+    for r in resultados:
+        marca = "" if r.get("dentro_del_presupuesto", True) else "  FUERA DEL PRESUPUESTO"
+        informar(f"{filas:>10} {r['prueba']:<32} {r['mediana_s'] * 1000:10.1f} ms{marca}")
+    if medicion["modulos"]:
+        informar(f"{filas:>10} módulos diferidos cargados al abrir: {', '.join(medicion['modulos'])}")
+    return resultados
+
+
+# Función para medir el conteo de días laborables en rangos largos (no depende del tamaño de los datos)
+def medir_calendario(repeticiones=REPETICIONES, informar=print):
+    resultados = []
+    for anios in (1, 10, 50):
+        inicio = pd.Timestamp("2000-01-01")
+        fin = inicio + pd.DateOffset(years=anios) - pd.Timedelta(days=1)
+        tiempos = medir(lambda: dias_laborables_entre_fechas(inicio, fin), repeticiones)
+        resultados.append(_resultado(0, f"dias_laborables_{anios}_anios", tiempos))
+        informar(f"{'-':>10} {f'dias_laborables_{anios}_anios':<32} {min(tiempos) * 1000:10.3f} ms")
+    return resultados
+
+
+def _version_codigo():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Función para comparar dos ejecuciones; devuelve las mediciones más lentas que el umbral
+def comparar(anterior, actual, umbral=UMBRAL_REGRESION, informar=print):
+    base = {(r["filas"], r["prueba"]): r["min_s"] for r in anterior["resultados"]}
+    regresiones = []
+    for r in actual["resultados"]:
+        clave = (r["filas"], r["prueba"])
+        if clave not in base or base[clave] <= 0:
+            continue
+        proporcion = r["min_s"] / base[clave]
+        marca = "  REGRESIÓN" if proporcion > umbral else ""
+        informar(f"{r['filas']:>10} {r['prueba']:<32} {proporcion:6.2f}x{marca}")
+        if proporcion > umbral:
+            regresiones.append({**r, "proporcion": proporcion})
+    return regresiones
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mide el rendimiento de carga, filtros, agregados, reportes y registro.")
+    parser.add_argument("--filas", type=int, nargs="+", default=TAMANOS, help="Tamaños de datos a medir")
+    parser.add_argument("--personas", type=int, default=20, help="Número de personas")
+    parser.add_argument("--proyectos", type=int, default=8, help="Número de proyectos")
+    parser.add_argument("--actividades", type=int, default=len(ACTIVIDADES), help="Número de actividades")
+    parser.add_argument("--dias", type=int, default=730, help="Días laborables que cubren los datos")
+    parser.add_argument("--repeticiones", type=int, default=REPETICIONES, help="Repeticiones de cada medición")
+    parser.add_argument("--salida", default="benchmark.json", help="Archivo JSON de resultados")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior para detectar regresiones")
+    parser.add_argument("--umbral", type=float, default=UMBRAL_REGRESION,
+                        help="Proporción de tiempo a partir de la cual se marca una regresión")
+    parser.add_argument("--sin-arranque", action="store_true", help="No mide el arranque de app.py")
+    parser.add_argument("--verificar-presupuesto", action="store_true",
+                        help="Termina con error si el arranque o el rerun superan su presupuesto")
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp(prefix="bitacora_benchmark_")
+    try:
+        resultados = medir_calendario(args.repeticiones)
+        for filas in args.filas:
+            resultados += medir_tamano(filas, directorio, args.repeticiones, arranque=not args.sin_arranque,
+                                       personas=args.personas, proyectos=args.proyectos,
+                                       actividades=args.actividades, dias=args.dias)
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    ejecucion = {
+        "fecha": datetime.now().isoformat(timespec='seconds'),
+        "version": _version_codigo(),
+        "entorno": {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "plataforma": platform.platform(),
+            "procesadores": os.cpu_count(),
+        },
+        "parametros": {k: v for k, v in vars(args).items()
+                       if k not in ("salida", "comparar", "umbral", "verificar_presupuesto")},
+        "resultados": resultados,
+    }
+    with open(args.salida, 'w', encoding='utf-8') as f:
+        json.dump(ejecucion, f, indent=2, ensure_ascii=False)
+    print(f"Resultados guardados en {args.salida}")
+
+    fuera = [r for r in resultados if r.get("dentro_del_presupuesto") is False]
+    if args.verificar_presupuesto and fuera:
+        print(f"{len(fuera)} mediciones de arranque superan su presupuesto")
+        sys.exit(1)
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            regresiones = comparar(json.load(f), ejecucion, args.umbral)
+        if regresiones:
+            print(f"{len(regresiones)} mediciones superan {args.umbral:g}x el tiempo anterior")
+            sys.exit(1)
@@ -0,0 +1,116 @@
+"""Índice de búsqueda de texto para "Buscar en los datos".
+
+El índice se construye sobre las etiquetas distintas de persona, actividad y
+proyecto (unas decenas o cientos), no sobre las filas. Cada etiqueta se guarda
+normalizada (minúsculas y sin tildes) junto con sus trigramas y con la lista de
+identificadores de fila en que aparece. Una consulta se divide en términos; cada
+término se resuelve con los trigramas sobre las etiquetas y luego con las listas
+de filas, y los términos se combinan con Y (todos deben aparecer en alguna de
+las tres columnas). Así "cartografia" encuentra "Cartografía".
+"""
+import unicodedata
+from collections import defaultdict
+
+import numpy as np
+
+# Columnas en las que se busca
+COLUMNAS_BUSQUEDA = ["persona", "actividad", "proyecto"]
+
+LARGO_NGRAMA = 3
+
+
+# Función para pasar un texto a minúsculas y quitarle las tildes
+def normalizar(texto):
+    descompuesto = unicodedata.normalize('NFKD', str(texto))
+    return "".join(c for c in descompuesto if not unicodedata.combining(c)).casefold()
+
+
+def _ngramas(texto):
+    return {texto[i:i + LARGO_NGRAMA] for i in range(len(texto) - LARGO_NGRAMA + 1)}
+
+
+def _factorizar(serie):
+    # Códigos y etiquetas distintas; para categorías se reutilizan los códigos existentes
+    if hasattr(serie, 'cat'):
+        return serie.cat.codes.to_numpy(), list(serie.cat.categories)
+    codigos, etiquetas = serie.factorize()
+    return codigos, list(etiquetas)
+
+
+class IndiceBusqueda:
+    """Índice de n-gramas sobre las etiquetas, con las filas de cada etiqueta.
+
+    Los identificadores de fila son las etiquetas del índice del DataFrame
+    indexado, de modo que el resultado se puede cruzar con cualquier subconjunto
+    filtrado de esos mismos datos.
+    """
+
+    def __init__(self, df=None):
+        self._textos = {}                     # (columna, etiqueta) -> texto normalizado
+        self._ngramas = defaultdict(set)      # n-grama -> {(columna, etiqueta)}
+        self._filas = defaultdict(list)       # (columna, etiqueta) -> [arreglos de ids]
+        if df is not None:
+            self.agregar(df)
+
+    def _registrar(self, clave):
+        if clave not in self._textos:
+            texto = normalizar(clave[1])
+            self._textos[clave] = texto
+            for ngrama in _ngramas(texto):
+                self._ngramas[ngrama].add(clave)
+
+    # Función para agregar filas al índice (los ids son el índice del DataFrame)
+    def agregar(self, df):
+        if df.empty:
+            return
+        ids = df.index.to_numpy()
+        for columna in COLUMNAS_BUSQUEDA:
+            codigos, etiquetas = _factorizar(df[columna])
+            orden = np.argsort(codigos, kind='stable')
+            limites = np.cumsum(np.bincount(codigos[codigos >= 0], minlength=len(etiquetas)))
+            inicio = len(codigos) - limites[-1] if len(limites) else 0  # Los nulos (-1) quedan primero
+            for etiqueta, fin in zip(etiquetas, limites + inicio):
+                if fin > inicio:
+                    clave = (columna, etiqueta)
+                    self._registrar(clave)
+                    self._filas[clave].append(ids[orden[inicio:fin]])
+                inicio = fin
+
+    # Función para agregar una sola fila (registro nuevo)
+    def agregar_fila(self, id_fila, fila):
+        for columna in COLUMNAS_BUSQUEDA:
+            clave = (columna, fila[columna])
+            self._registrar(clave)
+            self._filas[clave].append(np.array([id_fila]))
+
+    def _etiquetas_con(self, termino):
+        if len(termino) >= LARGO_NGRAMA:
+            # Candidatas: etiquetas que contienen todos los n-gramas del término
+            conjuntos = [self._ngramas.get(ngrama, set()) for ngrama in _ngramas(termino)]
+            candidatas = set.intersection(*conjuntos)
+        else:
+            candidatas = self._textos.keys()
+        return [clave for clave in candidatas if termino in self._textos[clave]]
+
+    def _ids(self, clave):
+        partes = self._filas[clave]
+        if len(partes) > 1:
+            self._filas[clave] = partes = [np.concatenate(partes)]
+        return partes[0]
+
+    # Función para obtener los ids (ordenados) de las filas que contienen todos los términos de la consulta
+    def buscar(self, consulta):
+        resultado = None
+        for termino in normalizar(consulta).split():
+            etiquetas = self._etiquetas_con(termino)
+            if not etiquetas:
+                return np.array([], dtype=np.int64)
+            ids = np.unique(np.concatenate([self._ids(clave) for clave in etiquetas]))
+            resultado = ids if resultado is None else np.intersect1d(resultado, ids, assume_unique=True)
+        return resultado
+
+
+# Función para filtrar un DataFrame con los ids devueltos por el índice (sin recorrer todas sus filas)
+def filas_con_ids(df, ids):
+    posiciones = df.index.get_indexer(ids)
+    return df.iloc[np.sort(posiciones[posiciones >= 0])]
@@ -0,0 +1,38 @@
+"""Caché LRU en memoria, segura entre hilos y compartida por las sesiones del proceso."""
+import threading
+from collections import OrderedDict
+
+
+class CacheLRU:
+    def __init__(self, max_entradas):
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def __len__(self):
+        return len(self._entradas)
+
+    # Función para obtener el valor de una clave o calcularlo y guardarlo si no existe
+    def obtener_o_calcular(self, clave, funcion):
+        with self._lock:
+            if clave in self._entradas:
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+                return self._entradas[clave]
+            self.fallos += 1
+
+        # El cálculo se hace fuera del candado para no bloquear otras sesiones
+        valor = funcion()
+
+        with self._lock:
+            self._entradas[clave] = valor
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+        return valor
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
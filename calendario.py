@@ -0,0 +1,139 @@
+"""Calendario de festivos de Colombia y funciones de días laborables.
+
+Los festivos se calculan por regla para cualquier año (fechas fijas, festivos
+trasladados al lunes por la Ley Emiliani y fiestas que dependen de la Pascua) y
+se exponen como un ``numpy.busdaycalendar`` construido una sola vez, de modo que
+las funciones trabajan tanto con fechas sueltas como con Series completas.
+"""
+from datetime import date, timedelta
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Rango de años que cubre el calendario precalculado por defecto
+ANIO_MIN = 2000
+ANIO_MAX = 2050
+
+DIAS_SEMANA = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
+
+
+# Función para calcular el domingo de Pascua (algoritmo anónimo gregoriano)
+def domingo_de_pascua(anio):
+    a = anio % 19
+    b, c = divmod(anio, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    mes, dia = divmod(h + l - 7 * m + 114, 31)
+    return date(anio, mes, dia + 1)
+
+
+def _siguiente_lunes(fecha):
+    return fecha + timedelta(days=(7 - fecha.weekday()) % 7)
+
+
+# Función para obtener los festivos de un año como pares (fecha, nombre)
+@lru_cache(maxsize=None)
+def festivos_colombia(anio):
+    pascua = domingo_de_pascua(anio)
+
+    festivos = [
+        (date(anio, 1, 1), "Año Nuevo"),
+        (pascua - timedelta(days=3), "Jueves Santo"),
+        (pascua - timedelta(days=2), "Viernes Santo"),
+        (date(anio, 5, 1), "Día del Trabajo"),
+        (date(anio, 7, 20), "Día de la Independencia"),
+        (date(anio, 8, 7), "Batalla de Boyacá"),
+        (date(anio, 12, 8), "Día de la Inmaculada Concepción"),
+        (date(anio, 12, 25), "Navidad"),
+    ]
+
+    # Festivos que la Ley Emiliani traslada al lunes siguiente
+    trasladables = [
+        (date(anio, 1, 6), "Día de los Reyes Magos"),
+        (date(anio, 3, 19), "Día de San José"),
+        (date(anio, 6, 29), "San Pedro y San Pablo"),
+        (date(anio, 8, 15), "Asunción de la Virgen"),
+        (date(anio, 10, 12), "Día de la Raza"),
+        (date(anio, 11, 1), "Todos los Santos"),
+        (date(anio, 11, 11), "Independencia de Cartagena"),
+        (pascua + timedelta(days=39), "Día de la Ascensión"),
+        (pascua + timedelta(days=60), "Corpus Christi"),
+        (pascua + timedelta(days=68), "Sagrado Corazón"),
+    ]
+    festivos += [(_siguiente_lunes(fecha), nombre) for fecha, nombre in trasladables]
+
+    return tuple(sorted(festivos))
+
+
+@lru_cache(maxsize=None)
+def _festivos_anio(anio):
+    return frozenset(fecha for fecha, _ in festivos_colombia(anio))
+
+
+@lru_cache(maxsize=8)
+def _calendario(anio_inicio, anio_fin):
+    festivos = [fecha for anio in range(anio_inicio, anio_fin + 1) for fecha, _ in festivos_colombia(anio)]
+    festivos = np.array(sorted(set(festivos)), dtype='datetime64[D]')
+    return festivos, np.busdaycalendar(weekmask='1111100', holidays=festivos)
+
+
+# Función para obtener el calendario laboral (lunes a viernes sin festivos) que cubre los años dados
+def calendario_laboral(anio_inicio=ANIO_MIN, anio_fin=ANIO_MAX):
+    return _calendario(min(anio_inicio, ANIO_MIN), max(anio_fin, ANIO_MAX))
+
+
+def _a_dias(fecha):
+    # Convierte una fecha suelta o una colección de fechas a datetime64[D]
+    if np.ndim(fecha) == 0:
+        return np.datetime64(pd.Timestamp(fecha).date(), 'D'), True
+    return pd.DatetimeIndex(fecha).values.astype('datetime64[D]'), False
+
+
+def _anios(dias):
+    anios = dias.astype('datetime64[Y]').astype(int) + 1970
+    return int(np.min(anios)), int(np.max(anios))
+
+
+def _resultado(valores, fecha, escalar):
+    if escalar:
+        return bool(valores)
+    if isinstance(fecha, pd.Series):
+        return pd.Series(valores, index=fecha.index)
+    return valores
+
+
+# Función para identificar festivos en Colombia (acepta una fecha o una colección de fechas)
+def es_festivo_colombia(fecha):
+    dias, escalar = _a_dias(fecha)
+    if escalar:
+        dia = dias.astype(date)
+        return dia in _festivos_anio(dia.year)
+    if len(dias) == 0:
+        return _resultado(np.zeros(0, dtype=bool), fecha, escalar)
+    festivos, _ = calendario_laboral(*_anios(dias))
+    return _resultado(np.isin(dias, festivos), fecha, escalar)
+
+
+# Función para determinar si un día es laboral (no es fin de semana ni festivo)
+def es_dia_laboral(fecha):
+    dias, escalar = _a_dias(fecha)
+    if not escalar and len(dias) == 0:
+        return _resultado(np.zeros(0, dtype=bool), fecha, escalar)
+    _, calendario = calendario_laboral(*_anios(np.atleast_1d(dias)))
+    return _resultado(np.is_busday(dias, busdaycal=calendario), fecha, escalar)
+
+
+# Función para calcular días laborables entre dos fechas (ambas incluidas)
+def dias_laborables_entre_fechas(fecha_inicio, fecha_fin):
+    inicio, _ = _a_dias(fecha_inicio)
+    fin, _ = _a_dias(fecha_fin)
+    if fin < inicio:
+        return 0
+    _, calendario = calendario_laboral(*_anios(np.array([inicio, fin])))
+    return int(np.busday_count(inicio, fin + 1, busdaycal=calendario))
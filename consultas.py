@@ -0,0 +1,58 @@
+"""Filtros comunes sobre el registro de actividades y su resumen diario.
+
+Los datos que entregan los almacenes están ordenados por fecha, así que un
+rango de fechas se resuelve con dos búsquedas binarias y un corte de filas
+(``ordenado=True``) en lugar de comparar toda la columna.
+
+Los filtros se combinan en una sola máscara y el resultado se materializa una
+sola vez. Los filtros que seleccionan todo (el caso por defecto del tablero) se
+omiten, y en las columnas categóricas la pertenencia se evalúa sobre los
+códigos con una tabla de búsqueda por categoría en lugar de ``isin``.
+"""
+import numpy as np
+import pandas as pd
+
+COLUMNAS_FILTRO = ['persona', 'proyecto', 'actividad']
+
+
+# Función para obtener las filas entre dos fechas (ambas incluidas) de datos ordenados por fecha
+def cortar_fechas(df, inicio=None, fin=None):
+    fechas = df['fecha']
+    desde = 0 if inicio is None else fechas.searchsorted(pd.Timestamp(inicio), side='left')
+    hasta = len(df) if fin is None else fechas.searchsorted(pd.Timestamp(fin), side='right')
+    if desde == 0 and hasta == len(df):
+        return df
+    return df.iloc[desde:hasta]
+
+
+# Función para obtener la máscara de pertenencia de una columna, o None si el filtro selecciona todas las filas
+def mascara_valores(serie, valores):
+    if not isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.isin(valores).to_numpy()
+
+    codigos = serie.cat.codes.to_numpy()
+    # Tabla indexada por código; la última posición corresponde al código -1 (valor nulo)
+    seleccion = np.zeros(len(serie.cat.categories) + 1, dtype=bool)
+    posiciones = serie.cat.categories.get_indexer(list(valores))
+    seleccion[posiciones[posiciones >= 0]] = True
+    if seleccion[:-1].all() and (len(codigos) == 0 or codigos.min() >= 0):
+        return None
+    return seleccion[codigos]
+
+
+# Función para filtrar por rango de fechas y por listas de personas, proyectos y actividades
+def filtrar_actividades(df, inicio=None, fin=None, personas=None, proyectos=None, actividades=None, ordenado=False):
+    # Un filtro vacío o None no restringe nada
+    mascara = None
+    if inicio is not None and fin is not None:
+        if ordenado:
+            df = cortar_fechas(df, inicio, fin)
+        else:
+            mascara = ((df['fecha'] >= inicio) & (df['fecha'] <= fin)).to_numpy()
+    for columna, valores in zip(COLUMNAS_FILTRO, (personas, proyectos, actividades)):
+        if valores:
+            condicion = mascara_valores(df[columna], valores)
+            if condicion is not None:
+                mascara = condicion if mascara is None else mascara & condicion
+    # Una sola materialización al final (o ninguna si no hubo filtros que restrinjan)
+    return df if mascara is None else df[mascara]
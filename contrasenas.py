@@ -0,0 +1,125 @@
+"""Hash y verificación de contraseñas fuera del hilo del script.
+
+El cálculo del KDF (PBKDF2 o scrypt) es costoso a propósito. Se ejecuta en un
+grupo pequeño y acotado de hilos (hashlib libera el GIL durante el cálculo), de
+modo que una ola de inicios de sesión no satura la CPU ni bloquea las demás
+sesiones.
+
+Cada hash guarda su algoritmo y parámetros::
+
+    pbkdf2_sha256$i=100000$<salt base64>$<clave base64>
+    scrypt$n=16384,r=8,p=1$<salt base64>$<clave base64>
+
+Así se puede cambiar el costo sin invalidar las contraseñas existentes: al
+iniciar sesión con un hash antiguo se vuelve a calcular con la configuración
+actual. Los hashes del formato anterior (base64 de salt + clave PBKDF2 con
+100000 iteraciones) se siguen aceptando.
+"""
+import base64
+import hashlib
+import hmac
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from metricas import medir, obtener_etapa
+
+# Algoritmos que se saben verificar
+ALGORITMOS = ("pbkdf2_sha256", "scrypt")
+
+# Algoritmo y costo de los hashes nuevos
+ALGORITMO = os.environ.get("BITACORA_KDF", "pbkdf2_sha256")
+ITERACIONES_PBKDF2 = int(os.environ.get("BITACORA_PBKDF2_ITERACIONES", 100000))
+SCRYPT_N = int(os.environ.get("BITACORA_SCRYPT_N", 2 ** 14))
+SCRYPT_R = 8
+SCRYPT_P = 1
+
+# Hilos que calculan hashes a la vez
+MAX_HILOS = min(4, os.cpu_count() or 1)
+
+LARGO_SALT = 32
+LARGO_CLAVE = 32
+
+_executor = ThreadPoolExecutor(max_workers=MAX_HILOS, thread_name_prefix="kdf")
+
+
+def _parametros_actuales():
+    if ALGORITMO == "scrypt":
+        return {"n": SCRYPT_N, "r": SCRYPT_R, "p": SCRYPT_P}
+    if ALGORITMO == "pbkdf2_sha256":
+        return {"i": ITERACIONES_PBKDF2}
+    raise ValueError(f"Algoritmo de contraseñas no soportado: {ALGORITMO}")
+
+
+def _derivar(algoritmo, parametros, password, salt):
+    if algoritmo == "scrypt":
+        n, r, p = parametros["n"], parametros["r"], parametros["p"]
+        return hashlib.scrypt(password.encode('utf-8'), salt=salt, n=n, r=r, p=p,
+                              maxmem=256 * n * r + 1024 * 1024, dklen=LARGO_CLAVE)
+    if algoritmo == "pbkdf2_sha256":
+        return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, parametros["i"])
+    raise ValueError(f"Algoritmo de contraseñas no soportado: {algoritmo}")
+
+
+def _codificar(algoritmo, parametros, salt, clave):
+    texto_parametros = ",".join(f"{nombre}={valor}" for nombre, valor in parametros.items())
+    return "$".join([algoritmo, texto_parametros, base64.b64encode(salt).decode('ascii'),
+                     base64.b64encode(clave).decode('ascii')])
+
+
+def _decodificar(almacenado):
+    if "$" not in almacenado:
+        # Formato anterior: base64(salt + clave) con PBKDF2-SHA256 de 100000 iteraciones
+        crudo = base64.b64decode(almacenado)
+        return "pbkdf2_sha256", {"i": 100000}, crudo[:LARGO_SALT], crudo[LARGO_SALT:]
+    algoritmo, texto_parametros, salt, clave = almacenado.split("$")
+    parametros = {nombre: int(valor) for nombre, valor in
+                  (par.split("=") for par in texto_parametros.split(","))}
+    return algoritmo, parametros, base64.b64decode(salt), base64.b64decode(clave)
+
+
+def _cifrar(password):
+    parametros = _parametros_actuales()
+    salt = os.urandom(LARGO_SALT)
+    return _codificar(ALGORITMO, parametros, salt, _derivar(ALGORITMO, parametros, password, salt))
+
+
+def _verificar(almacenado, password):
+    try:
+        algoritmo, parametros, salt, clave = _decodificar(almacenado)
+    except (ValueError, TypeError):
+        return False
+    if algoritmo not in ALGORITMOS:
+        return False
+    try:
+        with medir(f"contrasena.verificar.{algoritmo}"):
+            derivada = _derivar(algoritmo, parametros, password, salt)
+    except (ValueError, KeyError):
+        # Parámetros inválidos o faltantes: el hash no puede coincidir
+        return False
+    # Compara en tiempo constante para evitar ataques de timing
+    return hmac.compare_digest(derivada, clave)
+
+
+# Función para obtener el hash de una contraseña con la configuración actual
+def cifrar_contrasena(password):
+    return _executor.submit(_cifrar, password).result()
+
+
+# Función para verificar una contraseña contra su hash guardado
+def verificar_contrasena(almacenado, password):
+    return _executor.submit(_verificar, almacenado, password).result()
+
+
+# Función para saber si un hash se calculó con otro algoritmo o costo y conviene recalcularlo
+def necesita_actualizar(almacenado):
+    try:
+        algoritmo, parametros, _, _ = _decodificar(almacenado)
+    except (ValueError, TypeError):
+        return False
+    # El formato anterior se reemplaza aunque use el mismo costo, para que guarde algoritmo y parámetros
+    return "$" not in almacenado or algoritmo != ALGORITMO or parametros != _parametros_actuales()
+
+
+# Latencia de los inicios de sesión (verificación de la contraseña incluida) de todo el proceso
+latencias_login = obtener_etapa("inicio_sesion")
+
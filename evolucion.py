@@ -0,0 +1,116 @@
+"""Series de evolución temporal para los gráficos del tablero.
+
+Las horas diarias por persona o proyecto se agrupan en días, semanas o meses
+según el largo del rango (o la granularidad elegida), opcionalmente con un
+promedio móvil, y cada serie se reduce a un máximo de puntos con LTTB
+(Largest-Triangle-Three-Buckets), que conserva la forma de la curva. Las series
+ya preparadas se guardan en una caché LRU por (filtros, parámetros). Las figuras
+se dibujan en ``graficos``.
+"""
+import numpy as np
+import pandas as pd
+
+from cache_lru import CacheLRU
+
+# Granularidades disponibles y su frecuencia de pandas
+GRANULARIDADES = {"Día": "D", "Semana": "W", "Mes": "M"}
+
+# Largo máximo del rango (en días) para agrupar por día y por semana
+DIAS_MAX_DIARIO = 92
+DIAS_MAX_SEMANAL = 731
+
+# Puntos máximos por serie después de reducir con LTTB
+MAX_PUNTOS_SERIE = 400
+
+# Número de series preparadas que se conservan en memoria
+MAX_SERIES = 64
+
+_cache = CacheLRU(MAX_SERIES)
+
+
+# Función para elegir la granularidad según el largo del rango de fechas
+def elegir_granularidad(inicio, fin):
+    dias = (pd.Timestamp(fin) - pd.Timestamp(inicio)).days + 1
+    if dias <= DIAS_MAX_DIARIO:
+        return "Día"
+    if dias <= DIAS_MAX_SEMANAL:
+        return "Semana"
+    return "Mes"
+
+
+# Función para elegir los índices de los puntos que conserva LTTB (siempre el primero y el último)
+# Los puntos sin valor (NaN) solo se eligen si toda su cubeta está vacía
+def lttb(x, y, max_puntos):
+    n = len(x)
+    if max_puntos >= n or max_puntos < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    validos = ~np.isnan(y)
+    # Los puntos intermedios se reparten en max_puntos - 2 cubetas
+    limites = np.linspace(1, n - 1, max_puntos - 1).astype(np.int64)
+    indices = np.empty(max_puntos, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+
+    anterior = 0
+    for i in range(max_puntos - 2):
+        inicio, fin = limites[i], limites[i + 1]
+        # Promedio de la cubeta siguiente (la última cubeta se compara con el último punto)
+        siguiente = slice(fin, limites[i + 2]) if i + 2 < len(limites) else None
+        if siguiente is not None and validos[siguiente].any():
+            x_siguiente = x[siguiente][validos[siguiente]].mean()
+            y_siguiente = y[siguiente][validos[siguiente]].mean()
+        else:
+            x_siguiente, y_siguiente = x[-1], y[-1]
+        # Se conserva el punto que forma el triángulo de mayor área con el anterior y el promedio siguiente
+        areas = np.abs((x[anterior] - x_siguiente) * (y[inicio:fin] - y[anterior])
+                       - (x[anterior] - x[inicio:fin]) * (y_siguiente - y[anterior]))
+        anterior = inicio + int(np.nan_to_num(areas, nan=-1.0).argmax())
+        indices[i + 1] = anterior
+    return indices
+
+
+def _agrupar(diario, columna, granularidad):
+    if granularidad == "Día":
+        return diario[['fecha', columna, 'horas']]
+    periodo = diario['fecha'].dt.to_period(GRANULARIDADES[granularidad]).dt.start_time
+    return diario.groupby([periodo, columna], observed=True)['horas'].sum().reset_index()
+
+
+def _promedio_movil(serie, columna, granularidad, ventana):
+    # Los períodos sin horas cuentan como cero dentro de la ventana
+    ancha = serie.pivot_table(index='fecha', columns=columna, values='horas', aggfunc='sum', fill_value=0,
+                              observed=True)
+    periodos = pd.period_range(ancha.index.min(), ancha.index.max(), freq=GRANULARIDADES[granularidad])
+    ancha = ancha.reindex(periodos.start_time, fill_value=0).rolling(ventana, min_periods=1).mean()
+    ancha.index.name = 'fecha'
+    return ancha.melt(ignore_index=False, value_name='horas').reset_index()
+
+
+def _reducir(serie, columna, max_puntos):
+    partes = []
+    for _, grupo in serie.groupby(columna, observed=True, sort=False):
+        indices = lttb(grupo['fecha'].to_numpy().astype('datetime64[s]').astype(np.int64),
+                       grupo['horas'].to_numpy(), max_puntos)
+        partes.append(grupo.iloc[indices])
+    return pd.concat(partes, ignore_index=True) if partes else serie
+
+
+# Función para preparar la serie de un gráfico de evolución a partir de las horas diarias por columna
+def preparar_serie(diario, columna, granularidad, ventana=1, max_puntos=MAX_PUNTOS_SERIE):
+    if diario.empty:
+        return diario[['fecha', columna, 'horas']]
+    serie = _agrupar(diario, columna, granularidad)
+    if ventana > 1:
+        serie = _promedio_movil(serie, columna, granularidad, ventana)
+    return _reducir(serie.sort_values([columna, 'fecha'], kind='stable'), columna, max_puntos)
+
+
+# Función para obtener la serie preparada, reutilizando la ya calculada para la misma clave de filtros
+def serie_evolucion(clave, diario, columna, granularidad, ventana=1, max_puntos=MAX_PUNTOS_SERIE):
+    return _cache.obtener_o_calcular(
+        (clave, columna, granularidad, ventana, max_puntos),
+        lambda: preparar_serie(diario, columna, granularidad, ventana, max_puntos)
+    )
+
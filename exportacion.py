@@ -0,0 +1,61 @@
+"""Serialización de datos para descarga (CSV, Parquet y Excel).
+
+Los archivos se generan solo cuando alguien pide la descarga y se memorizan por
+la clave del estado de filtros, de modo que pedir dos veces lo mismo no vuelve a
+serializar el DataFrame.
+"""
+import importlib.util
+import io
+
+from cache_lru import CacheLRU
+from metricas import medir
+
+# Formato -> (extensión, tipo MIME, módulo opcional requerido)
+FORMATOS = {
+    "CSV": ("csv", "text/csv", None),
+    "Parquet": ("parquet", "application/vnd.apache.parquet", "pyarrow"),
+    "Excel": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "openpyxl"),
+}
+
+# Número de archivos serializados que se conservan en memoria
+MAX_EXPORTACIONES = 8
+
+_cache = CacheLRU(MAX_EXPORTACIONES)
+
+
+# Función para listar los formatos cuyas dependencias están instaladas
+def formatos_disponibles():
+    return [nombre for nombre, (_, _, modulo) in FORMATOS.items()
+            if modulo is None or importlib.util.find_spec(modulo) is not None]
+
+
+def extension(formato):
+    return FORMATOS[formato][0]
+
+
+def tipo_mime(formato):
+    return FORMATOS[formato][1]
+
+
+# Función para convertir un DataFrame al formato indicado
+def serializar(df, formato):
+    if formato == "CSV":
+        return df.to_csv(index=False).encode('utf-8')
+
+    buffer = io.BytesIO()
+    if formato == "Parquet":
+        df.to_parquet(buffer, index=False)
+    elif formato == "Excel":
+        df.to_excel(buffer, index=False, sheet_name="Actividades")
+    else:
+        raise ValueError(f"Formato de exportación no soportado: {formato}")
+    return buffer.getvalue()
+
+
+# Función para obtener los bytes de una exportación, reutilizando los ya generados para la misma clave
+def exportar(clave, formato, df):
+    def _serializar():
+        with medir(f"exportacion.{extension(formato)}", filas=len(df)):
+            return serializar(df, formato)
+
+    return _cache.obtener_o_calcular((clave, formato), _serializar)
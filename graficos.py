@@ -0,0 +1,103 @@
+"""Figuras del tablero "Filtros".
+
+La aplicación importa este módulo solo al abrir esa pestaña, de modo que plotly
+no se carga en el arranque ni en las demás pestañas. Las figuras se guardan en
+una caché LRU por (filtros, figura): un rerun que no cambia los filtros (cambiar
+de página, buscar, registrar en otra pestaña) no vuelve a construirlas.
+"""
+import plotly.express as px
+import plotly.graph_objects as go
+import streamlit as st
+from plotly.colors import qualitative
+
+from cache_lru import CacheLRU
+from metricas import medir
+
+# Número de figuras que se conservan en memoria
+MAX_FIGURAS = 64
+
+# Puntos totales a partir de los cuales las series de evolución usan WebGL
+UMBRAL_WEBGL = 2000
+
+# Series con más puntos que esto se dibujan sin marcadores
+MAX_MARCADORES_SERIE = 120
+
+_cache = CacheLRU(MAX_FIGURAS)
+
+
+# Función para obtener una figura, construyéndola solo si no está en caché para la clave
+def obtener_figura(nombre, clave, construir):
+    def _construir():
+        with medir(f"figura.{nombre}"):
+            return construir()
+
+    return _cache.obtener_o_calcular((nombre, clave), _construir)
+
+
+# Función para mostrar una figura en la página (la construcción y el envío al navegador se miden aparte)
+def mostrar(nombre, clave, construir):
+    figura = obtener_figura(nombre, clave, construir)
+    with medir(f"grafico.{nombre}"):
+        st.plotly_chart(figura, use_container_width=True)
+
+
+def torta_actividades(datos):
+    fig = px.pie(
+        datos,
+        values='horas',
+        names='actividad',
+        title='Distribución de Horas por Actividad (Últimos 30 días)',
+        color_discrete_sequence=px.colors.qualitative.Set3
+    )
+    fig.update_traces(textposition='inside', textinfo='percent+label')
+    return fig
+
+
+def barras_personas(datos):
+    return px.bar(
+        datos,
+        x='persona',
+        y='horas',
+        title='Horas Totales por Persona (Últimos 30 días)',
+        color='persona',
+        color_discrete_sequence=px.colors.qualitative.Bold
+    )
+
+
+def barras_proyectos(datos):
+    return px.bar(
+        datos,
+        x='proyecto',
+        y='horas',
+        title='Horas Totales por Proyecto (Últimos 30 días)',
+        color='proyecto',
+        color_discrete_sequence=px.colors.qualitative.Pastel
+    )
+
+
+def matriz_proyecto_persona(matriz):
+    fig = px.imshow(
+        matriz,
+        text_auto='.1f',
+        color_continuous_scale='Blues',
+        title='Distribución de Horas por Proyecto y Persona'
+    )
+    fig.update_layout(height=400)
+    return fig
+
+
+# Función para dibujar una serie de evolución (una línea por valor de la columna)
+def evolucion(serie, columna, titulo):
+    traza = go.Scattergl if len(serie) > UMBRAL_WEBGL else go.Scatter
+    colores = qualitative.Plotly
+    fig = go.Figure()
+    for i, (valor, grupo) in enumerate(serie.groupby(columna, observed=True, sort=True)):
+        fig.add_trace(traza(
+            x=grupo['fecha'],
+            y=grupo['horas'],
+            name=str(valor),
+            mode='lines+markers' if len(grupo) <= MAX_MARCADORES_SERIE else 'lines',
+            line=dict(color=colores[i % len(colores)]),
+        ))
+    fig.update_layout(title=titulo, xaxis_title='fecha', yaxis_title='horas', legend_title_text=columna)
+    return fig
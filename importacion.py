@@ -0,0 +1,216 @@
+"""Importación de planillas históricas (CSV o Excel) por bloques.
+
+Los archivos se leen en bloques de tamaño fijo (``pd.read_csv`` con
+``chunksize`` o ``openpyxl`` en modo de solo lectura), así que pueden ser más
+grandes que la memoria disponible. Cada bloque se normaliza (fechas en varios
+formatos, espacios en las etiquetas), se valida y se compara contra un índice
+de hashes de la clave (fecha, persona, actividad, proyecto) que incluye los
+registros existentes y los ya importados, para no duplicar filas. Las filas
+rechazadas se pueden escribir en un CSV con el motivo.
+
+Uso desde la línea de comandos:
+
+    python importacion.py historico_2019.xlsx historico_2020.csv --rechazos rechazos.csv
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from almacenamiento import COLUMNAS, obtener_almacen
+
+# Filas que se leen y escriben por bloque
+TAMANO_BLOQUE = 50_000
+
+# Horas máximas de un registro histórico
+MAX_HORAS_REGISTRO = 24.0
+
+# Columnas que identifican un registro para detectar duplicados
+CLAVE_DUPLICADOS = ["fecha", "persona", "actividad", "proyecto"]
+
+# Bloques ordenados que acumula el índice antes de fusionarlos en uno
+MAX_BLOQUES_INDICE = 8
+
+
+# Función para leer un CSV o un Excel por bloques de DataFrames
+def leer_por_bloques(archivo, nombre=None, tamano_bloque=TAMANO_BLOQUE):
+    nombre = nombre or archivo
+    if os.path.splitext(nombre)[1].lower() in (".xlsx", ".xlsm"):
+        yield from _leer_excel_por_bloques(archivo, tamano_bloque)
+    else:
+        yield from pd.read_csv(archivo, chunksize=tamano_bloque, dtype=str, keep_default_na=False)
+
+
+def _leer_excel_por_bloques(archivo, tamano_bloque):
+    from openpyxl import load_workbook
+
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        filas = libro.active.iter_rows(values_only=True)
+        encabezado = [str(col) for col in next(filas, [])]
+        bloque = []
+        leidas = 0
+        for fila in filas:
+            bloque.append(fila)
+            if len(bloque) == tamano_bloque:
+                yield _bloque_excel(bloque, encabezado, leidas)
+                leidas += len(bloque)
+                bloque = []
+        if bloque:
+            yield _bloque_excel(bloque, encabezado, leidas)
+    finally:
+        libro.close()
+
+
+def _bloque_excel(filas, encabezado, inicio):
+    # Índice continuo entre bloques (como read_csv con chunksize) para numerar bien las filas rechazadas
+    return pd.DataFrame(filas, columns=encabezado, index=pd.RangeIndex(inicio, inicio + len(filas)))
+
+
+def _normalizar_texto(serie):
+    return serie.astype('string').str.strip().str.replace(r"\s+", " ", regex=True).replace("", pd.NA)
+
+
+def _convertir_fechas(serie, dia_primero=False):
+    # Primero el formato ISO (rápido); las que fallan se reintentan con formato flexible
+    texto = serie.astype('string').str.strip()
+    fechas = pd.to_datetime(texto, format='ISO8601', errors='coerce')
+    faltantes = fechas.isna() & texto.notna()
+    if faltantes.any():
+        fechas[faltantes] = pd.to_datetime(texto[faltantes], format='mixed', dayfirst=dia_primero, errors='coerce')
+    return fechas.dt.normalize()
+
+
+# Función para normalizar un bloque; devuelve el bloque con las columnas estándar y el motivo de rechazo por fila
+def normalizar_bloque(bloque, dia_primero=False):
+    bloque = bloque.rename(columns=lambda col: str(col).strip().lower())
+    faltantes = [col for col in COLUMNAS if col not in bloque.columns]
+    if faltantes:
+        raise ValueError(f"Faltan columnas en el archivo: {', '.join(faltantes)}")
+
+    normalizado = pd.DataFrame({
+        "fecha": _convertir_fechas(bloque['fecha'], dia_primero),
+        "persona": _normalizar_texto(bloque['persona']),
+        "actividad": _normalizar_texto(bloque['actividad']),
+        "proyecto": _normalizar_texto(bloque['proyecto']),
+        "horas": pd.to_numeric(bloque['horas'].astype('string').str.replace(",", ".", regex=False),
+                               errors='coerce').astype(float),
+    }, index=bloque.index)
+
+    reglas = [
+        (normalizado['fecha'].isna(), "Fecha inválida"),
+        (normalizado[["persona", "actividad", "proyecto"]].isna().any(axis=1), "Faltan persona, actividad o proyecto"),
+        (~normalizado['horas'].between(0, MAX_HORAS_REGISTRO, inclusive='right').fillna(False),
+         f"Horas inválidas (deben estar entre 0 y {MAX_HORAS_REGISTRO:g})"),
+    ]
+    motivo = np.select([np.asarray(condicion, dtype=bool) for condicion, _ in reglas],
+                       [texto for _, texto in reglas], default="")
+    return normalizado, motivo
+
+
+# Función para calcular el hash de la clave (fecha, persona, actividad, proyecto) de cada fila
+def hash_claves(df):
+    # La fecha se lleva a segundos para que el hash no dependa de la resolución del datetime64
+    claves = df[CLAVE_DUPLICADOS].assign(
+        fecha=pd.to_datetime(df['fecha']).dt.normalize().astype('datetime64[s]'))
+    return pd.util.hash_pandas_object(claves, index=False).to_numpy()
+
+
+class IndiceHashes:
+    """Conjunto de hashes guardado como bloques ordenados de numpy.
+
+    Consultar es una búsqueda binaria por bloque; al acumular demasiados
+    bloques se fusionan en uno, como en un árbol LSM. Ocupa 8 bytes por clave.
+    """
+
+    def __init__(self, hashes=None):
+        self._bloques = []
+        if hashes is not None:
+            self.agregar(hashes)
+
+    def contiene(self, hashes):
+        resultado = np.zeros(len(hashes), dtype=bool)
+        for bloque in self._bloques:
+            posiciones = np.minimum(np.searchsorted(bloque, hashes), len(bloque) - 1)
+            resultado |= bloque[posiciones] == hashes
+        return resultado
+
+    def agregar(self, hashes):
+        if len(hashes) == 0:
+            return
+        self._bloques.append(np.unique(hashes))
+        if len(self._bloques) > MAX_BLOQUES_INDICE:
+            self._bloques = [np.unique(np.concatenate(self._bloques))]
+
+    def __len__(self):
+        return sum(len(bloque) for bloque in self._bloques)
+
+
+# Función para importar un archivo al almacén; devuelve un resumen con las cifras de la importación
+def importar_archivo(almacen, archivo, nombre=None, indice=None, archivo_rechazos=None, dia_primero=False,
+                     tamano_bloque=TAMANO_BLOQUE, progreso=None):
+    if indice is None:
+        indice = IndiceHashes(hash_claves(almacen.obtener()))
+
+    resumen = {"leidas": 0, "importadas": 0, "duplicadas": 0, "rechazadas": 0}
+    for bloque in leer_por_bloques(archivo, nombre, tamano_bloque):
+        normalizado, motivo = normalizar_bloque(bloque, dia_primero)
+        resumen["leidas"] += len(bloque)
+
+        validas = motivo == ""
+        hashes = hash_claves(normalizado)
+        # Duplicadas contra lo existente y dentro del mismo bloque (solo entre filas válidas: una fila
+        # rechazada no debe hacer que se descarte una válida con la misma clave)
+        repetidas = np.zeros(len(hashes), dtype=bool)
+        repetidas[validas] = pd.Series(hashes[validas]).duplicated().to_numpy()
+        duplicadas = validas & (indice.contiene(hashes) | repetidas)
+        motivo = np.where(duplicadas, "Duplicada (fecha, persona, actividad, proyecto)", motivo)
+        nuevas = validas & ~duplicadas
+
+        if nuevas.any():
+            almacen.agregar_lote(normalizado[nuevas].to_dict('records'))
+            indice.agregar(hashes[nuevas])
+
+        resumen["importadas"] += int(nuevas.sum())
+        resumen["duplicadas"] += int(duplicadas.sum())
+        resumen["rechazadas"] += int((~validas).sum())
+
+        if archivo_rechazos is not None and (motivo != "").any():
+            rechazadas = bloque[motivo != ""].assign(motivo=motivo[motivo != ""])
+            # El número de fila corresponde a la línea del archivo (contando el encabezado)
+            rechazadas.insert(0, "fila", rechazadas.index + 2)
+            escribir_encabezado = not os.path.exists(archivo_rechazos) or os.path.getsize(archivo_rechazos) == 0
+            rechazadas.to_csv(archivo_rechazos, mode='a', header=escribir_encabezado, index=False)
+
+        if progreso is not None:
+            progreso(resumen)
+    return resumen
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importa planillas históricas de horas (CSV o Excel) por bloques.")
+    parser.add_argument("archivos", nargs="+", help="Archivos CSV o XLSX a importar")
+    parser.add_argument("--csv", default="registro_actividades.csv", help="CSV de actividades de destino")
+    parser.add_argument("--db", default=os.environ.get("BITACORA_DB"), help="Base SQLite de destino (opcional)")
+    parser.add_argument("--rechazos", help="CSV donde se escriben las filas rechazadas con su motivo")
+    parser.add_argument("--dia-primero", action="store_true", help="Interpreta fechas ambiguas como día/mes/año")
+    parser.add_argument("--tamano-bloque", type=int, default=TAMANO_BLOQUE, help="Filas por bloque")
+    args = parser.parse_args()
+
+    if args.db:
+        from base_datos import obtener_almacen_sqlite
+        almacen = obtener_almacen_sqlite(args.db)
+    else:
+        almacen = obtener_almacen(args.csv)
+        almacen.inicializar()
+
+    indice = IndiceHashes(hash_claves(almacen.obtener()))
+    for ruta in args.archivos:
+        cifras = importar_archivo(
+            almacen, ruta, indice=indice, archivo_rechazos=args.rechazos, dia_primero=args.dia_primero,
+            tamano_bloque=args.tamano_bloque,
+            progreso=lambda parcial: print(f"  {parcial['leidas']} filas leídas...", end="\r")
+        )
+        print(f"\r{ruta}: {cifras['leidas']} leídas, {cifras['importadas']} importadas, "
+              f"{cifras['duplicadas']} duplicadas, {cifras['rechazadas']} rechazadas")
@@ -0,0 +1,286 @@
+"""Métricas de rendimiento del proceso: duración, filas y memoria por etapa.
+
+Las etapas del camino caliente (carga de datos, filtros, agregados y gráficos,
+fases del reporte PDF, verificación de contraseñas, escrituras a disco) se
+miden con ``medir`` o ``Fases``. Cada etapa acumula tres histogramas (segundos,
+filas procesadas y variación de la memoria residente) con cubetas fijas, como
+los de Prometheus, y conserva las últimas muestras para calcular percentiles.
+
+Las métricas son del proceso (compartidas por todas las sesiones) y se pueden
+exportar en el formato de texto de Prometheus, a un archivo o por HTTP::
+
+    BITACORA_METRICAS_PUERTO=9464 streamlit run app.py
+
+La variación de memoria es la del proceso completo durante la etapa, así que
+con varias sesiones a la vez incluye lo que hicieron las demás. Con
+``BITACORA_METRICAS=0`` no se mide nada.
+"""
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# Medición activa (BITACORA_METRICAS=0 la desactiva)
+ACTIVAS = os.environ.get("BITACORA_METRICAS", "1") != "0"
+
+# Muestras recientes que se conservan por histograma para calcular percentiles
+MAX_MUESTRAS = 1000
+
+# Límites superiores de las cubetas de cada histograma
+LIMITES_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LIMITES_FILAS = (10, 100, 1_000, 10_000, 100_000, 1_000_000)
+LIMITES_MEMORIA = (0, 2 ** 20, 4 * 2 ** 20, 16 * 2 ** 20, 64 * 2 ** 20, 256 * 2 ** 20)
+
+# Prefijo de los nombres de las métricas exportadas
+PREFIJO = "bitacora"
+
+try:
+    _TAMANO_PAGINA = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):  # Windows
+    _TAMANO_PAGINA = None
+
+
+# Función para obtener la memoria residente del proceso en bytes (None si el sistema no la expone)
+def memoria_residente():
+    if _TAMANO_PAGINA is None:
+        return None
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _TAMANO_PAGINA
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class Histograma:
+    """Cubetas acumulativas, suma y cuenta de una magnitud, más sus últimas muestras."""
+
+    def __init__(self, limites, max_muestras=MAX_MUESTRAS):
+        self.limites = tuple(limites)
+        self._cubetas = np.zeros(len(self.limites) + 1, dtype=np.int64)
+        self._suma = 0.0
+        self._muestras = deque(maxlen=max_muestras)
+        self._lock = threading.Lock()
+
+    def registrar(self, valor):
+        with self._lock:
+            # Última cubeta: valores mayores que todos los límites (+Inf)
+            self._cubetas[np.searchsorted(self.limites, valor, side='left')] += 1
+            self._suma += valor
+            self._muestras.append(valor)
+
+    def percentiles(self, valores=(50, 95, 99)):
+        with self._lock:
+            muestras = list(self._muestras)
+        if not muestras:
+            return {}
+        return {valor: float(p) for valor, p in zip(valores, np.percentile(muestras, valores))}
+
+    # Función para obtener (cubetas acumuladas, suma, cuenta) de una vez
+    def instantanea(self):
+        with self._lock:
+            acumuladas = np.cumsum(self._cubetas)
+            return acumuladas.tolist(), self._suma, int(acumuladas[-1])
+
+    def __len__(self):
+        return int(self._cubetas.sum())
+
+
+class Etapa:
+    """Histogramas de duración, filas y memoria de una etapa."""
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+        self.reiniciar()
+
+    def reiniciar(self):
+        self.segundos = Histograma(LIMITES_SEGUNDOS)
+        self.filas = Histograma(LIMITES_FILAS)
+        self.memoria = Histograma(LIMITES_MEMORIA)
+
+    def registrar(self, segundos, filas=None, memoria=None):
+        self.segundos.registrar(segundos)
+        if filas is not None:
+            self.filas.registrar(filas)
+        if memoria is not None:
+            self.memoria.registrar(memoria)
+
+    # Percentiles de la duración
+    def percentiles(self, valores=(50, 95, 99)):
+        return self.segundos.percentiles(valores)
+
+    def __len__(self):
+        return len(self.segundos)
+
+
+_etapas = {}
+_etapas_lock = threading.Lock()
+
+
+# Función para obtener la etapa con ese nombre, creándola la primera vez
+def obtener_etapa(nombre):
+    with _etapas_lock:
+        if nombre not in _etapas:
+            _etapas[nombre] = Etapa(nombre)
+        return _etapas[nombre]
+
+
+# Función para descartar todas las mediciones del proceso (las etapas siguen registradas)
+def reiniciar():
+    with _etapas_lock:
+        for etapa in _etapas.values():
+            etapa.reiniciar()
+
+
+class Medicion:
+    """Medición en curso; ``filas`` se puede asignar dentro del bloque."""
+
+    def __init__(self, etapa, filas=None):
+        self.etapa = etapa
+        self.filas = filas
+        self._inicio = None
+        self._memoria = None
+
+    def iniciar(self):
+        self._memoria = memoria_residente()
+        self._inicio = time.perf_counter()
+        return self
+
+    def terminar(self):
+        segundos = time.perf_counter() - self._inicio
+        memoria = memoria_residente()
+        delta = None if memoria is None or self._memoria is None else memoria - self._memoria
+        obtener_etapa(self.etapa).registrar(segundos, self.filas, delta)
+
+
+# Función para medir un bloque de código como una etapa
+@contextmanager
+def medir(etapa, filas=None):
+    medicion = Medicion(etapa, filas)
+    if not ACTIVAS:
+        yield medicion
+        return
+    medicion.iniciar()
+    try:
+        yield medicion
+    finally:
+        medicion.terminar()
+
+
+class Fases:
+    """Etapas consecutivas de un mismo proceso: cada ``siguiente`` cierra la fase anterior."""
+
+    def __init__(self, prefijo):
+        self.prefijo = prefijo
+        self._actual = None
+
+    def siguiente(self, fase, filas=None):
+        self.terminar()
+        if ACTIVAS:
+            self._actual = Medicion(f"{self.prefijo}.{fase}", filas).iniciar()
+        return self._actual
+
+    def terminar(self):
+        if self._actual is not None:
+            self._actual.terminar()
+            self._actual = None
+
+
+# Función para obtener una fila por etapa con sus percentiles (duraciones en milisegundos)
+def resumen():
+    with _etapas_lock:
+        etapas = sorted(_etapas.values(), key=lambda etapa: etapa.nombre)
+    filas = []
+    for etapa in etapas:
+        _, total, llamadas = etapa.segundos.instantanea()
+        if not llamadas:
+            continue
+        duracion = etapa.segundos.percentiles((50, 95))
+        filas_p = etapa.filas.percentiles((50, 95))
+        memoria = etapa.memoria.percentiles((50, 95))
+        filas.append({
+            "etapa": etapa.nombre,
+            "llamadas": llamadas,
+            "p50_ms": duracion.get(50, 0.0) * 1000,
+            "p95_ms": duracion.get(95, 0.0) * 1000,
+            "total_s": total,
+            "filas_p50": filas_p.get(50),
+            "filas_p95": filas_p.get(95),
+            "memoria_p50_mb": memoria[50] / 2 ** 20 if memoria else None,
+            "memoria_p95_mb": memoria[95] / 2 ** 20 if memoria else None,
+        })
+    return filas
+
+
+def _etiqueta(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _limite(valor):
+    return "+Inf" if valor is None else repr(float(valor))
+
+
+# Función para exportar todas las etapas en el formato de texto de Prometheus
+def exportar_prometheus():
+    with _etapas_lock:
+        etapas = sorted(_etapas.values(), key=lambda etapa: etapa.nombre)
+    lineas = []
+    for atributo, unidad, ayuda in (("segundos", "segundos", "Duración de la etapa en segundos"),
+                                    ("filas", "filas", "Filas procesadas por la etapa"),
+                                    ("memoria", "memoria_bytes", "Variación de la memoria residente durante la etapa")):
+        metrica = f"{PREFIJO}_etapa_{unidad}"
+        lineas.append(f"# HELP {metrica} {ayuda}")
+        lineas.append(f"# TYPE {metrica} histogram")
+        for etapa in etapas:
+            histograma = getattr(etapa, atributo)
+            acumuladas, suma, cuenta = histograma.instantanea()
+            if not cuenta:
+                continue
+            etiqueta = f'etapa="{_etiqueta(etapa.nombre)}"'
+            for limite, valor in zip(histograma.limites + (None,), acumuladas):
+                lineas.append(f'{metrica}_bucket{{{etiqueta},le="{_limite(limite)}"}} {valor}')
+            lineas.append(f"{metrica}_sum{{{etiqueta}}} {suma!r}")
+            lineas.append(f"{metrica}_count{{{etiqueta}}} {cuenta}")
+    return "\n".join(lineas) + "\n"
+
+
+# Función para escribir las métricas en un archivo (reemplazo atómico, apto para el textfile collector)
+def escribir_prometheus(ruta):
+    temporal = f"{ruta}.tmp"
+    with open(temporal, 'w', encoding='utf-8') as f:
+        f.write(exportar_prometheus())
+    os.replace(temporal, ruta)
+
+
+class _ManejadorMetricas(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        cuerpo = exportar_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, formato, *args):
+        pass  # Sin una línea en la consola por cada consulta del recolector
+
+
+_servidores = {}
+_servidores_lock = threading.Lock()
+
+
+# Función para servir las métricas por HTTP en un hilo aparte (una sola vez por puerto en el proceso)
+def servir_prometheus(puerto, host="127.0.0.1"):
+    with _servidores_lock:
+        if (host, puerto) not in _servidores:
+            servidor = ThreadingHTTPServer((host, puerto), _ManejadorMetricas)
+            servidor.daemon_threads = True
+            threading.Thread(target=servidor.serve_forever, name="metricas", daemon=True).start()
+            _servidores[(host, puerto)] = servidor
+        return _servidores[(host, puerto)]
@@ -0,0 +1,47 @@
+"""Paginación en el servidor para la tabla "Datos Detallados".
+
+Solo se envía al navegador la página visible. El orden de las filas se calcula
+una vez por (datos, columna, sentido) y se guarda como un arreglo de posiciones
+en una caché LRU, de modo que pasar de una página a otra solo toma un corte de
+ese arreglo, sin volver a ordenar todo el DataFrame.
+"""
+import math
+
+import numpy as np
+
+from cache_lru import CacheLRU
+
+# Opciones de filas por página
+TAMANOS_PAGINA = [25, 50, 100, 250, 500]
+
+# Número de órdenes de filas que se conservan en memoria
+MAX_ORDENES = 32
+
+_cache = CacheLRU(MAX_ORDENES)
+
+
+def _calcular_orden(df, columna, ascendente):
+    if columna is None:
+        # Orden de registro: el índice es la posición de la fila en el archivo (o su id en la base),
+        # aunque los datos estén ordenados por fecha
+        posiciones = np.argsort(df.index.to_numpy(), kind='stable')
+        return posiciones if ascendente else posiciones[::-1]
+    # Orden estable: las filas empatadas conservan el orden de los datos (por fecha y, dentro de un día,
+    # por registro)
+    serie = df[columna].reset_index(drop=True)
+    return serie.sort_values(ascending=ascendente, kind='stable').index.to_numpy()
+
+
+# Función para obtener las posiciones de las filas ordenadas, reutilizando las ya calculadas para la clave
+def orden_filas(clave, df, columna=None, ascendente=True):
+    return _cache.obtener_o_calcular((clave, columna, ascendente), lambda: _calcular_orden(df, columna, ascendente))
+
+
+def total_paginas(total_filas, tamano_pagina):
+    return max(1, math.ceil(total_filas / tamano_pagina))
+
+
+# Función para obtener las filas de una página (numerada desde 1)
+def pagina(df, orden, numero, tamano_pagina):
+    inicio = (numero - 1) * tamano_pagina
+    return df.iloc[orden[inicio:inicio + tamano_pagina]]
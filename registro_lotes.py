@@ -0,0 +1,107 @@
+"""Registro de actividades por lotes (una semana completa o una planilla).
+
+Todas las reglas se evalúan de forma vectorizada sobre el lote completo:
+persona y proyecto conocidos, actividad no vacía, horas dentro del rango del
+formulario individual, día laboral según el calendario de festivos y tope de
+horas diarias por persona (sumando lo ya registrado). Las filas aceptadas se
+guardan luego en una sola escritura.
+"""
+import os
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from almacenamiento import COLUMNAS
+from calendario import es_dia_laboral
+
+# Rango de horas de un registro (el mismo del formulario individual)
+HORAS_MIN = 0.5
+HORAS_MAX = 8.0
+
+# Máximo de horas que una persona puede registrar en un mismo día
+MAX_HORAS_DIA = 16.0
+
+COLUMNAS_TEXTO = ["persona", "actividad", "proyecto"]
+
+
+# Función para leer una planilla CSV o XLSX subida por el usuario
+def leer_planilla(archivo, nombre):
+    if os.path.splitext(nombre)[1].lower() in (".xlsx", ".xls"):
+        df = pd.read_excel(archivo)
+    else:
+        df = pd.read_csv(archivo)
+    df.columns = [str(col).strip().lower() for col in df.columns]
+    for col in COLUMNAS:
+        if col not in df.columns:
+            df[col] = np.nan
+    return df[COLUMNAS]
+
+
+# Función para armar la tabla editable de una semana (una fila por día laboral)
+def semana_en_blanco(lunes, persona, actividad=None, proyecto=None):
+    dias = pd.date_range(lunes, lunes + timedelta(days=6))
+    dias = dias[np.asarray(es_dia_laboral(dias))]
+    return pd.DataFrame({
+        "fecha": dias.date,
+        "persona": persona,
+        "actividad": actividad,
+        "proyecto": proyecto,
+        "horas": np.nan,
+    })
+
+
+# Función para normalizar tipos y quitar las filas vacías
+# (en la tabla semanal, un día sin horas es un día que no se registra)
+def normalizar_lote(lote, omitir_sin_horas=False):
+    lote = lote.copy()
+    for col in COLUMNAS_TEXTO:
+        lote[col] = lote[col].astype('string').str.strip().replace("", pd.NA)
+    lote['fecha'] = pd.to_datetime(lote['fecha'], errors='coerce').dt.normalize()
+    lote['horas'] = pd.to_numeric(lote['horas'], errors='coerce').astype(float)
+    vacias = lote[['actividad', 'proyecto', 'horas']].isna().all(axis=1)
+    if omitir_sin_horas:
+        vacias |= lote['horas'].isna()
+    return lote[~vacias].reset_index(drop=True)
+
+
+# Función para validar un lote completo; devuelve (aceptadas, rechazadas con la columna 'motivo')
+def validar_lote(lote, personas, proyectos, resumen_existente=None, max_horas_dia=MAX_HORAS_DIA,
+                 omitir_sin_horas=False):
+    lote = normalizar_lote(lote, omitir_sin_horas)
+    if lote.empty:
+        return lote, lote.assign(motivo=pd.Series(dtype=str))
+
+    fecha_valida = lote['fecha'].notna()
+    laboral = np.zeros(len(lote), dtype=bool)
+    laboral[fecha_valida.to_numpy()] = np.asarray(es_dia_laboral(lote.loc[fecha_valida, 'fecha']))
+
+    # Las reglas se revisan en orden; cada fila queda con el primer motivo que incumple
+    reglas = [
+        (~fecha_valida, "Fecha inválida"),
+        (~lote['persona'].isin(personas).fillna(False), "Persona desconocida"),
+        (~lote['proyecto'].isin(proyectos).fillna(False), "Proyecto desconocido"),
+        (lote['actividad'].isna(), "Falta la actividad"),
+        (~lote['horas'].between(HORAS_MIN, HORAS_MAX).fillna(False),
+         f"Horas fuera del rango {HORAS_MIN}–{HORAS_MAX}"),
+        (~laboral, "No es día laboral (fin de semana o festivo)"),
+    ]
+    condiciones = [np.asarray(condicion, dtype=bool) for condicion, _ in reglas]
+    motivo = np.select(condiciones, [texto for _, texto in reglas], default="")
+
+    # Tope diario: horas ya registradas más las del lote, por persona y fecha
+    validas = motivo == ""
+    if validas.any():
+        claves = [lote['persona'].astype(object), lote['fecha']]
+        total_dia = lote['horas'].where(validas, 0).groupby(claves).transform('sum')
+        if resumen_existente is not None and not resumen_existente.empty:
+            existentes = resumen_existente.groupby(['persona', 'fecha'], observed=True)['horas'].sum()
+            existentes.index = existentes.index.set_levels(existentes.index.levels[0].astype(object), level=0)
+            indice = pd.MultiIndex.from_arrays(claves)
+            total_dia = total_dia + existentes.reindex(indice, fill_value=0).to_numpy()
+        excede = validas & (total_dia.to_numpy() > max_horas_dia + 1e-9)
+        motivo = np.where(excede, f"Supera el máximo de {max_horas_dia:g} horas en el día", motivo)
+
+    aceptadas = lote[motivo == ""].reset_index(drop=True)
+    rechazadas = lote[motivo != ""].assign(motivo=motivo[motivo != ""]).reset_index(drop=True)
+    return aceptadas, rechazadas
@@ -0,0 +1,305 @@
+"""Generación del reporte de actividades en PDF."""
+import numpy as np
+import pandas as pd
+
+from calendario import DIAS_SEMANA, dias_laborables_entre_fechas, es_dia_laboral, es_festivo_colombia
+from metricas import Fases
+
+# Máximo de filas en "Registros Detallados" (None para incluirlas todas)
+MAX_REGISTROS_DETALLE = 1000
+
+# Filas que se formatean a la vez al dibujar los registros detallados
+TAMANO_BLOQUE = 500
+
+
+# Función para agregar las horas en un solo paso por (persona, proyecto, actividad)
+def calcular_cubo(df):
+    return df.groupby(['persona', 'proyecto', 'actividad'], observed=True)['horas'].sum()
+
+
+# Función para obtener del cubo las tablas de una persona
+def resumen_persona(cubo_persona):
+    proyectos = cubo_persona.groupby(level='proyecto', observed=True).sum().sort_values(ascending=False)
+    actividades = cubo_persona.groupby(level='actividad', observed=True).sum().sort_values(ascending=False)
+
+    # Tabla cruzada de actividades y proyectos en orden alfabético
+    cruce = cubo_persona.unstack('proyecto', fill_value=0)
+    cruce = cruce.reindex(index=sorted(cruce.index), columns=sorted(cruce.columns), fill_value=0)
+
+    return {
+        'total': cubo_persona.sum(),
+        'proyectos': proyectos,
+        'actividades': actividades,
+        'cruce': cruce,
+    }
+
+
+def _avance(progreso, fraccion, mensaje):
+    if progreso is not None:
+        progreso(fraccion, mensaje)
+
+
+def _promedio(horas, dias_lab):
+    return horas / dias_lab if dias_lab > 0 else 0
+
+
+# Orden de los registros detallados
+ORDEN_DETALLE = ['persona', 'fecha', 'proyecto']
+
+
+def _codigos_orden(serie):
+    # Enteros con el mismo orden que sort_values (las categorías ya están en orden alfabético)
+    if hasattr(serie, 'cat'):
+        return serie.cat.codes.to_numpy()
+    return pd.factorize(serie, sort=True)[0]
+
+
+# Función para recorrer los registros detallados por bloques, con los textos ya formateados
+def filas_detalle(df, max_registros=None, tamano_bloque=TAMANO_BLOQUE):
+    if max_registros is not None and max_registros < len(df):
+        # Primero se eligen las filas que entran en el límite (sin ordenar todo) y luego se ordenan solo esas;
+        # keep='first' conserva el orden original entre empates, como el ordenamiento estable
+        claves = pd.DataFrame({col: df[col].to_numpy() if col == 'fecha' else _codigos_orden(df[col])
+                               for col in ORDEN_DETALLE})
+        elegidas = claves.nsmallest(max_registros, ORDEN_DETALLE, keep='first').index
+        df = df.iloc[np.sort(elegidas)]
+    df = df.sort_values(ORDEN_DETALLE)
+
+    for inicio in range(0, len(df), tamano_bloque):
+        bloque = df.iloc[inicio:inicio + tamano_bloque]
+        yield from zip(
+            bloque['fecha'].dt.strftime('%Y-%m-%d'),
+            np.where(es_dia_laboral(bloque['fecha'].to_numpy()), "Sí", "No"),
+            bloque['persona'].astype(str),
+            bloque['proyecto'].astype(str),
+            bloque['actividad'].astype(str),
+            bloque['horas'].map('{:.1f}'.format),
+        )
+
+
+# Función para generar un reporte en PDF
+def generate_pdf_report(df, report_title, start_date, end_date, selected_personas,
+                        max_registros_detalle=MAX_REGISTROS_DETALLE, archivo_salida=None, progreso=None,
+                        resumen=None):
+    # fpdf se carga solo al generar el primer reporte, no al abrir la aplicación
+    from fpdf import FPDF
+
+    class PDF(FPDF):
+        def header(self):
+            # Configuración del encabezado
+            self.set_font('Arial', 'B', 15)
+            self.cell(0, 10, "Reporte de Actividades", 0, 1, 'C')
+            self.set_font('Arial', '', 10)
+            self.cell(0, 10, f"Periodo: {start_date.strftime('%Y-%m-%d')} a {end_date.strftime('%Y-%m-%d')}", 0, 1, 'C')
+            self.ln(5)
+
+        def footer(self):
+            # Configuración del pie de página
+            self.set_y(-15)
+            self.set_font('Arial', 'I', 8)
+            self.cell(0, 10, f'Página {self.page_no()}', 0, 0, 'C')
+
+    # Crear PDF
+    pdf = PDF()
+    pdf.add_page()
+
+    # Título del reporte
+    pdf.set_font('Arial', 'B', 16)
+    pdf.cell(0, 10, report_title, 0, 1)
+    pdf.ln(5)
+
+    # Calcular días laborables en el período
+    dias_lab = dias_laborables_entre_fechas(start_date, end_date)
+
+    # Resumen general
+    pdf.set_font('Arial', 'B', 14)
+    pdf.cell(0, 10, "Resumen General", 0, 1)
+    pdf.set_font('Arial', '', 11)
+
+    # Cada fase del reporte se mide por separado (ver metricas)
+    fases = Fases("reporte")
+
+    # Todas las cifras del reporte se leen de este cubo (del resumen diario si se proporciona)
+    _avance(progreso, 0.05, "Calculando totales")
+    fases.siguiente("totales", filas=len(df if resumen is None else resumen))
+    cubo = calcular_cubo(df if resumen is None else resumen)
+    cubos_persona = {
+        persona: cubo_persona.droplevel('persona')
+        for persona, cubo_persona in cubo.groupby(level='persona', observed=True)
+    }
+
+    total_horas = cubo.sum()
+
+    # Calcular promedio diario solo considerando días laborables
+    promedio_diario_laboral = _promedio(total_horas, dias_lab)
+
+    pdf.cell(0, 8, f"Total de horas registradas: {total_horas:.1f}", 0, 1)
+    pdf.cell(0, 8, f"Días laborables en el período: {dias_lab}", 0, 1)
+    pdf.cell(0, 8, f"Promedio diario de horas (días laborables): {promedio_diario_laboral:.1f}", 0, 1)
+    pdf.cell(0, 8, f"Personas incluidas: {', '.join(selected_personas)}", 0, 1)
+    pdf.ln(5)
+
+    # Detalles por persona
+    fases.siguiente("personas", filas=len(selected_personas))
+    pdf.set_font('Arial', 'B', 14)
+    pdf.cell(0, 10, "Detalle por Persona", 0, 1)
+
+    for i, persona in enumerate(selected_personas):
+        if persona not in cubos_persona:  # Solo mostrar si hay datos para esta persona
+            continue
+        _avance(progreso, 0.1 + 0.5 * i / len(selected_personas), f"Detalle de {persona}")
+        tablas_persona = resumen_persona(cubos_persona[persona])
+
+        pdf.set_font('Arial', 'B', 12)
+        pdf.cell(0, 10, f"{persona}", 0, 1)
+        pdf.set_font('Arial', '', 11)
+
+        # Horas totales para esta persona
+        pdf.cell(0, 8, f"Total de horas: {tablas_persona['total']:.1f}", 0, 1)
+
+        # Promedio de horas diarias considerando días laborables
+        if dias_lab > 0:
+            pdf.cell(0, 8, f"Promedio de horas diarias (días laborables): {_promedio(tablas_persona['total'], dias_lab):.1f}", 0, 1)
+
+        # Tabla de horas por proyecto con promedio diario
+        pdf.ln(5)
+        pdf.set_font('Arial', 'B', 10)
+        pdf.cell(80, 8, "Proyecto", 1, 0, 'C')
+        pdf.cell(30, 8, "Horas Totales", 1, 0, 'C')
+        pdf.cell(30, 8, "Prom. Diario", 1, 1, 'C')
+
+        pdf.set_font('Arial', '', 10)
+        for proyecto, horas in tablas_persona['proyectos'].items():
+            pdf.cell(80, 8, proyecto, 1, 0)
+            pdf.cell(30, 8, f"{horas:.1f}", 1, 0, 'R')
+            pdf.cell(30, 8, f"{_promedio(horas, dias_lab):.1f}", 1, 1, 'R')
+
+        # Tabla de horas por actividad con promedio diario
+        pdf.ln(5)
+        pdf.set_font('Arial', 'B', 10)
+        pdf.cell(80, 8, "Actividad", 1, 0, 'C')
+        pdf.cell(30, 8, "Horas Totales", 1, 0, 'C')
+        pdf.cell(30, 8, "Prom. Diario", 1, 1, 'C')
+
+        pdf.set_font('Arial', '', 10)
+        for actividad, horas in tablas_persona['actividades'].items():
+            pdf.cell(80, 8, actividad, 1, 0)
+            pdf.cell(30, 8, f"{horas:.1f}", 1, 0, 'R')
+            pdf.cell(30, 8, f"{_promedio(horas, dias_lab):.1f}", 1, 1, 'R')
+
+        pdf.ln(10)
+
+        # Detalle de actividad y proyecto combinados
+        pdf.set_font('Arial', 'B', 11)
+        pdf.cell(0, 8, "Detalle de Actividades por Proyecto", 0, 1)
+
+        cruce = tablas_persona['cruce']
+        header_width = 50
+        column_width = 35
+
+        # Cabecera de la tabla
+        pdf.set_font('Arial', 'B', 9)
+        pdf.cell(header_width, 8, "Actividad", 1, 0, 'C')
+        for proyecto in cruce.columns:
+            pdf.cell(column_width, 4, proyecto, 1, 0, 'C')
+        pdf.ln(4)
+
+        # Segunda línea de la cabecera
+        pdf.cell(header_width, 4, "", 0, 0)
+        for _ in cruce.columns:
+            pdf.cell(column_width / 2, 4, "Total", 1, 0, 'C')
+            pdf.cell(column_width / 2, 4, "Prom", 1, 0, 'C')
+        pdf.ln(4)
+
+        # Contenido de la tabla
+        pdf.set_font('Arial', '', 9)
+        for actividad, fila in zip(cruce.index, cruce.to_numpy()):
+            pdf.cell(header_width, 8, actividad, 1, 0)
+            for horas in fila:
+                pdf.cell(column_width / 2, 8, f"{horas:.1f}", 1, 0, 'R')
+                pdf.cell(column_width / 2, 8, f"{_promedio(horas, dias_lab):.1f}", 1, 0, 'R')
+            pdf.ln(8)
+
+        pdf.ln(10)
+
+    # Tabla con datos detallados
+    _avance(progreso, 0.6, "Registros detallados")
+    fases.siguiente("detalle", filas=len(df) if max_registros_detalle is None else min(len(df), max_registros_detalle))
+    pdf.add_page()
+    pdf.set_font('Arial', 'B', 14)
+    pdf.cell(0, 10, "Registros Detallados", 0, 1)
+
+    total_registros = len(df)
+    if max_registros_detalle is not None and total_registros > max_registros_detalle:
+        pdf.set_font('Arial', 'I', 9)
+        pdf.multi_cell(0, 5, f"Se muestran {max_registros_detalle} de {total_registros} registros. "
+                             "El listado completo está disponible en el CSV del reporte.")
+        pdf.ln(3)
+
+    pdf.set_font('Arial', 'B', 8)
+    pdf.cell(25, 8, "Fecha", 1, 0, 'C')
+    pdf.cell(15, 8, "Laboral", 1, 0, 'C')
+    pdf.cell(30, 8, "Persona", 1, 0, 'C')
+    pdf.cell(45, 8, "Proyecto", 1, 0, 'C')
+    pdf.cell(55, 8, "Actividad", 1, 0, 'C')
+    pdf.cell(20, 8, "Horas", 1, 1, 'C')
+
+    pdf.set_font('Arial', '', 8)
+    for fecha, laboral, persona, proyecto, actividad, horas in filas_detalle(df, max_registros_detalle):
+        pdf.cell(25, 6, fecha, 1, 0)
+        pdf.cell(15, 6, laboral, 1, 0, 'C')
+        pdf.cell(30, 6, persona, 1, 0)
+        pdf.cell(45, 6, proyecto, 1, 0)
+        pdf.cell(55, 6, actividad, 1, 0)
+        pdf.cell(20, 6, horas, 1, 1, 'R')
+
+    # Agregar página con resumen de días laborables
+    _avance(progreso, 0.85, "Calendario de días laborables")
+    fases.siguiente("calendario")
+    pdf.add_page()
+    pdf.set_font('Arial', 'B', 14)
+    pdf.cell(0, 10, "Calendario de Días Laborables", 0, 1)
+
+    # Crear la lista de todas las fechas en el rango con sus marcas calculadas de una vez
+    rango_fechas = pd.date_range(start_date, end_date, freq='D')
+    todas_fechas = pd.DataFrame({
+        'fecha': rango_fechas.date,
+        'es_laboral': es_dia_laboral(rango_fechas),
+        'es_festivo': es_festivo_colombia(rango_fechas),
+        'dia_semana': np.array(DIAS_SEMANA)[rango_fechas.weekday]
+    }).to_dict('records')
+
+    # Mostrar calendario
+    pdf.set_font('Arial', 'B', 10)
+    pdf.cell(25, 8, "Fecha", 1, 0, 'C')
+    pdf.cell(30, 8, "Día", 1, 0, 'C')
+    pdf.cell(25, 8, "Laborable", 1, 0, 'C')
+    pdf.cell(25, 8, "Festivo", 1, 1, 'C')
+
+    pdf.set_font('Arial', '', 10)
+    for dia in todas_fechas:
+        pdf.cell(25, 6, str(dia['fecha']), 1, 0)
+        pdf.cell(30, 6, dia['dia_semana'], 1, 0)
+        pdf.cell(25, 6, "Sí" if dia['es_laboral'] else "No", 1, 0, 'C')
+        pdf.cell(25, 6, "Sí" if dia['es_festivo'] else "No", 1, 1, 'C')
+
+    pdf.ln(10)
+    pdf.set_font('Arial', 'B', 10)
+    pdf.cell(0, 8, f"Total días en el período: {len(todas_fechas)}", 0, 1)
+    pdf.cell(0, 8, f"Días laborables: {dias_lab}", 0, 1)
+    pdf.cell(0, 8, f"Días no laborables: {len(todas_fechas) - dias_lab}", 0, 1)
+
+    _avance(progreso, 0.95, "Escribiendo PDF")
+    fases.siguiente("escritura")
+
+    # fpdf 1.7 arma el documento completo en memoria antes de escribirlo; con archivo_salida solo se evita
+    # devolver además una copia de los bytes
+    if archivo_salida is not None:
+        pdf.output(archivo_salida, 'F')
+        fases.terminar()
+        return archivo_salida
+
+    # Crear buffer de bytes para el PDF
+    pdf_bytes = pdf.output(dest='S').encode('latin1')
+    fases.terminar()
+    return pdf_bytes
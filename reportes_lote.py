@@ -0,0 +1,214 @@
+"""Generación de reportes PDF desde la línea de comandos (cierres de mes, lotes).
+
+Los datos se cargan una sola vez y se reparten a un grupo de procesos, cada uno
+de los cuales genera reportes completos (uno por persona, por proyecto o
+general, para cada período). Cada reporte tiene una huella de sus datos y sus
+parámetros que se guarda en un manifiesto en el directorio de salida; en la
+siguiente ejecución se omiten los reportes cuya huella no cambió.
+
+Uso:
+
+    python reportes_lote.py --salida reportes --por persona proyecto
+    python reportes_lote.py --salida reportes --desde 2024-01-01 --hasta 2024-06-30 --periodo mes
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from almacenamiento import obtener_almacen
+from busqueda import normalizar
+from consultas import filtrar_actividades
+from reportes import MAX_REGISTROS_DETALLE, generate_pdf_report
+
+# Nombre del manifiesto con las huellas de los reportes generados
+MANIFIESTO = ".manifiesto.json"
+
+# Tipos de reporte: uno por persona, uno por proyecto o uno general
+AGRUPACIONES = ["persona", "proyecto", "general"]
+
+# Datos compartidos por las tareas de cada proceso (se asignan una vez al iniciarlo)
+_datos = None
+_resumen = None
+
+
+def _iniciar_proceso(datos, resumen):
+    global _datos, _resumen
+    _datos, _resumen = datos, resumen
+
+
+# Función para obtener los períodos (inicio, fin) de un rango: completo o dividido por meses
+def periodos(inicio, fin, periodo="rango"):
+    if periodo == "rango":
+        return [(inicio, fin)]
+    meses = pd.period_range(inicio, fin, freq='M')
+    return [(max(mes.start_time.normalize(), inicio), min(mes.end_time.normalize(), fin)) for mes in meses]
+
+
+# Función para obtener el mes calendario anterior a una fecha (el período por defecto)
+def mes_anterior(hoy=None):
+    mes = pd.Timestamp(hoy or pd.Timestamp.today()).to_period('M') - 1
+    return mes.start_time.normalize(), mes.end_time.normalize()
+
+
+def _nombre_archivo(agrupacion, valor, inicio, fin):
+    if valor:
+        # Valores distintos pueden quedar iguales al normalizarse ("José Pérez" y "Jose Perez"): se agrega un
+        # hash corto del valor original para que cada uno tenga su archivo
+        partes = [re.sub(r"[^a-z0-9]+", "_", normalizar(valor)).strip("_"),
+                  hashlib.sha256(valor.encode('utf-8')).hexdigest()[:8]]
+        etiqueta = "_".join(parte for parte in partes if parte)
+    else:
+        etiqueta = "todos"
+    return f"{agrupacion}_{etiqueta}_{inicio:%Y-%m-%d}_{fin:%Y-%m-%d}.pdf"
+
+
+def _filtros(tarea):
+    # Los datos del almacén están ordenados por fecha: el período se corta con búsqueda binaria
+    filtro = {"inicio": tarea["inicio"], "fin": tarea["fin"], "ordenado": True}
+    if tarea["agrupacion"] == "persona":
+        filtro["personas"] = [tarea["valor"]]
+    elif tarea["agrupacion"] == "proyecto":
+        filtro["proyectos"] = [tarea["valor"]]
+    return filtro
+
+
+# Función para calcular la huella de un reporte: sus parámetros y el contenido de sus filas
+def huella(tarea, datos):
+    parametros = {clave: str(valor) for clave, valor in tarea.items()}
+    digesto = hashlib.sha256(json.dumps(parametros, sort_keys=True).encode())
+    filas = datos.sort_values(list(datos.columns), kind='stable')
+    digesto.update(pd.util.hash_pandas_object(filas, index=False).to_numpy().tobytes())
+    return digesto.hexdigest()
+
+
+# Función para armar la lista de reportes a generar
+def planificar(datos, inicio, fin, agrupaciones=("persona",), periodo="rango", titulo="Reporte de Actividades",
+               max_registros=MAX_REGISTROS_DETALLE):
+    tareas = []
+    for inicio_periodo, fin_periodo in periodos(inicio, fin, periodo):
+        en_periodo = filtrar_actividades(datos, inicio_periodo, fin_periodo, ordenado=True)
+        for agrupacion in agrupaciones:
+            valores = [None] if agrupacion == "general" else sorted(en_periodo[agrupacion].astype(str).unique())
+            for valor in valores:
+                tareas.append({
+                    "agrupacion": agrupacion,
+                    "valor": valor,
+                    "inicio": inicio_periodo,
+                    "fin": fin_periodo,
+                    "titulo": f"{titulo} - {valor}" if valor else titulo,
+                    "max_registros": max_registros,
+                    "archivo": _nombre_archivo(agrupacion, valor, inicio_periodo, fin_periodo),
+                })
+    return tareas
+
+
+# Función que ejecuta cada proceso: genera un reporte y lo escribe en el directorio de salida
+def generar(tarea, directorio):
+    filtro = _filtros(tarea)
+    datos = filtrar_actividades(_datos, **filtro)
+    resumen = filtrar_actividades(_resumen, **filtro)
+    personas = sorted(datos['persona'].astype(str).unique())
+
+    ruta = os.path.join(directorio, tarea["archivo"])
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    generate_pdf_report(datos, tarea["titulo"], tarea["inicio"], tarea["fin"], personas,
+                        max_registros_detalle=tarea["max_registros"], archivo_salida=temporal, resumen=resumen)
+    os.replace(temporal, ruta)
+    return tarea["archivo"]
+
+
+def _leer_manifiesto(directorio):
+    try:
+        with open(os.path.join(directorio, MANIFIESTO), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _guardar_manifiesto(directorio, manifiesto):
+    ruta = os.path.join(directorio, MANIFIESTO)
+    with open(f"{ruta}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(manifiesto, f, indent=2, sort_keys=True)
+    os.replace(f"{ruta}.tmp", ruta)
+
+
+# Función para generar en paralelo los reportes que cambiaron; devuelve (generados, omitidos, errores)
+def generar_reportes(datos, resumen, tareas, directorio, procesos=None, forzar=False, informar=print):
+    os.makedirs(directorio, exist_ok=True)
+    manifiesto = _leer_manifiesto(directorio)
+
+    pendientes = {}
+    omitidos = []
+    for tarea in tareas:
+        filas = filtrar_actividades(datos, **_filtros(tarea))
+        if filas.empty:
+            continue
+        tarea_huella = huella(tarea, filas)
+        existe = os.path.exists(os.path.join(directorio, tarea["archivo"]))
+        if not forzar and existe and manifiesto.get(tarea["archivo"]) == tarea_huella:
+            omitidos.append(tarea["archivo"])
+        else:
+            pendientes[tarea["archivo"]] = (tarea, tarea_huella)
+
+    generados, errores = [], {}
+    if pendientes:
+        # Cada proceso recibe los datos una sola vez al iniciarse; las tareas solo llevan sus parámetros
+        with ProcessPoolExecutor(max_workers=procesos, initializer=_iniciar_proceso,
+                                 initargs=(datos, resumen)) as executor:
+            futuros = {executor.submit(generar, tarea, directorio): archivo
+                       for archivo, (tarea, _) in pendientes.items()}
+            for futuro in as_completed(futuros):
+                archivo = futuros[futuro]
+                try:
+                    futuro.result()
+                except Exception as e:
+                    errores[archivo] = str(e)
+                    informar(f"Error en {archivo}: {e}")
+                    continue
+                manifiesto[archivo] = pendientes[archivo][1]
+                _guardar_manifiesto(directorio, manifiesto)
+                generados.append(archivo)
+                informar(f"Generado {archivo} ({len(generados)}/{len(pendientes)})")
+    return generados, omitidos, errores
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera reportes PDF por persona, proyecto o período.")
+    parser.add_argument("--salida", required=True, help="Directorio donde se escriben los reportes")
+    parser.add_argument("--desde", help="Fecha inicial (AAAA-MM-DD); por defecto, el mes anterior")
+    parser.add_argument("--hasta", help="Fecha final (AAAA-MM-DD); por defecto, el mes anterior")
+    parser.add_argument("--por", nargs="+", choices=AGRUPACIONES, default=["persona"],
+                        help="Un reporte por persona, por proyecto y/o uno general")
+    parser.add_argument("--periodo", choices=["rango", "mes"], default="rango",
+                        help="Un reporte para todo el rango o uno por cada mes")
+    parser.add_argument("--titulo", default="Reporte de Actividades", help="Título de los reportes")
+    parser.add_argument("--max-registros", type=int, default=MAX_REGISTROS_DETALLE,
+                        help="Máximo de registros detallados en cada PDF")
+    parser.add_argument("--procesos", type=int, help="Procesos en paralelo (por defecto, uno por CPU)")
+    parser.add_argument("--forzar", action="store_true", help="Regenera también los reportes sin cambios")
+    parser.add_argument("--csv", default="registro_actividades.csv", help="CSV de actividades")
+    parser.add_argument("--db", default=os.environ.get("BITACORA_DB"), help="Base SQLite (opcional)")
+    args = parser.parse_args()
+
+    inicio, fin = mes_anterior()
+    inicio = pd.Timestamp(args.desde) if args.desde else inicio
+    fin = pd.Timestamp(args.hasta) if args.hasta else fin
+
+    if args.db:
+        from base_datos import obtener_almacen_sqlite
+        almacen = obtener_almacen_sqlite(args.db)
+    else:
+        almacen = obtener_almacen(args.csv)
+
+    # Los datos se leen una sola vez para todos los reportes
+    datos = almacen.consultar(inicio, fin)
+    resumen = almacen.consultar_resumen(inicio, fin)
+    tareas = planificar(datos, inicio, fin, args.por, args.periodo, args.titulo, args.max_registros)
+
+    generados, omitidos, errores = generar_reportes(datos, resumen, tareas, args.salida, args.procesos, args.forzar)
+    print(f"{len(generados)} generados, {len(omitidos)} sin cambios, {len(errores)} con error en {args.salida}")
@@ -0,0 +1,109 @@
+import os
+
+import pandas as pd
+import pytest
+
+import almacenamiento
+from almacenamiento import AlmacenActividades, agregar_actividad, cargar_actividades, compactar, inicializar_archivo
+from reportes import generate_pdf_report
+
+REGISTRO = {'fecha': '2024-05-02', 'persona': 'Ana', 'actividad': 'Desarrollo', 'proyecto': 'Portal', 'horas': 2.5}
+
+
+def _verificar_tipos(df):
+    assert pd.api.types.is_datetime64_any_dtype(df['fecha'])
+    assert pd.api.types.is_float_dtype(df['horas'])
+    for col in ('persona', 'actividad', 'proyecto'):
+        assert isinstance(df[col].dtype, pd.CategoricalDtype)
+
+
+def test_instalacion_nueva_con_diario_conserva_tipos(tmp_path):
+    csv_file = str(tmp_path / "registro.csv")
+    inicializar_archivo(csv_file)
+    almacen = AlmacenActividades(csv_file)
+    _verificar_tipos(almacen.obtener())
+
+    almacen.agregar(REGISTRO)
+    _verificar_tipos(almacen.obtener())
+
+    # Recarga desde disco: CSV con solo la cabecera más el diario
+    datos = cargar_actividades(csv_file)
+    _verificar_tipos(datos)
+    assert datos['horas'].tolist() == [2.5]
+
+    recargado = AlmacenActividades(csv_file)
+    inicio, fin = pd.Timestamp('2024-05-01'), pd.Timestamp('2024-05-03')
+    pdf = generate_pdf_report(recargado.consultar(inicio, fin), "Reporte", inicio, fin, ['Ana'],
+                              resumen=recargado.consultar_resumen(inicio, fin))
+    assert pdf.startswith(b'%PDF')
+
+
+def _registro(dia, horas):
+    return dict(REGISTRO, fecha=f'2024-05-{dia:02d}', horas=horas)
+
+
+def _diario_con_dos_registros(tmp_path):
+    csv_file = str(tmp_path / "registro.csv")
+    inicializar_archivo(csv_file)
+    agregar_actividad(csv_file, _registro(1, 1.0))
+    compactar(csv_file)
+    agregar_actividad(csv_file, _registro(2, 2.0))
+    agregar_actividad(csv_file, _registro(3, 3.0))
+    return csv_file
+
+
+@pytest.mark.parametrize("falla", ["antes_de_confirmar", "despues_de_confirmar", "despues_de_reemplazar"])
+def test_compactacion_interrumpida_no_duplica_ni_pierde(tmp_path, monkeypatch, falla):
+    csv_file = _diario_con_dos_registros(tmp_path)
+
+    class Caida(Exception):
+        pass
+
+    def caer(*args):
+        raise Caida()
+
+    reemplazar = os.replace
+    if falla == "antes_de_confirmar":
+        # El CSV nuevo quedó escrito, pero el diario no llegó a apartarse
+        monkeypatch.setattr(almacenamiento.os, "replace",
+                            lambda origen, destino: caer() if origen.endswith(".journal") else reemplazar(origen, destino))
+    elif falla == "despues_de_confirmar":
+        monkeypatch.setattr(almacenamiento, "_terminar_compactacion", caer)
+    else:
+        monkeypatch.setattr(almacenamiento.os, "remove", caer)
+
+    with pytest.raises(Caida):
+        compactar(csv_file)
+    monkeypatch.undo()
+
+    assert cargar_actividades(csv_file)['horas'].tolist() == [1.0, 2.0, 3.0]
+    compactar(csv_file)
+    agregar_actividad(csv_file, _registro(4, 4.0))
+    assert cargar_actividades(csv_file)['horas'].tolist() == [1.0, 2.0, 3.0, 4.0]
+    assert not os.path.exists(almacenamiento.ruta_diario_apartado(csv_file))
+    assert not os.path.exists(almacenamiento.ruta_instantanea_nueva(csv_file))
+
+
+def test_linea_cortada_del_diario_se_descarta(tmp_path):
+    csv_file = str(tmp_path / "registro.csv")
+    inicializar_archivo(csv_file)
+    agregar_actividad(csv_file, _registro(1, 1.0))
+
+    # Caída a mitad de escritura: "1.5" quedó como "1" y sin salto de línea
+    linea = almacenamiento._formatear_registro(_registro(2, 1.5))
+    with open(almacenamiento.ruta_diario(csv_file), 'ab') as f:
+        f.write(linea[:linea.rindex(b"1.5") + 1])
+    assert cargar_actividades(csv_file)['horas'].tolist() == [1.0]
+
+    # La siguiente escritura no se pega a la línea cortada, que sigue descartada (su suma no coincide)
+    agregar_actividad(csv_file, _registro(3, 3.0))
+    assert cargar_actividades(csv_file)['horas'].tolist() == [1.0, 3.0]
+
+
+def test_diario_con_formato_anterior_se_sigue_leyendo(tmp_path):
+    csv_file = str(tmp_path / "registro.csv")
+    inicializar_archivo(csv_file)
+    with open(almacenamiento.ruta_diario(csv_file), 'wb') as f:
+        f.write(b"2024-05-01,Ana,Desarrollo,Portal,1.5\n")
+    agregar_actividad(csv_file, _registro(2, 2.0))
+    assert cargar_actividades(csv_file)['horas'].tolist() == [1.5, 2.0]
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from almacenamiento import AlmacenActividades, inicializar_archivo
+from base_datos import AlmacenSQLite
+from busqueda import filas_con_ids
+
+REGISTROS = [
+    {'fecha': f'2024-03-{dia:02d}', 'persona': persona, 'actividad': actividad, 'proyecto': proyecto, 'horas': horas}
+    for dia, persona, actividad, proyecto, horas in [
+        (1, 'José Pérez', 'Cartografía', 'Catastro', 4.0),
+        (2, 'Ana María', 'Reunión de seguimiento', 'Portal', 1.5),
+        (3, 'Luis Álvarez', 'Desarrollo', 'Portal', 8.0),
+        (4, 'Ana María', 'cartografia urbana', 'Nómina', 2.0),
+        (5, 'José Pérez', 'Desarrollo', 'Nómina', 6.0),
+        (6, 'Marta Ruiz', 'Pruebas', 'Catastro', 3.0),
+        (7, 'José Pérez', 'Cartografía', 'Portal', 5.0),
+        (8, 'Ana María', 'Cartografía', 'Catastro', 2.5),
+    ]
+]
+
+
+@pytest.fixture
+def almacenes(tmp_path):
+    csv_file = str(tmp_path / "registro.csv")
+    inicializar_archivo(csv_file)
+    archivo = AlmacenActividades(csv_file)
+    sqlite = AlmacenSQLite(str(tmp_path / "bitacora.db"))
+    for almacen in (archivo, sqlite):
+        almacen.agregar_lote(REGISTROS)
+    return archivo, sqlite
+
+
+def _filas(almacen, consulta, filtros):
+    ids = almacen.buscar(consulta, *filtros)
+    if ids is None:
+        return None
+    assert (np.diff(ids) > 0).all()
+    encontradas = filas_con_ids(almacen.consultar(*filtros), ids)
+    assert len(encontradas) == len(ids)
+    return sorted(tuple(str(valor) for valor in fila) for fila in encontradas.itertuples(index=False))
+
+
+@pytest.mark.parametrize("consulta", ["cartografia", "CARTOGRAFÍA perez", "ana", "an", "é", "nomina desarrollo",
+                                      "xyz", "   "])
+@pytest.mark.parametrize("filtros", [
+    (),
+    (pd.Timestamp('2024-03-02'), pd.Timestamp('2024-03-07')),
+    (None, None, ['José Pérez', 'Ana María']),
+    (pd.Timestamp('2024-03-01'), pd.Timestamp('2024-03-31'), ['José Pérez'], ['Portal', 'Catastro'], ['Cartografía']),
+])
+def test_busqueda_sqlite_igual_que_en_memoria(almacenes, consulta, filtros):
+    archivo, sqlite = almacenes
+    assert _filas(sqlite, consulta, filtros) == _filas(archivo, consulta, filtros)
+
+
+def test_busqueda_sqlite_no_carga_la_tabla(almacenes, monkeypatch):
+    _, sqlite = almacenes
+    monkeypatch.setattr(AlmacenSQLite, "consultar", lambda *args, **kwargs: pytest.fail("cargó la tabla"))
+    assert len(sqlite.buscar("cartografia")) == 4
+    assert sqlite.buscar("cartografia", pd.Timestamp('2024-03-05'), pd.Timestamp('2024-03-31')).tolist() == [7, 8]
+    assert sqlite.buscar("inexistente").dtype == np.int64
+
+
+def test_busqueda_sqlite_ve_etiquetas_nuevas(almacenes):
+    _, sqlite = almacenes
+    assert len(sqlite.buscar("soporte")) == 0
+    sqlite.agregar({'fecha': '2024-03-09', 'persona': 'Óscar', 'actividad': 'Soporte', 'proyecto': 'Portal',
+                    'horas': 1.0})
+    assert sqlite.buscar("soporte oscar").tolist() == [9]
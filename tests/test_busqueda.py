@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from busqueda import COLUMNAS_BUSQUEDA, IndiceBusqueda, filas_con_ids, normalizar
+
+FILAS = [
+    ('José Pérez', 'Cartografía', 'Catastro'),
+    ('Ana María', 'Reunión de seguimiento', 'Portal'),
+    ('LUIS ÁLVAREZ', 'Desarrollo', 'Portal'),
+    ('Ana María', 'cartografia urbana', 'Nómina'),
+    ('José Pérez', 'Desarrollo', 'Nómina'),
+    ('Marta Ruiz', 'Pruebas', 'Catastro'),
+]
+
+
+def _datos(filas=FILAS, inicio=0, categorias=False):
+    df = pd.DataFrame(filas, columns=COLUMNAS_BUSQUEDA, index=pd.RangeIndex(inicio, inicio + len(filas)))
+    return df.astype('category') if categorias else df
+
+
+# Función de referencia: recorre todas las filas y exige cada término en alguna de las columnas
+def _buscar_fila_a_fila(df, consulta):
+    terminos = normalizar(consulta).split()
+    textos = df[COLUMNAS_BUSQUEDA].astype(str).map(normalizar)
+    coincide = [all(any(termino in texto for texto in fila) for termino in terminos) for fila in textos.itertuples(False)]
+    return df.index[np.array(coincide, dtype=bool)].to_numpy()
+
+
+@pytest.mark.parametrize("categorias", [False, True])
+@pytest.mark.parametrize("consulta", ["cartografia", "CARTOGRAFÍA", "perez", "álvarez portal", "jose nomina",
+                                      "ana", "an", "z", "ó", "seguimiento ana", "catastro pruebas", "xyz",
+                                      "portal nomina"])
+def test_buscar_igual_que_recorrer_las_filas(consulta, categorias):
+    df = _datos(categorias=categorias)
+    ids = IndiceBusqueda(df).buscar(consulta)
+    np.testing.assert_array_equal(ids, _buscar_fila_a_fila(df, consulta))
+
+
+def test_tildes_y_mayusculas():
+    indice = IndiceBusqueda(_datos())
+    assert indice.buscar("cartografia").tolist() == [0, 3]
+    assert indice.buscar("Cartografía").tolist() == [0, 3]
+    assert indice.buscar("luis alvarez").tolist() == [2]
+    assert normalizar("ÁlVaRez Ñandú") == "alvarez nandu"
+
+
+def test_consultas_cortas_y_vacias():
+    indice = IndiceBusqueda(_datos())
+    # Menos de tres letras: no hay trigramas y se revisan todas las etiquetas
+    assert indice.buscar("ru").tolist() == [5]
+    assert indice.buscar("é").tolist() == [0, 1, 2, 4, 5]
+    # Sin términos no hay filtro
+    assert indice.buscar("") is None
+    assert indice.buscar("   \t ") is None
+    assert indice.buscar("inexistente").dtype == np.int64
+    assert len(indice.buscar("inexistente")) == 0
+
+
+def test_agregar_fila_igual_que_indice_nuevo():
+    df = _datos()
+    indice = IndiceBusqueda(df.iloc[:3])
+    for id_fila, fila in df.iloc[3:].iterrows():
+        indice.agregar_fila(id_fila, fila.to_dict())
+    nuevo = IndiceBusqueda(df)
+    for consulta in ("cartografia", "ana", "nomina", "jose desarrollo", "ruiz", "portal", "ma"):
+        np.testing.assert_array_equal(indice.buscar(consulta), nuevo.buscar(consulta))
+
+    # Una etiqueta que aún no existía
+    indice.agregar_fila(6, {'persona': 'Óscar', 'actividad': 'Soporte', 'proyecto': 'Portal'})
+    assert indice.buscar("oscar").tolist() == [6]
+    assert indice.buscar("portal").tolist() == [1, 2, 6]
+
+
+def test_filas_con_ids_sobre_datos_filtrados():
+    df = _datos()
+    ids = IndiceBusqueda(df).buscar("nomina")
+    filtrado = df[df['persona'] == 'José Pérez']
+    assert filas_con_ids(filtrado, ids).index.tolist() == [4]
@@ -0,0 +1,75 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from calendario import (ANIO_MAX, dias_laborables_entre_fechas, domingo_de_pascua, es_dia_laboral,
+                        es_festivo_colombia, festivos_colombia)
+
+# Calendarios oficiales de festivos en Colombia
+FESTIVOS = {
+    2024: ['2024-01-01', '2024-01-08', '2024-03-25', '2024-03-28', '2024-03-29', '2024-05-01', '2024-05-13',
+           '2024-06-03', '2024-06-10', '2024-07-01', '2024-07-20', '2024-08-07', '2024-08-19', '2024-10-14',
+           '2024-11-04', '2024-11-11', '2024-12-08', '2024-12-25'],
+    # En 2025 San Pedro y San Pablo y el Sagrado Corazón caen el mismo lunes (30 de junio)
+    2025: ['2025-01-01', '2025-01-06', '2025-03-24', '2025-04-17', '2025-04-18', '2025-05-01', '2025-06-02',
+           '2025-06-23', '2025-06-30', '2025-07-20', '2025-08-07', '2025-08-18', '2025-10-13', '2025-11-03',
+           '2025-11-17', '2025-12-08', '2025-12-25'],
+    2038: ['2038-01-01', '2038-01-11', '2038-03-22', '2038-04-22', '2038-04-23', '2038-05-01', '2038-06-07',
+           '2038-06-28', '2038-07-05', '2038-07-20', '2038-08-07', '2038-08-16', '2038-10-18', '2038-11-01',
+           '2038-11-15', '2038-12-08', '2038-12-25'],
+}
+
+
+@pytest.mark.parametrize("anio, pascua", [(2024, date(2024, 3, 31)), (2025, date(2025, 4, 20)),
+                                          (2038, date(2038, 4, 25)), (2285, date(2285, 3, 22))])
+def test_domingo_de_pascua(anio, pascua):
+    assert domingo_de_pascua(anio) == pascua
+
+
+@pytest.mark.parametrize("anio", sorted(FESTIVOS))
+def test_festivos_de_anios_conocidos(anio):
+    assert sorted({str(fecha) for fecha, _ in festivos_colombia(anio)}) == FESTIVOS[anio]
+
+
+def test_ley_emiliani_traslada_al_lunes_siguiente():
+    festivos = dict((nombre, fecha) for fecha, nombre in festivos_colombia(2024))
+    # Sábado 6 de enero -> lunes 8; martes 19 de marzo -> lunes 25
+    assert festivos["Día de los Reyes Magos"] == date(2024, 1, 8)
+    assert festivos["Día de San José"] == date(2024, 3, 25)
+    # Los que ya caen en lunes no se mueven (6 de enero de 2025)
+    assert dict((nombre, fecha) for fecha, nombre in festivos_colombia(2025))["Día de los Reyes Magos"] == \
+        date(2025, 1, 6)
+    assert all(fecha.weekday() == 0 for fecha, nombre in festivos_colombia(2038)
+               if nombre in ("Día de la Ascensión", "Corpus Christi", "Sagrado Corazón", "Día de la Raza"))
+
+
+def test_anio_posterior_al_calendario_precalculado():
+    anio = ANIO_MAX + 10
+    fechas = pd.Series(pd.date_range(f"{anio}-01-01", f"{anio}-12-31", freq='D'))
+    festivos = {fecha for fecha, _ in festivos_colombia(anio)}
+
+    assert es_festivo_colombia(fechas).sum() == len(festivos)
+    assert not es_dia_laboral(f"{anio}-01-01")
+    assert es_festivo_colombia(domingo_de_pascua(anio).isoformat()) is False
+    # Laborables = días de semana menos los festivos que no caen en fin de semana
+    esperados = int(np.busday_count(f"{anio}-01-01", f"{anio + 1}-01-01")) - \
+        sum(fecha.weekday() < 5 for fecha in festivos)
+    assert dias_laborables_entre_fechas(f"{anio}-01-01", f"{anio}-12-31") == esperados
+    assert es_dia_laboral(fechas).sum() == esperados
+
+
+def test_dias_laborables_entre_fechas():
+    assert dias_laborables_entre_fechas("2024-01-01", "2024-12-31") == 246
+    assert dias_laborables_entre_fechas("2025-01-01", "2025-12-31") == 245
+    # Semana santa de 2024: jueves y viernes festivos
+    assert dias_laborables_entre_fechas("2024-03-25", "2024-03-31") == 2
+    assert dias_laborables_entre_fechas("2024-04-02", "2024-04-02") == 1
+    assert dias_laborables_entre_fechas("2024-04-05", "2024-04-01") == 0
+
+
+def test_funciones_con_series_conservan_el_indice():
+    fechas = pd.Series(pd.to_datetime(["2024-12-25", "2024-12-26", "2024-12-28"]), index=[10, 20, 30])
+    assert es_festivo_colombia(fechas).tolist() == [True, False, False]
+    assert es_dia_laboral(fechas).to_dict() == {10: False, 20: True, 30: False}
@@ -0,0 +1,80 @@
+import base64
+import hashlib
+import json
+import os
+
+import pytest
+
+import contrasenas
+from contrasenas import cifrar_contrasena, necesita_actualizar, verificar_contrasena
+
+RUTA_APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+
+# Función para calcular un hash en el formato anterior: base64(salt + clave PBKDF2 de 100000 iteraciones)
+def _hash_anterior(password, salt=b"s" * contrasenas.LARGO_SALT):
+    return base64.b64encode(salt + hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, 100000)).decode()
+
+
+def test_formato_actual():
+    almacenado = cifrar_contrasena("clave segura")
+    assert almacenado.startswith(f"pbkdf2_sha256$i={contrasenas.ITERACIONES_PBKDF2}$")
+    assert verificar_contrasena(almacenado, "clave segura")
+    assert not verificar_contrasena(almacenado, "clave segurA")
+    assert not necesita_actualizar(almacenado)
+
+
+def test_formato_anterior_se_acepta_y_se_marca_para_actualizar():
+    almacenado = _hash_anterior("admin123")
+    assert verificar_contrasena(almacenado, "admin123")
+    assert not verificar_contrasena(almacenado, "admin124")
+    assert necesita_actualizar(almacenado)
+
+
+def test_cambio_de_costo_o_algoritmo(monkeypatch):
+    almacenado = cifrar_contrasena("clave")
+    monkeypatch.setattr(contrasenas, "ITERACIONES_PBKDF2", contrasenas.ITERACIONES_PBKDF2 * 2)
+    assert necesita_actualizar(almacenado)
+    assert verificar_contrasena(almacenado, "clave")
+
+    monkeypatch.setattr(contrasenas, "ALGORITMO", "scrypt")
+    monkeypatch.setattr(contrasenas, "SCRYPT_N", 2 ** 10)
+    nuevo = cifrar_contrasena("clave")
+    assert nuevo.startswith("scrypt$n=1024,r=8,p=1$")
+    assert verificar_contrasena(nuevo, "clave") and not verificar_contrasena(nuevo, "otra")
+    assert not necesita_actualizar(nuevo)
+    assert necesita_actualizar(almacenado)
+
+
+@pytest.mark.parametrize("almacenado", [
+    "md5$i=1$AAAA$AAAA",                 # Algoritmo no soportado
+    "pbkdf2_sha256$n=1$AAAA$AAAA",       # Parámetro faltante
+    "scrypt$n=3,r=8,p=1$AAAA$AAAA",      # n inválido para scrypt
+    "pbkdf2_sha256$i=x$AAAA$AAAA",       # Parámetro no numérico
+    "pbkdf2_sha256$i=1$AAAA",            # Faltan partes
+    "no es base64!",
+    "",
+])
+def test_hash_invalido_no_verifica(almacenado):
+    assert verificar_contrasena(almacenado, "x") is False
+
+
+def test_inicio_de_sesion_recalcula_hash_anterior(tmp_path, monkeypatch):
+    from streamlit.testing.v1 import AppTest
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("BITACORA_DB", raising=False)
+    usuario = {"password": _hash_anterior("clave123"), "role": "user", "nombre_completo": "Ana"}
+    (tmp_path / "usuarios.json").write_text(json.dumps({"ana": usuario}))
+
+    app = AppTest.from_file(RUTA_APP, default_timeout=60).run()
+    app.text_input(key="login_username").input("ana")
+    app.text_input(key="login_password").input("clave123")
+    next(boton for boton in app.button if boton.label == "Iniciar Sesión").click().run()
+    assert app.session_state.authenticated
+
+    guardado = json.loads((tmp_path / "usuarios.json").read_text())["ana"]
+    assert guardado["password"].startswith("pbkdf2_sha256$")
+    assert not necesita_actualizar(guardado["password"])
+    assert verificar_contrasena(guardado["password"], "clave123")
+    assert {k: v for k, v in guardado.items() if k != "password"} == {"role": "user", "nombre_completo": "Ana"}
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from evolucion import DIAS_MAX_DIARIO, DIAS_MAX_SEMANAL, elegir_granularidad, lttb, preparar_serie
+
+
+# Función de referencia: LTTB punto a punto con las mismas cubetas
+def _lttb_referencia(x, y, max_puntos):
+    limites = np.linspace(1, len(x) - 1, max_puntos - 1).astype(int)
+    elegidos, anterior = [0], 0
+    for i in range(max_puntos - 2):
+        if i + 2 < len(limites):
+            siguiente = range(limites[i + 1], limites[i + 2])
+            x_sig, y_sig = np.mean([x[j] for j in siguiente]), np.mean([y[j] for j in siguiente])
+        else:
+            x_sig, y_sig = x[-1], y[-1]
+        mejor, mayor = None, -1.0
+        for j in range(limites[i], limites[i + 1]):
+            area = abs((x[anterior] - x_sig) * (y[j] - y[anterior]) - (x[anterior] - x[j]) * (y_sig - y[anterior]))
+            if area > mayor:
+                mejor, mayor = j, area
+        elegidos.append(mejor)
+        anterior = mejor
+    return elegidos + [len(x) - 1]
+
+
+@pytest.mark.parametrize("n, max_puntos", [(10, 3), (100, 7), (1000, 400), (401, 400), (5000, 123)])
+def test_lttb_conserva_extremos_y_cantidad(n, max_puntos):
+    azar = np.random.default_rng(n)
+    x = np.cumsum(azar.integers(1, 5, n)).astype(float)
+    y = azar.normal(size=n)
+    indices = lttb(x, y, max_puntos)
+    assert len(indices) == max_puntos
+    assert indices[0] == 0 and indices[-1] == n - 1
+    assert (np.diff(indices) > 0).all()
+    assert indices.tolist() == _lttb_referencia(x, y, max_puntos)
+
+
+def test_lttb_conserva_picos():
+    y = np.zeros(1000)
+    y[[137, 512, 880]] = [50.0, -40.0, 30.0]
+    indices = lttb(np.arange(1000), y, 20)
+    assert {137, 512, 880} <= set(indices.tolist())
+
+
+@pytest.mark.parametrize("n, max_puntos", [(0, 10), (1, 10), (1, 1), (5, 5), (5, 9), (5, 2)])
+def test_lttb_sin_reduccion(n, max_puntos):
+    # Sin puntos de sobra (o con menos de tres pedidos) se devuelven todos
+    assert lttb(np.arange(n), np.ones(n), max_puntos).tolist() == list(range(n))
+
+
+def test_lttb_con_valores_nan():
+    y = np.sin(np.arange(50) / 5.0)
+    y[[10, 11, 12, 30]] = np.nan
+    indices = lttb(np.arange(50), y, 10)
+    assert len(indices) == 10 and indices[0] == 0 and indices[-1] == 49
+    assert (np.diff(indices) > 0).all()
+    # Ninguna cubeta está vacía, así que no se elige ningún NaN
+    assert not np.isnan(y[indices[1:-1]]).any()
+
+    vacia = lttb(np.arange(10), np.full(10, np.nan), 5)
+    assert len(vacia) == 5 and (np.diff(vacia) > 0).all()
+
+
+@pytest.mark.parametrize("dias, esperada", [(1, "Día"), (DIAS_MAX_DIARIO, "Día"), (DIAS_MAX_DIARIO + 1, "Semana"),
+                                            (DIAS_MAX_SEMANAL, "Semana"), (DIAS_MAX_SEMANAL + 1, "Mes"),
+                                            (5000, "Mes")])
+def test_elegir_granularidad(dias, esperada):
+    inicio = pd.Timestamp("2024-01-01")
+    assert elegir_granularidad(inicio, inicio + pd.Timedelta(days=dias - 1)) == esperada
+    assert elegir_granularidad(inicio.date(), (inicio + pd.Timedelta(days=dias - 1)).date()) == esperada
+
+
+def test_preparar_serie_reduce_cada_serie():
+    fechas = pd.date_range("2020-01-01", periods=900, freq='D')
+    diario = pd.DataFrame({'fecha': np.tile(fechas, 2), 'persona': np.repeat(['Ana', 'Luis'], 900),
+                           'horas': np.random.default_rng(0).uniform(0, 8, 1800)})
+    serie = preparar_serie(diario, 'persona', "Día", max_puntos=50)
+    assert serie.groupby('persona').size().tolist() == [50, 50]
+    assert serie.groupby('persona')['fecha'].agg(['min', 'max']).to_numpy().tolist() == \
+        [[fechas[0], fechas[-1]]] * 2
+
+    # Un solo punto por persona
+    uno = preparar_serie(diario.iloc[[0, 900]], 'persona', "Mes")
+    assert len(uno) == 2 and uno['horas'].tolist() == diario['horas'].iloc[[0, 900]].tolist()
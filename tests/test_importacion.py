@@ -0,0 +1,45 @@
+import pandas as pd
+
+from almacenamiento import AlmacenActividades, inicializar_archivo
+from importacion import importar_archivo
+
+
+def test_xlsx_en_varios_bloques_numera_bien_las_filas_rechazadas(tmp_path):
+    csv_file = str(tmp_path / "registro.csv")
+    inicializar_archivo(csv_file)
+    almacen = AlmacenActividades(csv_file)
+
+    filas = pd.DataFrame({
+        'fecha': pd.date_range('2024-01-01', periods=30, freq='D').strftime('%Y-%m-%d'),
+        'persona': 'Ana',
+        'actividad': 'Desarrollo',
+        'proyecto': 'Portal',
+        'horas': 1.0,
+    })
+    filas.loc[22, 'horas'] = -3.0          # línea 24 de la hoja (la 1 es el encabezado)
+    filas.loc[27] = filas.loc[5]           # línea 29: duplicada de la línea 7
+    archivo = tmp_path / "historico.xlsx"
+    filas.to_excel(archivo, index=False)
+
+    rechazos = tmp_path / "rechazos.csv"
+    cifras = importar_archivo(almacen, str(archivo), archivo_rechazos=str(rechazos), tamano_bloque=10)
+
+    assert cifras == {"leidas": 30, "importadas": 28, "duplicadas": 1, "rechazadas": 1}
+    assert pd.read_csv(rechazos)['fila'].tolist() == [24, 29]
+
+
+def test_fila_rechazada_no_descarta_una_valida_con_la_misma_clave(tmp_path):
+    csv_file = str(tmp_path / "registro.csv")
+    inicializar_archivo(csv_file)
+    almacen = AlmacenActividades(csv_file)
+
+    archivo = tmp_path / "historico.csv"
+    archivo.write_text("fecha,persona,actividad,proyecto,horas\n"
+                       "2024-03-01,Ana,Desarrollo,Portal,-1\n"
+                       "2024-03-01,Ana,Desarrollo,Portal,2\n"
+                       "2024-03-01,Ana,Desarrollo,Portal,2\n")
+
+    cifras = importar_archivo(almacen, str(archivo))
+
+    assert cifras == {"leidas": 3, "importadas": 1, "duplicadas": 1, "rechazadas": 1}
+    assert almacen.obtener()['horas'].tolist() == [2.0]
@@ -0,0 +1,15 @@
+import pandas as pd
+
+from paginacion import orden_filas, pagina
+
+
+def test_orden_de_registro_usa_el_indice_no_la_posicion():
+    # Datos ordenados por fecha; el índice es la posición de cada fila en el archivo
+    df = pd.DataFrame({'fecha': pd.to_datetime(['2024-01-01', '2024-01-02', '2024-01-03']),
+                       'horas': [1.0, 2.0, 3.0]}, index=[2, 0, 1])
+
+    ascendente = orden_filas("registro", df, None, True)
+    assert pagina(df, ascendente, 1, 10).index.tolist() == [0, 1, 2]
+
+    descendente = orden_filas("registro", df, None, False)
+    assert pagina(df, descendente, 1, 10).index.tolist() == [2, 1, 0]
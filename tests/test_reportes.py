@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from reportes import filas_detalle, generate_pdf_report
+
+
+def _actividades(filas, semilla, categorias):
+    azar = np.random.default_rng(semilla)
+    df = pd.DataFrame({
+        'fecha': pd.Timestamp('2024-01-01') + pd.to_timedelta(azar.integers(0, 20, filas), unit='D'),
+        'persona': azar.choice(['Luis', 'Ana', 'Óscar', 'Beatriz'], filas),
+        'actividad': [f"Actividad {i}" for i in range(filas)],  # Distingue filas con la misma clave de orden
+        'proyecto': azar.choice(['Portal', 'Catastro', 'Nómina'], filas),
+        'horas': azar.integers(1, 17, filas) / 2,
+    }, index=azar.permutation(filas) + 100)
+    if categorias:
+        df = df.astype({col: pd.CategoricalDtype(sorted(df[col].unique())) for col in ('persona', 'proyecto')})
+    return df
+
+
+@pytest.mark.parametrize("categorias", [False, True])
+@pytest.mark.parametrize("max_registros", [None, 0, 1, 37, 500, 2000, 5000])
+def test_filas_detalle_igual_que_ordenar_todo(max_registros, categorias):
+    df = _actividades(2000, 1, categorias)
+    ordenado = df.sort_values(['persona', 'fecha', 'proyecto'])
+    if max_registros is not None:
+        ordenado = ordenado.head(max_registros)
+    esperadas = [(f.strftime('%Y-%m-%d'), str(p), str(pr), a) for f, p, pr, a in
+                 zip(ordenado['fecha'], ordenado['persona'], ordenado['proyecto'], ordenado['actividad'])]
+
+    filas = list(filas_detalle(df, max_registros, tamano_bloque=128))
+    assert [(fecha, persona, proyecto, actividad) for fecha, _, persona, proyecto, actividad, _ in filas] == esperadas
+
+
+def test_reporte_en_archivo(tmp_path):
+    df = _actividades(300, 2, True)
+    inicio, fin = pd.Timestamp('2024-01-01'), pd.Timestamp('2024-01-31')
+    ruta = str(tmp_path / "reporte.pdf")
+    assert generate_pdf_report(df, "Reporte", inicio, fin, ['Ana', 'Luis'], max_registros_detalle=50,
+                               archivo_salida=ruta) == ruta
+    with open(ruta, 'rb') as f:
+        assert f.read(4) == b'%PDF'
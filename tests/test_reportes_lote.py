@@ -0,0 +1,51 @@
+import os
+
+import pandas as pd
+
+from almacenamiento import construir_resumen, tipificar
+from reportes_lote import MANIFIESTO, _nombre_archivo, generar_reportes, planificar
+
+INICIO, FIN = pd.Timestamp('2024-05-01'), pd.Timestamp('2024-05-31')
+
+
+def _datos():
+    df = pd.DataFrame({
+        'fecha': pd.to_datetime(['2024-05-02', '2024-05-03', '2024-05-06', '2024-05-07']),
+        'persona': ['José Pérez', 'Jose Perez', 'JOSÉ  PÉREZ', 'Ana'],
+        'actividad': ['Desarrollo', 'Pruebas', 'Soporte', 'Desarrollo'],
+        'proyecto': ['Portal', 'Portal', 'Nómina', 'Nomina'],
+        'horas': [4.0, 2.0, 1.0, 3.0],
+    })
+    return tipificar(df)
+
+
+def test_nombres_distintos_para_etiquetas_que_se_normalizan_igual():
+    valores = ('José Pérez', 'Jose Perez', 'JOSÉ  PÉREZ')
+    nombres = {_nombre_archivo("persona", valor, INICIO, FIN) for valor in valores}
+    assert len(nombres) == 3
+    assert all(nombre.startswith("persona_jose_perez_") and nombre.endswith("_2024-05-01_2024-05-31.pdf")
+               for nombre in nombres)
+    # El nombre no depende de la ejecución
+    assert _nombre_archivo("persona", valores[0], INICIO, FIN) == _nombre_archivo("persona", valores[0], INICIO, FIN)
+    assert _nombre_archivo("general", None, INICIO, FIN) == "general_todos_2024-05-01_2024-05-31.pdf"
+    # Sin letras ni números que conservar queda solo el hash
+    assert _nombre_archivo("proyecto", "日本", INICIO, FIN).startswith("proyecto_")
+    assert "__" not in _nombre_archivo("proyecto", "日本", INICIO, FIN)
+
+
+def test_cada_persona_y_proyecto_tiene_su_reporte(tmp_path):
+    datos = _datos()
+    tareas = planificar(datos, INICIO, FIN, agrupaciones=("persona", "proyecto"))
+    assert len({tarea["archivo"] for tarea in tareas}) == len(tareas) == 7
+
+    directorio = str(tmp_path / "reportes")
+    generados, omitidos, errores = generar_reportes(datos, construir_resumen(datos), tareas, directorio, procesos=1,
+                                                    informar=lambda mensaje: None)
+    assert not errores and not omitidos
+    assert sorted(generados) == sorted(tarea["archivo"] for tarea in tareas)
+    assert sorted(os.listdir(directorio)) == sorted(generados + [MANIFIESTO])
+
+    # Sin cambios en los datos no se vuelve a generar nada
+    generados, omitidos, _ = generar_reportes(datos, construir_resumen(datos), tareas, directorio, procesos=1,
+                                              informar=lambda mensaje: None)
+    assert generados == [] and len(omitidos) == 7
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+
+from almacenamiento import (DIMENSIONES_RESUMEN, UMBRAL_INCREMENTAL, AlmacenActividades, ResumenDiario,
+                            cargar_actividades, compactar, construir_resumen, inicializar_archivo)
+
+PERSONAS = ['Ana', 'Luis', 'José']
+PROYECTOS = ['Portal', 'Nómina']
+ACTIVIDADES = ['Desarrollo', 'Pruebas', 'Reunión']
+
+
+def _registros(cantidad, semilla, inicio='2024-03-01', dias=60):
+    azar = np.random.default_rng(semilla)
+    fechas = pd.Timestamp(inicio) + pd.to_timedelta(azar.integers(0, dias, cantidad), unit='D')
+    return [{'fecha': fecha.strftime('%Y-%m-%d'), 'persona': str(azar.choice(PERSONAS)),
+             'actividad': str(azar.choice(ACTIVIDADES)), 'proyecto': str(azar.choice(PROYECTOS)),
+             'horas': float(azar.integers(1, 17)) / 2} for fecha in fechas]
+
+
+def _normalizar(tabla):
+    tabla = tabla.astype({col: str for col in DIMENSIONES_RESUMEN if col != 'fecha'})
+    return tabla.sort_values(DIMENSIONES_RESUMEN).reset_index(drop=True)[DIMENSIONES_RESUMEN + ['horas']]
+
+
+# Función para comprobar que el resumen incremental coincide con reconstruirlo desde los datos en disco
+def _verificar_paridad(almacen, csv_file):
+    tabla = almacen.obtener_resumen()
+    assert tabla['fecha'].is_monotonic_increasing
+    esperado = _normalizar(construir_resumen(cargar_actividades(csv_file)))
+    pd.testing.assert_frame_equal(_normalizar(tabla), esperado, check_dtype=False)
+    pd.testing.assert_frame_equal(_normalizar(construir_resumen(almacen.obtener())), esperado, check_dtype=False)
+
+
+def test_resumen_incremental_igual_a_reconstruirlo(tmp_path):
+    csv_file = str(tmp_path / "registro.csv")
+    inicializar_archivo(csv_file)
+    almacen = AlmacenActividades(csv_file)
+    almacen.agregar_lote(_registros(200, 1))
+    _verificar_paridad(almacen, csv_file)
+
+    # Registros al final, de uno en uno y en lote (suman a filas existentes y crean filas nuevas)
+    for registro in _registros(30, 2, inicio='2024-04-25', dias=10):
+        almacen.agregar(registro)
+    _verificar_paridad(almacen, csv_file)
+
+    # Registros con fecha anterior a la última (formulario con fecha pasada)
+    almacen.agregar_lote(_registros(50, 3, inicio='2024-01-15', dias=120))
+    almacen.agregar({'fecha': '2023-12-31', 'persona': 'Marta', 'actividad': 'Soporte', 'proyecto': 'Portal',
+                     'horas': 3.0})
+    _verificar_paridad(almacen, csv_file)
+
+    # Lote mayor que el umbral: se descarta la copia en memoria y se recarga
+    almacen.agregar_lote(_registros(UMBRAL_INCREMENTAL + 1, 4))
+    _verificar_paridad(almacen, csv_file)
+    almacen.agregar_lote(_registros(20, 5, inicio='2024-02-01'))
+    _verificar_paridad(almacen, csv_file)
+
+    # Compactación del diario y registros después de ella
+    compactar(csv_file)
+    _verificar_paridad(almacen, csv_file)
+    almacen.agregar_lote(_registros(40, 6, inicio='2024-01-01', dias=200))
+    _verificar_paridad(almacen, csv_file)
+
+
+def test_resumen_sin_datos_previos():
+    vacio = pd.DataFrame({'fecha': pd.Series(dtype='datetime64[us]'), 'persona': pd.Series(dtype=str),
+                          'actividad': pd.Series(dtype=str), 'proyecto': pd.Series(dtype=str),
+                          'horas': pd.Series(dtype=float)})
+    resumen = ResumenDiario(vacio)
+    registros = _registros(25, 7)
+    for registro in registros:
+        resumen.agregar(registro)
+
+    datos = pd.DataFrame(registros).assign(fecha=lambda df: pd.to_datetime(df['fecha']))
+    pd.testing.assert_frame_equal(_normalizar(resumen.tabla()), _normalizar(construir_resumen(datos)),
+                                  check_dtype=False)
@@ -0,0 +1,106 @@
+"""Cola de trabajos en segundo plano con caché de resultados.
+
+Se usa para generar reportes fuera del hilo del script de Streamlit. Los
+trabajos se identifican por una clave (parámetros + versión de los datos): pedir
+de nuevo la misma clave devuelve el trabajo existente, terminado o en curso.
+"""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Número de trabajos que se ejecutan a la vez
+MAX_TRABAJADORES = 2
+
+# Número de resultados que se conservan en caché
+MAX_RESULTADOS = 16
+
+
+class Trabajo:
+    def __init__(self, clave, descripcion=""):
+        self.clave = clave
+        self.descripcion = descripcion
+        self.estado = "en cola"
+        self.progreso = 0.0
+        self.mensaje = "En cola"
+        self.resultado = None
+        self.error = None
+        self.creado = time.time()
+        self.terminado = None
+
+    @property
+    def en_curso(self):
+        return self.estado in ("en cola", "generando")
+
+    # Función que reciben las tareas para informar su avance
+    def informar(self, progreso, mensaje):
+        self.progreso = min(max(progreso, 0.0), 1.0)
+        self.mensaje = mensaje
+
+
+class ColaTrabajos:
+    def __init__(self, max_trabajadores=MAX_TRABAJADORES, max_resultados=MAX_RESULTADOS):
+        self._executor = ThreadPoolExecutor(max_workers=max_trabajadores, thread_name_prefix="reportes")
+        self._max_resultados = max_resultados
+        self._trabajos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        with self._lock:
+            trabajo = self._trabajos.get(clave)
+            if trabajo is not None:
+                self._trabajos.move_to_end(clave)
+            return trabajo
+
+    # Función para enviar una tarea; la tarea recibe el trabajo como argumento 'progreso'
+    def enviar(self, clave, funcion, *args, descripcion="", **kwargs):
+        with self._lock:
+            trabajo = self._trabajos.get(clave)
+            if trabajo is not None and trabajo.estado != "error":
+                self._trabajos.move_to_end(clave)
+                return trabajo
+
+            trabajo = Trabajo(clave, descripcion)
+            self._trabajos[clave] = trabajo
+            self._trabajos.move_to_end(clave)
+            self._recortar()
+
+        self._executor.submit(self._ejecutar, trabajo, funcion, args, kwargs)
+        return trabajo
+
+    def _ejecutar(self, trabajo, funcion, args, kwargs):
+        trabajo.estado = "generando"
+        trabajo.informar(0.0, "Generando")
+        try:
+            trabajo.resultado = funcion(*args, progreso=trabajo.informar, **kwargs)
+            trabajo.informar(1.0, "Listo")
+            trabajo.estado = "listo"
+        except Exception as e:
+            trabajo.error = e
+            trabajo.mensaje = str(e)
+            trabajo.estado = "error"
+        finally:
+            trabajo.terminado = time.time()
+
+    def _recortar(self):
+        # Descarta los resultados terminados más antiguos; los trabajos en curso se conservan
+        sobrantes = len(self._trabajos) - self._max_resultados
+        for clave in list(self._trabajos):
+            if sobrantes <= 0:
+                break
+            if not self._trabajos[clave].en_curso:
+                del self._trabajos[clave]
+                sobrantes -= 1
+
+
+_cola = None
+_cola_lock = threading.Lock()
+
+
+# Función para obtener la cola de trabajos compartida por todas las sesiones del proceso
+def obtener_cola():
+    global _cola
+    with _cola_lock:
+        if _cola is None:
+            _cola = ColaTrabajos()
+        return _cola
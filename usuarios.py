@@ -0,0 +1,161 @@
+"""Archivo de usuarios (usuarios.json) con escrituras seguras entre sesiones.
+
+Cada cambio se aplica sobre la versión que hay en disco en ese momento, bajo un
+bloqueo de archivo exclusivo, y se guarda en un archivo temporal que luego
+reemplaza al original con ``os.replace``. Así dos sesiones que modifican
+usuarios a la vez no se pisan, y una caída a mitad de escritura nunca deja el
+archivo truncado.
+
+``DirectorioUsuarios`` mantiene una sola copia de los usuarios por proceso,
+indexada por nombre de usuario, y la recarga solo cuando la firma del archivo
+(inodo, fecha de modificación y tamaño) cambia. Los cambios hechos desde
+cualquier sesión quedan visibles para todas en la siguiente consulta.
+"""
+import json
+import os
+import threading
+from types import MappingProxyType
+
+from almacenamiento import bloqueo_archivo
+from metricas import medir
+
+
+def ruta_bloqueo(users_file):
+    return f"{users_file}.lock"
+
+
+def _leer(users_file):
+    if not os.path.exists(users_file):
+        return None
+    with open(users_file, 'r') as f:
+        return json.load(f)
+
+
+def _escribir(users_file, users):
+    temporal = f"{users_file}.tmp"
+    with medir("escritura.json", filas=len(users)), open(temporal, 'w') as f:
+        json.dump(users, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporal, users_file)
+
+
+def _modificar(users_file, funcion):
+    # Lee la versión en disco, aplica el cambio y la reemplaza, todo bajo el bloqueo exclusivo
+    with bloqueo_archivo(ruta_bloqueo(users_file)):
+        users = _leer(users_file) or {}
+        if not funcion(users):
+            return False
+        _escribir(users_file, users)
+        return True
+
+
+# Función para cargar los usuarios (None si el archivo no existe; ValueError si está dañado)
+def cargar_usuarios(users_file):
+    with bloqueo_archivo(ruta_bloqueo(users_file), exclusivo=False):
+        return _leer(users_file)
+
+
+# Función para crear un usuario; devuelve False si ya existía
+def crear_usuario(users_file, usuario, info):
+    def _crear(users):
+        if usuario in users:
+            return False
+        users[usuario] = info
+        return True
+    return _modificar(users_file, _crear)
+
+
+# Función para actualizar algunos campos de un usuario; devuelve False si ya no existe
+def modificar_usuario(users_file, usuario, campos):
+    def _actualizar(users):
+        if usuario not in users:
+            return False
+        users[usuario].update(campos)
+        return True
+    return _modificar(users_file, _actualizar)
+
+
+# Función para eliminar un usuario; devuelve False si ya no existía
+def eliminar_usuario(users_file, usuario):
+    def _eliminar(users):
+        return users.pop(usuario, None) is not None
+    return _modificar(users_file, _eliminar)
+
+
+# Función para obtener la firma del archivo (None si no existe); cambia con cada reemplazo
+def firma_usuarios(users_file):
+    try:
+        st = os.stat(users_file)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+class DirectorioUsuarios:
+    """Usuarios compartidos por todas las sesiones del proceso.
+
+    ``fuente`` es el módulo que guarda los usuarios (este mismo para el archivo
+    JSON o ``base_datos`` para SQLite); debe ofrecer ``cargar_usuarios``,
+    ``crear_usuario``, ``modificar_usuario``, ``eliminar_usuario`` y
+    ``firma_usuarios``.
+    """
+
+    def __init__(self, ruta, fuente):
+        self.ruta = ruta
+        self._fuente = fuente
+        self._lock = threading.Lock()
+        self._usuarios = None
+        self._firma = None
+
+    def _sincronizar(self):
+        firma = self._fuente.firma_usuarios(self.ruta)
+        if self._usuarios is not None and firma == self._firma:
+            return
+        try:
+            usuarios = self._fuente.cargar_usuarios(self.ruta) or {}
+        except ValueError:
+            # Archivo dañado: se sigue usando la última versión válida si la hay
+            if self._usuarios is None:
+                raise
+            return
+        self._usuarios = MappingProxyType(usuarios)
+        self._firma = firma
+
+    # Función para obtener todos los usuarios (vista de solo lectura)
+    def usuarios(self):
+        with self._lock:
+            self._sincronizar()
+            return self._usuarios
+
+    # Función para obtener los datos de un usuario (None si no existe)
+    def obtener(self, usuario):
+        return self.usuarios().get(usuario)
+
+    def crear_usuario(self, usuario, info):
+        return self._modificar(self._fuente.crear_usuario, usuario, info)
+
+    def modificar_usuario(self, usuario, campos):
+        return self._modificar(self._fuente.modificar_usuario, usuario, campos)
+
+    def eliminar_usuario(self, usuario):
+        return self._modificar(self._fuente.eliminar_usuario, usuario)
+
+    def _modificar(self, funcion, *args):
+        resultado = funcion(self.ruta, *args)
+        with self._lock:
+            self._usuarios = None  # Se recarga en la próxima consulta
+        return resultado
+
+
+_directorios = {}
+_directorios_lock = threading.Lock()
+
+
+# Función para obtener el directorio de usuarios compartido de una ruta
+def obtener_directorio(ruta, fuente):
+    clave = (os.path.abspath(ruta), fuente.__name__)
+    with _directorios_lock:
+        if clave not in _directorios:
+            _directorios[clave] = DirectorioUsuarios(ruta, fuente)
+        return _directorios[clave]